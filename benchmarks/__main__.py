@@ -0,0 +1,405 @@
+"""Benchmark the inference servers of meowlflow.
+
+Run `python -m benchmarks run` from the root of the repository to benchmark
+`meowlflow serve` and `meowlflow sidecar` with a dummy model and a stand-in
+upstream, `python -m benchmarks compare` to compare two sets of results, and
+`python -m benchmarks startup` to time how long the CLI takes to start.
+"""
+import asyncio
+import contextlib
+import json
+import os
+from pathlib import Path
+import platform
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+import time
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+import urllib.request
+
+import click
+from mlflow.pyfunc import load_model
+
+import meowlflow
+from meowlflow.sidecar import load_schema
+from benchmarks import load, model, stages
+
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMAS = {
+    "document_splitter": ROOT / "examples" / "document_splitter_schema.py",
+    "mlflow_example": ROOT / "e2e" / "mlflow_example_schema.py",
+}
+MODES = ["serve", "sidecar"]
+# modules a command must not import when it starts, as they are slow to import
+LAZY_MODULES = {"sidecar": ["mlflow", "pandas", "gunicorn"]}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _wait(url: str, process: "subprocess.Popen[bytes]", log_path: Path) -> None:
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise click.ClickException(
+        f"{url} did not become ready:\n{log_path.read_text()[-2000:]}"
+    )
+
+
+@contextlib.contextmanager
+def _process(
+    args: List[str], ready_url: str, log_path: Path
+) -> Iterator["subprocess.Popen[bytes]"]:
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT, cwd=ROOT)
+        try:
+            _wait(ready_url, process, log_path)
+            yield process
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+@contextlib.contextmanager
+def _server(
+    mode: str,
+    schema_path: Path,
+    model_path: str,
+    work_dir: Path,
+    server_args: List[str],
+    upstream_latency_ms: float,
+) -> Iterator[str]:
+    port = _free_port()
+    args = [sys.executable, "-m", "meowlflow.cli", mode]
+    args += ["--schema-path", str(schema_path), "--host", "127.0.0.1"]
+    args += ["--port", str(port)] + server_args
+    with contextlib.ExitStack() as stack:
+        if mode == "serve":
+            args += ["--model-path", model_path]
+        else:
+            upstream_port = _free_port()
+            stack.enter_context(
+                _process(
+                    [
+                        sys.executable,
+                        "-m",
+                        "benchmarks.upstream",
+                        "--port",
+                        str(upstream_port),
+                        "--latency-ms",
+                        str(upstream_latency_ms),
+                    ],
+                    f"http://127.0.0.1:{upstream_port}/ping",
+                    work_dir / "upstream.log",
+                )
+            )
+            args += ["--upstream", f"http://127.0.0.1:{upstream_port}/invocations"]
+        stack.enter_context(
+            _process(args, f"http://127.0.0.1:{port}/version", work_dir / "server.log")
+        )
+        yield f"http://127.0.0.1:{port}/api/v1/infer"
+
+
+def _payload(schema_path: Path, rows: int) -> Any:
+    # requests repeat the rows of the example of the schema's Request
+    example = load_schema(schema_path).Request.Config.schema_extra["example"]
+    return [example[i % len(example)] for i in range(rows)]
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command()
+@click.option(
+    "--schema",
+    "schemas",
+    multiple=True,
+    type=click.Choice(sorted(SCHEMAS)),
+    help="example schema to benchmark, by default all of them",
+)
+@click.option(
+    "--mode",
+    "modes",
+    multiple=True,
+    type=click.Choice(MODES),
+    help="server to benchmark, by default all of them",
+)
+@click.option(
+    "--rows",
+    "row_counts",
+    multiple=True,
+    type=int,
+    help="number of rows per request  [default: 1, 32]",
+)
+@click.option(
+    "--concurrency",
+    "concurrencies",
+    multiple=True,
+    type=int,
+    help="number of requests in flight  [default: 1, 16]",
+)
+@click.option("--requests", default=500, type=int, show_default=True)
+@click.option("--warmup", default=50, type=int, show_default=True)
+@click.option(
+    "--stage-iterations",
+    default=200,
+    type=int,
+    show_default=True,
+    help="number of in-process calls used to time each stage, 0 skips them",
+)
+@click.option(
+    "--model-latency-ms",
+    default=0.0,
+    type=float,
+    show_default=True,
+    help="time each prediction of the dummy model or upstream takes",
+)
+@click.option(
+    "--server-args",
+    default="",
+    type=str,
+    help='extra arguments for the servers, eg: "--max-batch-size 64"',
+)
+@click.option("--output", default="-", type=click.File("w"), show_default=True)
+def run(
+    schemas: Tuple[str, ...],
+    modes: Tuple[str, ...],
+    row_counts: Tuple[int, ...],
+    concurrencies: Tuple[int, ...],
+    requests: int,
+    warmup: int,
+    stage_iterations: int,
+    model_latency_ms: float,
+    server_args: str,
+    output: IO[str],
+) -> None:
+    """Benchmark the servers and write the results as JSON to OUTPUT."""
+    schemas = schemas or tuple(sorted(SCHEMAS))
+    modes = modes or tuple(MODES)
+    row_counts = row_counts or (1, 32)
+    concurrencies = concurrencies or (1, 16)
+
+    results: Dict[str, Any] = {
+        "meowlflow": meowlflow.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "requests": requests,
+            "warmup": warmup,
+            "model_latency_ms": model_latency_ms,
+            "server_args": server_args,
+        },
+        "stages": [],
+        "load": [],
+    }
+    with TemporaryDirectory() as temp_dir:
+        work_dir = Path(temp_dir)
+        model_path = str(work_dir / "model")
+        model.save(model_path, latency=model_latency_ms / 1000)
+
+        if stage_iterations > 0:
+            predictor = load_model(model_path)
+            for name in schemas:
+                schema = load_schema(SCHEMAS[name])
+                for rows in row_counts:
+                    click.echo(f"timing stages of {name} with {rows} rows", err=True)
+                    timings = stages.measure(
+                        schema,
+                        predictor.predict,
+                        _payload(SCHEMAS[name], rows),
+                        stage_iterations,
+                    )
+                    results["stages"].append(
+                        {"schema": name, "rows": rows, "stages_ms": timings}
+                    )
+
+        for mode in modes:
+            for name in schemas:
+                with _server(
+                    mode,
+                    SCHEMAS[name],
+                    model_path,
+                    work_dir,
+                    shlex.split(server_args),
+                    model_latency_ms,
+                ) as url:
+                    for rows in row_counts:
+                        body = json.dumps(_payload(SCHEMAS[name], rows)).encode()
+                        for concurrency in concurrencies:
+                            click.echo(
+                                f"loading {mode} with {name}, {rows} rows and "
+                                f"concurrency {concurrency}",
+                                err=True,
+                            )
+                            summary = asyncio.run(
+                                load.drive(url, body, concurrency, requests, warmup)
+                            )
+                            results["load"].append(
+                                {
+                                    "mode": mode,
+                                    "schema": name,
+                                    "rows": rows,
+                                    "concurrency": concurrency,
+                                    **summary,
+                                }
+                            )
+
+    json.dump(results, output, indent=2)
+    output.write("\n")
+
+
+def _key(result: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (result["mode"], result["schema"], result["rows"], result["concurrency"])
+
+
+@cli.command()
+@click.argument("baseline", type=click.File("r"))
+@click.argument("current", type=click.File("r"))
+@click.option(
+    "--max-regression",
+    default=None,
+    type=float,
+    help="fail if the throughput of a scenario drops, or its p99 latency grows, by \
+more than this fraction, eg: 0.2",
+)
+def compare(
+    baseline: IO[str], current: IO[str], max_regression: Optional[float]
+) -> None:
+    """Compare the load results in CURRENT to those in BASELINE."""
+    before = {_key(r): r for r in json.load(baseline)["load"]}
+    regressions = 0
+    click.echo(
+        f"{'scenario':<48} {'rps':>10} {'change':>8} {'p99 ms':>10} {'change':>8}"
+    )
+    for result in json.load(current)["load"]:
+        key = _key(result)
+        scenario = "{} {} rows={} c={}".format(*key)
+        rps = result["throughput_rps"]
+        p99 = result["latency_ms"]["p99"]
+        if key not in before:
+            click.echo(f"{scenario:<48} {rps:>10} {'new':>8} {p99:>10} {'new':>8}")
+            continue
+        old_rps = before[key]["throughput_rps"]
+        old_p99 = before[key]["latency_ms"]["p99"]
+        rps_change = (rps - old_rps) / old_rps if old_rps else 0.0
+        p99_change = (p99 - old_p99) / old_p99 if old_p99 else 0.0
+        flag = ""
+        if max_regression is not None and (
+            rps_change < -max_regression
+            or p99_change > max_regression
+            or result["errors"] > before[key]["errors"]
+        ):
+            regressions += 1
+            flag = "  <- regression"
+        click.echo(
+            f"{scenario:<48} {rps:>10} {rps_change:>+8.1%} {p99:>10} "
+            f"{p99_change:>+8.1%}{flag}"
+        )
+    if regressions:
+        raise click.ClickException(f"{regressions} scenarios regressed")
+
+
+def _start(command: str) -> float:
+    """run `meowlflow <command> --help`, returning how long it took"""
+    start_time = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "meowlflow.cli", command, "--help"],
+        stdout=subprocess.DEVNULL,
+        cwd=ROOT,
+        check=True,
+    )
+    return time.perf_counter() - start_time
+
+
+def _imported(command: str) -> List[str]:
+    """the top-level modules imported by `meowlflow <command> --help`"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "meowlflow.cli", command, "--help"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        cwd=ROOT,
+        check=True,
+        text=True,
+    )
+    modules = set()
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return sorted(modules)
+
+
+@cli.command()
+@click.option(
+    "--command",
+    "commands",
+    default=MODES,
+    multiple=True,
+    show_default=True,
+    help="command of meowlflow to start",
+)
+@click.option("--repeat", default=5, type=int, show_default=True)
+@click.option(
+    "--max-seconds",
+    default=None,
+    type=float,
+    help="fail if the median time to start a command exceeds this many seconds",
+)
+@click.option("--output", default="-", type=click.File("w"), show_default=True)
+def startup(
+    commands: List[str], repeat: int, max_seconds: Optional[float], output: IO[str]
+) -> None:
+    """Time how long `meowlflow <command> --help` takes to import and start.
+
+    Fails if a command imports a module it is meant to import lazily, e.g. mlflow
+    for `sidecar`, or starts slower than --max-seconds.
+    """
+    results = []
+    failures = []
+    for command in commands:
+        durations = [_start(command) for _ in range(repeat)]
+        median = statistics.median(durations)
+        eager = sorted(set(LAZY_MODULES.get(command, [])) & set(_imported(command)))
+        results.append(
+            {
+                "command": command,
+                "median_s": round(median, 3),
+                "min_s": round(min(durations), 3),
+                "eager_imports": eager,
+            }
+        )
+        click.echo(f"{command}: {median:.3f}s", err=True)
+        if eager:
+            failures.append(f"{command} imports {', '.join(eager)}")
+        if max_seconds is not None and median > max_seconds:
+            failures.append(f"{command} starts in {median:.3f}s")
+
+    json.dump(
+        {"python": platform.python_version(), "startup": results}, output, indent=2
+    )
+    output.write("\n")
+    if failures:
+        raise click.ClickException("; ".join(failures))
+
+
+if __name__ == "__main__":
+    cli()
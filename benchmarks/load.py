@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Sequence
+
+import aiohttp
+import numpy
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """summarize latencies in seconds as milliseconds"""
+    if not samples:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ms = numpy.asarray(samples) * 1000
+    p50, p95, p99 = numpy.percentile(ms, [50, 95, 99])
+    return {
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+async def drive(
+    url: str,
+    body: bytes,
+    concurrency: int,
+    requests: int,
+    warmup: int = 0,
+    headers: Dict[str, str] = {"Content-Type": "application/json"},
+) -> Dict[str, Any]:
+    """send a fixed number of identical requests at a fixed concurrency
+
+    Parameters
+    ----------
+    url : str
+    body : bytes
+    concurrency : int
+        number of requests in flight at any time
+    requests : int
+        number of measured requests
+    warmup : int, default: 0
+        number of requests sent, and not measured, before the measured ones
+
+    Returns
+    -------
+    dict with the throughput, latency percentiles and number of errors
+    """
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def run(n: int) -> List[float]:
+            latencies: List[float] = []
+            remaining = n
+
+            async def worker() -> None:
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    start = time.perf_counter()
+                    try:
+                        async with session.post(url, data=body, headers=headers) as r:
+                            await r.read()
+                            ok = r.status == 200
+                    except aiohttp.ClientError:
+                        ok = False
+                    # failed requests are recorded as negative latencies
+                    elapsed = time.perf_counter() - start
+                    latencies.append(elapsed if ok else -elapsed)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return latencies
+
+        await run(warmup)
+        start = time.perf_counter()
+        latencies = await run(requests)
+        duration = time.perf_counter() - start
+
+    succeeded = [latency for latency in latencies if latency >= 0]
+    return {
+        "requests": requests,
+        "errors": len(latencies) - len(succeeded),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(succeeded) / duration, 2) if duration else 0.0,
+        "latency_ms": percentiles(succeeded),
+    }
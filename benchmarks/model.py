@@ -0,0 +1,41 @@
+import sys
+import time
+from typing import Any
+
+import cloudpickle
+import mlflow.pyfunc
+import pandas
+
+
+class DummyModel(mlflow.pyfunc.PythonModel):  # type: ignore[misc]
+    """A stand-in model returning one cheap prediction per input row.
+
+    The rows of DataFrames are summed and the items of lists are replaced by
+    their length, so that the outputs match the example schemas of the repo.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+
+    def predict(self, context: Any, model_input: Any) -> Any:
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(model_input, pandas.DataFrame):
+            return model_input.select_dtypes("number").sum(axis=1).to_numpy()
+        return [len(str(row)) for row in model_input]
+
+
+def save(path: str, latency: float = 0.0) -> None:
+    """save a dummy pyfunc model
+
+    Parameters
+    ----------
+    path : str
+        directory into which the model is saved; it must not exist
+    latency : float, default: 0.0
+        seconds each call to predict sleeps for, to simulate a costlier model
+    """
+    # pickle the model class by value, so that the model can be loaded by
+    # servers that cannot import this module
+    cloudpickle.register_pickle_by_value(sys.modules[__name__])
+    mlflow.pyfunc.save_model(path, python_model=DummyModel(latency))
@@ -0,0 +1,48 @@
+import json
+import time
+import types
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.load import percentiles
+
+
+STAGES = ["validation", "transform", "predict", "serialization"]
+
+
+def measure(
+    schema: types.ModuleType,
+    predict: Callable[[Any], Any],
+    payload: Any,
+    iterations: int,
+) -> Dict[str, Dict[str, float]]:
+    """time each stage of the inference path in-process
+
+    The stages are those of the JSON inference endpoint: validating the
+    payload into a `Request`, `Request.transform`, the model's prediction and
+    `Response.transform` followed by the validation and JSON encoding of the
+    `Response`.
+
+    Returns
+    -------
+    dict of latency percentiles in milliseconds per stage
+    """
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    for _ in range(iterations):
+        start = time.perf_counter()
+        request = schema.Request.parse_obj(payload)
+        validated = time.perf_counter()
+        data = request.transform()
+        transformed = time.perf_counter()
+        outputs = predict(data)
+        predicted = time.perf_counter()
+        response = schema.Response.parse_obj(schema.Response.transform(outputs))
+        json.dumps(jsonable_encoder(response))
+        serialized = time.perf_counter()
+
+        samples["validation"].append(validated - start)
+        samples["transform"].append(transformed - validated)
+        samples["predict"].append(predicted - transformed)
+        samples["serialization"].append(serialized - predicted)
+    return {stage: percentiles(samples[stage]) for stage in STAGES}
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from typing import Any
+
+from aiohttp import web
+import click
+
+
+def rows(body: Any) -> int:
+    """count the rows of a request to an MLflow scoring server"""
+    if isinstance(body, dict):
+        for key in ("data", "instances", "inputs", "dataframe_records"):
+            if key in body:
+                return len(body[key])
+        split = body.get("dataframe_split")
+        if isinstance(split, dict):
+            return len(split.get("data", []))
+        return 1
+    if isinstance(body, list):
+        return len(body)
+    return 1
+
+
+def build(latency: float = 0.0) -> web.Application:
+    """build a stand-in for `mlflow models serve` returning one zero per row"""
+
+    async def invocations(request: web.Request) -> web.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        raw = await request.read()
+        if request.content_type == "text/csv":
+            n = max(len(raw.decode().strip().splitlines()) - 1, 0)
+        else:
+            n = rows(json.loads(raw))
+        return web.json_response([0] * n)
+
+    async def ping(request: web.Request) -> web.Response:
+        return web.Response(text="\n")
+
+    app = web.Application(client_max_size=1024**3)
+    app.router.add_post("/invocations", invocations)
+    app.router.add_get("/ping", ping)
+    return app
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", type=str, show_default=True)
+@click.option("--port", default=8080, type=int, show_default=True)
+@click.option(
+    "--latency-ms",
+    default=0.0,
+    type=float,
+    show_default=True,
+    help="time each invocation takes, to simulate a costlier model",
+)
+def main(host: str, port: int, latency_ms: float) -> None:
+    web.run_app(build(latency_ms / 1000), host=host, port=port, print=None)
+
+
+if __name__ == "__main__":
+    main()
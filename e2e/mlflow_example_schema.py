@@ -1,11 +1,10 @@
 from typing import Any, Dict, List
 
-import pandas
 import pydantic.dataclasses
 
 from meowlflow.api.base import (
-    BaseRequest,
     BaseResponse,
+    ColumnarRequest,
 )
 
 description = "This is an example MLflow project that models wine preferences."
@@ -47,18 +46,9 @@ _MAP: Dict[str, str] = {
 }
 
 
-class Request(BaseRequest):
+class Request(ColumnarRequest):
     __root__: List[Properties]
-
-    def transform(self) -> Any:
-        data: List[Dict[str, float]] = []
-        for properties in self.__root__:
-            pdict: Dict[str, float] = {}
-            for k, v in properties.__dict__.items():
-                if k in _MAP:
-                    pdict[_MAP[k]] = v
-            data += [pdict]
-        return pandas.DataFrame.from_records(data)
+    columns = _MAP
 
     class Config:
         schema_extra = {
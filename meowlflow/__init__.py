@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from importlib.metadata import version, PackageNotFoundError
+import time
 
+# when the package started being imported, from which the time spent importing
+# the CLI's dependencies is measured
+_import_start = time.perf_counter()
 
 __version__ = "0.0.0"
 try:
@@ -1,21 +1,45 @@
 # pylint: disable=no-name-in-module
 # pylint: disable=too-few-public-methods
 import logging
+from typing import Dict, Optional
+
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
 
 import meowlflow
+from meowlflow.exception import NotReady
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+# the version of the model served by each endpoint of this process
+_models: Dict[str, str] = {}
+# whether this process is ready to handle requests, e.g. has warmed up its model
+_ready = True
+
+
+def set_model_version(endpoint: str, version: str) -> None:
+    _models[endpoint] = version
+
+
+def set_ready(ready: bool) -> None:
+    global _ready
+    _ready = ready
+
+
+def is_ready() -> bool:
+    return _ready
+
 
 class VersionResp(BaseModel):
     version: str = Field(...)
+    models: Optional[Dict[str, str]] = Field(
+        None, description="version of the model served by each endpoint"
+    )
 
 
-@router.get("/", tags=["info"])
+@router.get("/", tags=["info"], response_model_exclude_none=True)
 async def index() -> VersionResp:
     return await version()
 
@@ -24,6 +48,22 @@ async def index() -> VersionResp:
     "/version",
     tags=["info"],
     response_model=VersionResp,
+    response_model_exclude_none=True,
 )
 async def version() -> VersionResp:
-    return VersionResp(version=meowlflow.__version__)
+    return VersionResp(version=meowlflow.__version__, models=dict(_models) or None)
+
+
+class ReadyResp(BaseModel):
+    ready: bool = Field(...)
+
+
+@router.get(
+    "/ready",
+    tags=["info"],
+    response_model=ReadyResp,
+)
+async def ready() -> ReadyResp:
+    if not _ready:
+        raise NotReady("The server is starting")
+    return ReadyResp(ready=True)
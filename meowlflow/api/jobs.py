@@ -0,0 +1,136 @@
+# pylint: disable=no-name-in-module
+# pylint: disable=too-few-public-methods
+import datetime
+import types
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import APIRouter, Query, Request, Response
+from pydantic import BaseModel, Field, create_model
+
+from meowlflow import jobs, timing
+from meowlflow.api import base
+from meowlflow.exception import ResourceNotFound
+
+# the longest time for which a request waits for a job to finish
+MAX_WAIT = 60.0
+
+
+class JobStatus(BaseModel):
+    id: str = Field(...)
+    status: str = Field(..., description="one of queued, running, succeeded or failed")
+    priority: int = Field(...)
+    created_at: datetime.datetime = Field(...)
+    started_at: Optional[datetime.datetime] = Field(None)
+    finished_at: Optional[datetime.datetime] = Field(None)
+    error: Optional[Dict[str, Any]] = Field(
+        None, description="the error of a failed job"
+    )
+
+
+def _timestamp(value: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+
+
+def render(job: jobs.Job) -> bytes:
+    """encode the status of a job, with its result once it has succeeded"""
+    status = JobStatus(
+        id=job.id,
+        status=job.status,
+        priority=job.priority,
+        created_at=_timestamp(job.created_at),
+        started_at=None if job.started_at is None else _timestamp(job.started_at),
+        finished_at=None if job.finished_at is None else _timestamp(job.finished_at),
+        error=job.error,
+    ).json(exclude_none=True)
+    if job.result is None:
+        return status.encode()
+    # the result is already encoded, and is spliced into the status object
+    return status[:-1].encode() + b', "result": ' + job.result + b"}"
+
+
+def register_job_endpoints(
+    router: APIRouter,
+    endpoint: str,
+    schema: types.ModuleType,
+    respond: Callable[[base.BaseRequest], Awaitable[bytes]],
+    job_queue: jobs.JobQueue,
+    model_version: Any = "",
+) -> None:
+    """register the job endpoints of an inference endpoint on a router
+
+    Requests POSTed to the path of the endpoint suffixed with "/jobs" are
+    validated and queued as jobs, whose status, and result once they have
+    finished, are read from the "/jobs/{job_id}" path.
+
+    Parameters
+    ----------
+    router : APIRouter
+    endpoint : str
+    schema : module
+        schema module of the endpoint
+    respond : callable
+        coroutine function returning the JSON body of the response to a
+        validated request
+    job_queue : jobs.JobQueue
+    model_version : str or callable, default: ""
+        version of the model, with which the stage duration metrics of the jobs
+        are labelled
+    """
+    path = endpoint.rstrip("/") + "/jobs"
+    timer = timing.StageTimer(path, model_version=model_version)
+    # the result of a job is the Response of the schema
+    job_model = create_model(
+        "Job",
+        __base__=JobStatus,
+        __module__=schema.__name__,
+        result=(Optional[schema.Response], Field(None)),
+    )
+
+    async def submit(
+        body: schema.Request,  # type: ignore
+        request: Request,
+        priority: int = Query(0, description="jobs with a higher priority run first"),
+    ) -> Response:
+        async def run() -> bytes:
+            with timer.stages():
+                return await respond(body)
+
+        job = await job_queue.submit(endpoint, run, priority)
+        return Response(
+            render(job),
+            status_code=202,
+            media_type="application/json",
+            headers={"Location": f"{request.url.path}/{job.id}"},
+        )
+
+    async def get_job(
+        job_id: str,
+        wait: float = Query(
+            0.0,
+            ge=0.0,
+            le=MAX_WAIT,
+            description="seconds for which to wait for the job to finish",
+        ),
+    ) -> Response:
+        job = await job_queue.wait(job_id, wait)
+        if job is None or job.endpoint != endpoint:
+            raise ResourceNotFound(f"Job {job_id} not found")
+        return Response(render(job), media_type="application/json")
+
+    router.add_api_route(
+        path,
+        submit,
+        methods=["POST"],
+        status_code=202,
+        response_model=JobStatus,
+        response_model_exclude_none=True,
+        tags=["jobs"],
+    )
+    router.add_api_route(
+        path + "/{job_id}",
+        get_job,
+        methods=["GET"],
+        response_model=job_model,
+        response_model_exclude_none=True,
+        tags=["jobs"],
+    )
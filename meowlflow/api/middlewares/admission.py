@@ -0,0 +1,185 @@
+import asyncio
+from collections import deque
+import time
+from typing import Any, Callable, Collection, Deque, Dict, TypeVar
+
+import click
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from meowlflow.exception import Overloaded
+
+
+RT = TypeVar("RT")
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "meowlflow_admission_in_flight",
+    "Number of admitted requests that have not yet completed",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "meowlflow_admission_queue_depth",
+    "Number of requests waiting to be admitted",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "meowlflow_admission_queue_wait_seconds",
+    "Time admitted requests spent waiting in the admission queue",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+ADMISSION_SHED = Counter(
+    "meowlflow_admission_shed_total",
+    "Number of requests rejected because the server was overloaded",
+    ("reason",),
+)
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--admission-retry-after",
+        default=1,
+        type=int,
+        show_default=True,
+        help="seconds after which clients of rejected requests are told to retry",
+    )(function)
+    function = click.option(
+        "--admission-queue-timeout-ms",
+        default=1000.0,
+        type=float,
+        show_default=True,
+        help="maximum time a request waits to be admitted before it is rejected",
+    )(function)
+    function = click.option(
+        "--admission-max-queue",
+        default=0,
+        type=int,
+        show_default=True,
+        help="maximum number of requests waiting to be admitted, further requests \
+are rejected immediately; with 0, every request beyond --admission-max-in-flight \
+is rejected",
+    )(function)
+    function = click.option(
+        "--admission-max-in-flight",
+        default=0,
+        type=int,
+        show_default=True,
+        help="maximum number of inference requests handled at once by each worker, \
+0 admits every request",
+    )(function)
+    return function
+
+
+def parse_kwargs(**kwargs: Any) -> Dict[str, Any]:
+    admission_kwargs = {}
+    for k, v in kwargs.items():
+        if k.startswith("admission_"):
+            key = k[len("admission_") :]
+            admission_kwargs[key] = v
+    return admission_kwargs
+
+
+class AdmissionMiddleware:
+    """Limit the number of requests handled at once and shed the excess load.
+
+    At most `max_in_flight` requests whose path starts with `path_prefix` and
+    whose method is one of `methods` are handled at once; further requests wait,
+    in order of arrival, in a queue of at most `max_queue` requests for at most
+    `queue_timeout` seconds. Requests that find the queue full or that time out
+    are rejected with an `Overloaded` error, which tells clients to retry after
+    `retry_after` seconds.
+
+    Only inference requests are POSTed, so reading the status of a job, which
+    may wait for the job for a while, does not take a slot. Neither do the jobs
+    themselves, which run in the background once their request has been
+    answered and are bounded by the workers of their `jobs.JobQueue`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_in_flight: int,
+        max_queue: int = 0,
+        queue_timeout_ms: float = 1000.0,
+        retry_after: int = 1,
+        path_prefix: str = "/api/",
+        methods: Collection[str] = ("POST",),
+    ) -> None:
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.retry_after = retry_after
+        self.path_prefix = path_prefix
+        self.methods = methods
+        self._in_flight = 0
+        self._queue: Deque["asyncio.Future[None]"] = deque()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.path_prefix)
+            or scope["method"] not in self.methods
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        await self._acquire()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._release()
+
+    async def _acquire(self) -> None:
+        if self._in_flight < self.max_in_flight and not self._queue:
+            self._admit()
+            return
+        if len(self._queue) >= self.max_queue:
+            ADMISSION_SHED.labels("queue_full").inc()
+            raise Overloaded(
+                "Too many requests are waiting to be handled",
+                {"max_queue": self.max_queue},
+                retry_after=self.retry_after,
+            )
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._queue.append(waiter)
+        ADMISSION_QUEUE_DEPTH.inc()
+        start_time = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._queue.remove(waiter)
+                ADMISSION_QUEUE_DEPTH.dec()
+                ADMISSION_SHED.labels("timeout").inc()
+                raise Overloaded(
+                    "Timed out waiting for the request to be handled",
+                    {"queue_timeout_ms": self.queue_timeout * 1000},
+                    retry_after=self.retry_after,
+                )
+        except BaseException:
+            # the client disconnected while waiting; hand the slot on if it had
+            # already been given to this request
+            if waiter.done():
+                self._release()
+            else:
+                self._queue.remove(waiter)
+                ADMISSION_QUEUE_DEPTH.dec()
+            raise
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start_time)
+
+    def _admit(self) -> None:
+        self._in_flight += 1
+        ADMISSION_IN_FLIGHT.inc()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+        # hand the freed slot directly to the oldest waiting request, so that new
+        # requests cannot overtake the queue
+        while self._queue and self._in_flight < self.max_in_flight:
+            waiter = self._queue.popleft()
+            ADMISSION_QUEUE_DEPTH.dec()
+            if not waiter.done():
+                self._admit()
+                waiter.set_result(None)
@@ -1,37 +1,64 @@
 import traceback
 import logging
-from typing import Awaitable, Callable, List, Optional
+from typing import Callable, List, Optional
 
 from starlette.responses import JSONResponse
-from fastapi import Request, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from meowlflow.exception import MeowlflowException
 
 logger = logging.getLogger(__name__)
 
 
-def configure_catch_exceptions_middleware(
-    handlers: List[Callable[[Exception], Optional[str]]] = []
-) -> Callable[[Request, Callable[[Request], Awaitable[Response]]], Awaitable[Response]]:
-    async def catch_exceptions_middleware(
-        request: Request, call_next: Callable[[Request], Awaitable[Response]]
-    ) -> Response:
+class CatchExceptionsMiddleware:
+    """Format MeowlflowExceptions as JSON error responses.
+
+    This is a pure ASGI middleware rather than an "http" middleware, so that it
+    does not consume the request body of streaming endpoints while their
+    response is being sent.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        handlers: List[Callable[[Exception], Optional[str]]] = [],
+    ) -> None:
+        self.app = app
+        self.handlers = handlers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send_wrapper)
 
         except MeowlflowException as error:
-            logger.error(error)
-            logger.error(traceback.format_exc())
+            if error.reported:
+                logger.error(error)
+                logger.error(traceback.format_exc())
 
-            for handler in handlers:
-                try:
-                    handler(error)
-                except Exception as handler_error:
-                    logger.error(handler_error)
-                    logger.error(traceback.format_exc())
+                for handler in self.handlers:
+                    try:
+                        handler(error)
+                    except Exception as handler_error:
+                        logger.error(handler_error)
+                        logger.error(traceback.format_exc())
 
-            return JSONResponse(
+            if response_started:
+                raise
+
+            response = JSONResponse(
                 {"error": error.to_dict()},
                 status_code=error.status_code,
+                headers=error.headers,
             )
-
-    return catch_exceptions_middleware
+            await response(scope, receive, send)
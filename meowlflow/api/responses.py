@@ -0,0 +1,61 @@
+import json
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from meowlflow.data import isinstance_of
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+def _default(obj: Any) -> Any:
+    if isinstance_of(obj, "numpy", "ndarray"):
+        return obj.tolist()
+    if isinstance_of(obj, "numpy", "generic"):
+        return obj.item()
+    if isinstance_of(obj, "pandas", "DataFrame"):
+        return obj.to_dict(orient="records")
+    if isinstance_of(obj, "pandas", "Series"):
+        return obj.tolist()
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """encode JSON content that may contain NumPy and pandas objects
+
+    orjson is used if it is installed, which encodes NumPy arrays natively;
+    otherwise the standard library's encoder is used.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """A JSON response that encodes its content as-is, without validating it.
+
+    Unlike the responses FastAPI builds from a route's `response_model`, the
+    content is neither validated nor converted with `jsonable_encoder`, so it
+    must already match the documented response model. With orjson, NumPy
+    float32 values are encoded as the shortest decimal of their 32-bit value,
+    e.g. 0.1, rather than of their conversion to a float, e.g. 0.10000000149011612.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,60 @@
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Mapping,
+    Optional,
+    Type,
+)
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+if TYPE_CHECKING:
+    from meowlflow.timing import StageTimer
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+def media_type(request: Request) -> str:
+    """the media type of a request's body, without parameters such as the charset"""
+    return request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+def content_type_route(
+    handlers: Mapping[str, Handler], timer: Optional["StageTimer"] = None
+) -> Type[APIRoute]:
+    """build a route class that dispatches requests by the media type of their body
+
+    Requests whose media type is one of the given keys are passed as-is to the
+    matching handler; all other requests are handled by FastAPI as usual, so the
+    route's OpenAPI document is not affected by the additional handlers.
+
+    Parameters
+    ----------
+    handlers : mapping of media type to request handler
+    timer : StageTimer, default: None
+        timer of the stages of all requests to the route
+
+    Returns
+    -------
+    APIRoute subclass, eg: for use with `route_class_override`
+    """
+
+    class ContentTypeRoute(APIRoute):
+        def get_route_handler(
+            self,
+        ) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+            default_handler = super().get_route_handler()
+
+            async def route_handler(request: Request) -> Response:
+                handler = handlers.get(media_type(request), default_handler)
+                if timer is not None:
+                    return await timer.time(handler, request)
+                return await handler(request)
+
+            return route_handler
+
+    return ContentTypeRoute
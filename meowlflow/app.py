@@ -1,7 +1,9 @@
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 import time
 
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette_exporter import (
     PrometheusMiddleware,
     handle_metrics,
@@ -9,23 +11,41 @@ from starlette_exporter import (
 from uvicorn.middleware.proxy_headers import (
     ProxyHeadersMiddleware,
 )
+from meowlflow.api.middlewares.admission import (
+    AdmissionMiddleware,
+)
 from meowlflow.api.middlewares.errors import (
-    configure_catch_exceptions_middleware,
+    CatchExceptionsMiddleware,
 )
 from meowlflow.integrations import sentry
 
 
-async def add_process_time_header(
-    request: Request, call_next: Callable[[Request], Awaitable[Response]]
-) -> Response:
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+class ProcessTimeHeaderMiddleware:
+    """Add the time taken to start a response in the X-Process-Time header."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.time()
 
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                process_time = time.time() - start_time
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = str(process_time)
+            await send(message)
 
-def build_app(sentry_config: Dict[str, Any]) -> FastAPI:
+        await self.app(scope, receive, send_wrapper)
+
+
+def build_app(
+    sentry_config: Dict[str, Any], admission_config: Optional[Dict[str, Any]] = None
+) -> FastAPI:
     # error-handling integrations
     error_handlers: List[Callable[[Exception], Optional[str]]] = []
     if ("dsn" in sentry_config) and (sentry_config["dsn"] != ""):
@@ -35,14 +55,20 @@ def build_app(sentry_config: Dict[str, Any]) -> FastAPI:
         )
         error_handlers.append(sentry.handle_error)
 
-    catch_exceptions_middleware = configure_catch_exceptions_middleware(error_handlers)
-
     app = FastAPI()
 
-    app.middleware("http")(add_process_time_header)
+    # middlewares that are added later wrap those that are added earlier; they are
+    # all pure ASGI middlewares, since "http" middlewares would consume the request
+    # body of streaming endpoints while their response is being sent
+    app.add_middleware(ProcessTimeHeaderMiddleware)
     app.add_middleware(PrometheusMiddleware, app_name="meowlflow")
     app.add_middleware(ProxyHeadersMiddleware)
     app.add_route("/metrics", handle_metrics)
-    app.middleware("http")(catch_exceptions_middleware)
+    # requests are admitted before they reach the other middlewares, so that shed
+    # requests cost as little as possible; the errors of shed requests are
+    # formatted by CatchExceptionsMiddleware
+    if admission_config and admission_config.get("max_in_flight", 0) > 0:
+        app.add_middleware(AdmissionMiddleware, **admission_config)
+    app.add_middleware(CatchExceptionsMiddleware, handlers=error_handlers)
 
     return app
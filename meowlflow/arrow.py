@@ -0,0 +1,147 @@
+from typing import TYPE_CHECKING, Any, Dict, Type
+
+from pydantic import BaseModel
+from pydantic.fields import ModelField
+
+from meowlflow.api.base import record_fields
+from meowlflow.data import isinstance_of
+from meowlflow.exception import InvalidParams, InvalidUsage, Unsupported
+
+if TYPE_CHECKING:
+    import pandas
+
+
+MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _require_pyarrow() -> Any:
+    # pyarrow, and the pandas and NumPy it imports, are only imported by the
+    # first Arrow request
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:  # pragma: no cover
+        raise Unsupported(
+            f"{MEDIA_TYPE} requests require pyarrow, eg: pip install meowlflow[arrow]"
+        )
+    return pyarrow
+
+
+def _record_fields(request_class: Type[BaseModel]) -> Dict[str, ModelField]:
+    fields = record_fields(request_class)
+    if fields is None:
+        raise Unsupported(
+            f"{MEDIA_TYPE} requests are only supported for requests that are lists \
+of records"
+        )
+    return fields
+
+
+def decode(body: bytes) -> Any:
+    """read an Arrow IPC stream into a pyarrow.Table"""
+    pyarrow = _require_pyarrow()
+    try:
+        return pyarrow.ipc.open_stream(body).read_all()
+    except pyarrow.ArrowInvalid as e:
+        raise InvalidUsage(f"Invalid {MEDIA_TYPE} body", {"error": str(e)})
+
+
+def validate(table: Any, request_class: Type[BaseModel]) -> Any:
+    """check and convert the columns of a table against the records of a request
+
+    The table must have one column for every required field of the records in
+    the request's `__root__` list; columns are converted to the fields' types
+    and returned in the order of the fields, and unknown columns are dropped.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+    request_class : BaseRequest subclass whose `__root__` is a list of records
+
+    Returns
+    -------
+    pyarrow.Table
+    """
+    pyarrow = _require_pyarrow()
+    fields = _record_fields(request_class)
+    missing = [
+        field.alias
+        for field in fields.values()
+        if field.required and field.alias not in table.column_names
+    ]
+    if missing:
+        raise InvalidParams(
+            f"Missing columns in {MEDIA_TYPE} body", {"missing": missing}
+        )
+
+    types = {
+        bool: pyarrow.bool_(),
+        float: pyarrow.float64(),
+        int: pyarrow.int64(),
+        str: pyarrow.string(),
+    }
+    names = []
+    columns = []
+    for field in fields.values():
+        if field.alias not in table.column_names:
+            continue
+        column = table.column(field.alias)
+        if column.null_count and not field.allow_none:
+            raise InvalidParams(f"Column {field.alias} must not contain nulls")
+        arrow_type = types.get(field.type_)
+        if arrow_type is not None and column.type != arrow_type:
+            try:
+                column = column.cast(arrow_type)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError) as e:
+                raise InvalidParams(
+                    f"Column {field.alias} cannot be converted to {arrow_type}",
+                    {"error": str(e)},
+                )
+        names.append(field.alias)
+        columns.append(column)
+    return pyarrow.table(columns, names=names)
+
+
+def to_frame(table: Any) -> "pandas.DataFrame":
+    """convert a table to a DataFrame, without copying columns where possible"""
+    # splitting blocks avoids consolidating columns of the same type into one
+    # copied 2-D block, and self-destructing releases Arrow memory column by column
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def encode(data: Any) -> bytes:
+    """write a response to an Arrow IPC stream
+
+    DataFrames are written column by column, dicts of lists of the same length as
+    one column per key, other dicts as a single row and lists of dicts as one row
+    per dict; other outputs are written as a single "predictions" column.
+    """
+    pyarrow = _require_pyarrow()
+    import numpy
+
+    if isinstance_of(data, "pandas", "DataFrame"):
+        table = pyarrow.Table.from_pandas(data, preserve_index=False)
+    elif isinstance(data, dict):
+        lengths = {len(v) if isinstance(v, list) else None for v in data.values()}
+        if len(lengths) == 1 and None not in lengths:
+            table = pyarrow.table(data)
+        else:
+            table = pyarrow.Table.from_pylist([data])
+    elif isinstance(data, list) and data and all(isinstance(d, dict) for d in data):
+        table = pyarrow.Table.from_pylist(data)
+    else:
+        if isinstance_of(data, "pandas", "Series"):
+            data = data.to_numpy()
+        array = numpy.asarray(data)
+        if array.ndim == 2:
+            column = pyarrow.FixedSizeListArray.from_arrays(
+                array.ravel(), array.shape[1]
+            )
+        else:
+            column = pyarrow.array(array)
+        table = pyarrow.table({"predictions": column})
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return bytes(sink.getvalue())
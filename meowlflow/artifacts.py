@@ -0,0 +1,387 @@
+import concurrent.futures
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import IO, Any, Callable, Dict, List, Optional, TypeVar
+
+import click
+from mlflow.store.artifact.artifact_repository_registry import get_artifact_repository
+from mlflow.tracking.artifact_utils import _get_root_uri_and_artifact_path
+from mlflow.utils.file_utils import local_file_uri_to_path
+from prometheus_client import Counter
+
+from meowlflow import reload
+
+
+RT = TypeVar("RT")
+
+ARTIFACT_CACHE_HITS = Counter(
+    "meowlflow_artifact_cache_hits_total",
+    "Number of model artifacts found in the local artifact cache",
+)
+ARTIFACT_CACHE_MISSES = Counter(
+    "meowlflow_artifact_cache_misses_total",
+    "Number of model artifacts downloaded into the local artifact cache",
+)
+
+MANIFEST = "MANIFEST.json"
+_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--artifact-cache-lock-timeout",
+        default=600.0,
+        type=float,
+        show_default=True,
+        help="seconds to wait for other processes to stop using a cached artifact \
+that must be downloaded again",
+    )(function)
+    function = click.option(
+        "--artifact-cache-verify/--no-artifact-cache-verify",
+        default=False,
+        show_default=True,
+        help="whether to check the SHA-256 of every file of a cached artifact \
+before using it, rather than only its size and modification time",
+    )(function)
+    function = click.option(
+        "--artifact-cache-workers",
+        default=8,
+        type=int,
+        show_default=True,
+        help="number of files of an artifact downloaded at once",
+    )(function)
+    function = click.option(
+        "--artifact-cache-max-bytes",
+        default=0,
+        type=int,
+        show_default=True,
+        help="size of the artifact cache beyond which the least recently used \
+artifacts are removed, 0 never removes artifacts",
+    )(function)
+    function = click.option(
+        "--artifact-cache-dir",
+        default=None,
+        type=click.Path(file_okay=False),
+        envvar="MEOWLFLOW_ARTIFACT_CACHE_DIR",
+        help="directory in which remote model artifacts are cached across runs, \
+eg: a mounted volume; artifacts are not cached by default",
+    )(function)
+    return function
+
+
+def parse_kwargs(**kwargs: Any) -> Dict[str, Any]:
+    artifact_cache_kwargs = {}
+    for k, v in kwargs.items():
+        if k.startswith("artifact_cache_"):
+            key = k[len("artifact_cache_") :]
+            artifact_cache_kwargs[key] = v
+    return artifact_cache_kwargs
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """Cache remote model artifacts in a local directory.
+
+    Artifacts are keyed on their URI, with registry URIs of a stage resolved to
+    the version currently in the stage, see `reload.resolve`. An artifact is
+    downloaded one file at a time by a pool of threads into a temporary
+    directory, along with a manifest of the size, modification time and SHA-256
+    of each file, and then moved into the cache at once; cached artifacts whose
+    files do not match their manifest are downloaded again.
+
+    Each artifact is guarded by a file lock, so that the processes sharing the
+    cache, e.g. the workers of a server or servers sharing a volume, download
+    it once. Artifacts that are in use by a process are locked until they are
+    released, see `release`, or the process exits, and are never removed by the
+    size-bounded eviction; an artifact in use that must be downloaded again is
+    waited for for at most `lock_timeout` seconds.
+
+    Parameters
+    ----------
+    dir : str
+        directory of the cache, created if it does not exist
+    max_bytes : int, default: 0
+        size of the cached artifacts beyond which the least recently used ones
+        are removed, 0 never removes artifacts
+    workers : int, default: 8
+        number of files downloaded at once
+    verify : bool, default: False
+        whether to check the SHA-256 of the files of cached artifacts, rather
+        than only their size and modification time
+    lock_timeout : float, default: 600.0
+        seconds to wait for the other processes using an artifact to release it
+        before it is downloaded again, after which a TimeoutError is raised
+    """
+
+    def __init__(
+        self,
+        dir: str,
+        max_bytes: int = 0,
+        workers: int = 8,
+        verify: bool = False,
+        lock_timeout: float = 600.0,
+    ) -> None:
+        self.dir = os.path.abspath(dir)
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.verify = verify
+        self.lock_timeout = lock_timeout
+        os.makedirs(os.path.join(self.dir, "locks"), exist_ok=True)
+        os.makedirs(os.path.join(self.dir, "artifacts"), exist_ok=True)
+        # the lock files of the artifacts used by this process, and the number of
+        # times each artifact was downloaded and not released
+        self._locks: Dict[str, IO[str]] = {}
+        self._uses: Dict[str, int] = {}
+
+    def download(self, uri: str) -> str:
+        """download an artifact unless it is cached
+
+        The artifact is kept from being evicted until it is released as many
+        times as it was downloaded, or until this process exits.
+
+        Returns
+        -------
+        local path of the artifact
+        """
+        # artifacts are keyed on the version their URI resolves to, and the
+        # pinned URI is downloaded, so that the cached version is the one it is
+        # keyed on even if a stage changes in the meantime
+        resolved = reload.resolve(uri)
+        key = hashlib.sha256(resolved.encode()).hexdigest()
+        uri = reload.pin(uri, resolved)
+        _, artifact_path = _get_root_uri_and_artifact_path(uri)
+        entry = os.path.join(self.dir, "artifacts", key)
+        path = os.path.join(entry, "files", artifact_path)
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = open(os.path.join(self.dir, "locks", key), "a")
+            self._locks[key] = lock
+        self._uses[key] = self._uses.get(key, 0) + 1
+        try:
+            return self._download(uri, key, entry, path, lock)
+        except BaseException:
+            self.release(key)
+            raise
+
+    def key(self, path: str) -> Optional[str]:
+        """the key of the cached artifact of a local path or file URI returned by
+        `download`, or None if it is not in the cache"""
+        if path.startswith("file:"):
+            path = local_file_uri_to_path(path)
+        relative = os.path.relpath(
+            os.path.abspath(path), os.path.join(self.dir, "artifacts")
+        )
+        key = relative.split(os.sep)[0]
+        return key if key in self._locks else None
+
+    def release(self, key: str) -> None:
+        """stop using an artifact downloaded by this process, see `key`
+
+        Once it has been released as many times as it was downloaded, the lock
+        of the artifact is closed, so that it can be evicted once no other
+        process uses it.
+        """
+        uses = self._uses.get(key, 0) - 1
+        if uses > 0:
+            self._uses[key] = uses
+            return
+        self._uses.pop(key, None)
+        lock = self._locks.pop(key, None)
+        if lock is not None:
+            # the lock is closed rather than unlocked, since processes forked
+            # after it was taken share it
+            lock.close()
+
+    def _download(
+        self, uri: str, key: str, entry: str, path: str, lock: IO[str]
+    ) -> str:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        if self._check(entry):
+            ARTIFACT_CACHE_HITS.inc()
+            logger.info(f"Using cached artifact of {uri} from {path}")
+            # mark the artifact as recently used for the eviction
+            os.utime(os.path.join(entry, MANIFEST))
+            return path
+
+        # take the lock exclusively, and check whether another process has
+        # downloaded the artifact in the meantime
+        try:
+            if self._lock_exclusively(uri, entry, lock) and not self._check(entry):
+                ARTIFACT_CACHE_MISSES.inc()
+                self._fetch(uri, key, entry)
+            else:
+                ARTIFACT_CACHE_HITS.inc()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+        return path
+
+    def _lock_exclusively(self, uri: str, entry: str, lock: IO[str]) -> bool:
+        """take the lock of an artifact exclusively, or return False if another
+        process has downloaded the artifact in the meantime
+
+        The lock is polled rather than waited for, since the processes using the
+        artifact hold it until they release the artifact, which may never happen.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.01
+        while True:
+            try:
+                # a shared lock that cannot be converted at once is dropped
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                pass
+            if self._check(entry):
+                return False
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Timed out waiting for other processes to release the cached \
+artifact of {uri} in {entry}"
+                )
+            time.sleep(delay)
+            delay = min(2 * delay, 1.0)
+
+    def _check(self, entry: str) -> bool:
+        """whether the files of a cached artifact match its manifest"""
+        try:
+            with open(os.path.join(entry, MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        for name, (size, sha256, *mtime) in manifest["files"].items():
+            path = os.path.join(entry, "files", name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            # the modification times of artifacts cached by older versions are
+            # not known
+            if stat.st_size != size or mtime[:1] not in ([], [stat.st_mtime_ns]):
+                return False
+            if self.verify and _sha256(path) != sha256:
+                logger.warning(f"Cached file {path} is corrupted")
+                return False
+        return True
+
+    def _list(self, repository: Any, path: str) -> Dict[str, Optional[int]]:
+        """the files of an artifact, with their sizes if the repository lists them"""
+        files = {}
+        for info in repository.list_artifacts(path):
+            if info.is_dir:
+                files.update(self._list(repository, info.path))
+            else:
+                files[info.path] = info.file_size
+        return files
+
+    def _fetch(self, uri: str, key: str, entry: str) -> None:
+        root_uri, artifact_path = _get_root_uri_and_artifact_path(uri)
+        repository = get_artifact_repository(root_uri)
+        files = self._list(repository, artifact_path) or {artifact_path: None}
+        # make room for the artifact before downloading it, and again once the
+        # sizes that were not listed are known
+        self._evict(key, sum(size or 0 for size in files.values()))
+        logger.info(f"Downloading {len(files)} files of {uri}")
+
+        start_time = time.perf_counter()
+        temp_dir = tempfile.mkdtemp(dir=os.path.join(self.dir, "artifacts"), prefix=".")
+        try:
+            os.mkdir(os.path.join(temp_dir, "files"))
+
+            def fetch(name: str) -> List[Any]:
+                local_path = repository.download_artifacts(
+                    name, dst_path=os.path.join(temp_dir, "files")
+                )
+                stat = os.stat(local_path)
+                return [stat.st_size, _sha256(local_path), stat.st_mtime_ns]
+
+            with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+                manifest = {
+                    "uri": uri,
+                    "files": dict(zip(files, pool.map(fetch, files))),
+                }
+            with open(os.path.join(temp_dir, MANIFEST), "w") as f:
+                json.dump(manifest, f)
+
+            # replace an invalid copy of the artifact, if any, at once
+            shutil.rmtree(entry, ignore_errors=True)
+            os.rename(temp_dir, entry)
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        logger.info(
+            f"Downloaded {uri} in {time.perf_counter() - start_time:.3f}s into {entry}"
+        )
+        self._evict(key)
+
+    def _evict(self, key: str, incoming: int = 0) -> None:
+        """remove the least recently used artifacts not in use until the cache,
+        with `incoming` more bytes, fits; the artifact of the given key is kept"""
+        if not self.max_bytes:
+            return
+        directory = os.path.join(self.dir, "artifacts")
+        entries = []
+        total = incoming
+        for name in os.listdir(directory):
+            if name == key and incoming:
+                # the invalid copy that the incoming artifact replaces
+                continue
+            try:
+                with open(os.path.join(directory, name, MANIFEST)) as f:
+                    manifest = json.load(f)
+                used = os.path.getmtime(os.path.join(directory, name, MANIFEST))
+            except (OSError, ValueError):
+                continue
+            size = sum(file[0] for file in manifest["files"].values())
+            entries.append((used, name, size))
+            total += size
+
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                return
+            if name == key:
+                continue
+            with open(os.path.join(self.dir, "locks", name), "a") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # in use by a process
+                    continue
+                logger.info(f"Removing least recently used artifact {name}")
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+                total -= size
+
+
+def create(
+    dir: Optional[str] = None,
+    max_bytes: int = 0,
+    workers: int = 8,
+    verify: bool = False,
+    lock_timeout: float = 600.0,
+) -> Optional[ArtifactCache]:
+    """create an artifact cache if a directory is given, see `ArtifactCache`"""
+    if dir is None:
+        return None
+    return ArtifactCache(
+        dir,
+        max_bytes=max_bytes,
+        workers=workers,
+        verify=verify,
+        lock_timeout=lock_timeout,
+    )
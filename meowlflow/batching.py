@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set, TypeVar
+
+import click
+from prometheus_client import Histogram
+
+from meowlflow import data
+
+
+RT = TypeVar("RT")
+
+BATCH_SIZE = Histogram(
+    "meowlflow_batch_size",
+    "Number of rows sent to the model in a single batched call",
+    ("endpoint",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096),
+)
+BATCH_QUEUE_WAIT = Histogram(
+    "meowlflow_batch_queue_wait_seconds",
+    "Time a request spent waiting in the batch queue",
+    ("endpoint",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--max-batch-wait-ms",
+        default=5.0,
+        type=float,
+        show_default=True,
+        help="maximum time a request waits for other requests to fill a batch",
+    )(function)
+    function = click.option(
+        "--max-batch-size",
+        default=0,
+        type=int,
+        show_default=True,
+        help="maximum number of rows per batched model call, 0 disables batching",
+    )(function)
+    return function
+
+
+class _Pending:
+    __slots__ = ("data", "size", "future", "enqueued_at")
+
+    def __init__(self, data: Any, size: int, future: "asyncio.Future[Any]") -> None:
+        self.data = data
+        self.size = size
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class Batcher:
+    """Merge concurrent inference calls into a single call.
+
+    Inputs are queued until either `max_batch_size` rows are pending or the
+    oldest input has waited `max_wait` seconds; the queued inputs are then
+    concatenated, passed to `infer` once and the output is split back into
+    one part per caller. Inputs whose rows cannot be counted, or that are
+    larger than a batch on their own, are passed through unchanged.
+
+    If the batched call fails, every caller in the batch receives the error.
+    """
+
+    def __init__(
+        self,
+        infer: Callable[[Any], Awaitable[Any]],
+        max_batch_size: int,
+        max_wait: float,
+        endpoint: str = "",
+    ) -> None:
+        self._infer = infer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.endpoint = endpoint
+        self._pending: List[_Pending] = []
+        self._pending_rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    async def __call__(self, inputs: Any) -> Any:
+        rows = data.size(inputs)
+        if rows is None or rows >= self.max_batch_size:
+            return await self._infer(inputs)
+
+        loop = asyncio.get_running_loop()
+        if self._pending_rows + rows > self.max_batch_size:
+            self._dispatch()
+        pending = _Pending(inputs, rows, loop.create_future())
+        self._pending.append(pending)
+        self._pending_rows += rows
+        if self._pending_rows >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return await pending.future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_rows = self._pending, [], 0
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        now = time.monotonic()
+        for pending in batch:
+            BATCH_QUEUE_WAIT.labels(self.endpoint).observe(now - pending.enqueued_at)
+        BATCH_SIZE.labels(self.endpoint).observe(sum(p.size for p in batch))
+
+        try:
+            outputs = await self._infer(data.concat([p.data for p in batch]))
+            parts = data.split(outputs, [p.size for p in batch])
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        for pending, part in zip(batch, parts):
+            if not pending.future.done():
+                pending.future.set_result(part)
+
+
+def wrap(
+    infer: Callable[[Any], Awaitable[Any]],
+    max_batch_size: int,
+    max_batch_wait_ms: float,
+    endpoint: str = "",
+) -> Callable[[Any], Awaitable[Any]]:
+    """wrap an inference callable in a Batcher if batching is enabled"""
+    if max_batch_size <= 1:
+        return infer
+    return Batcher(infer, max_batch_size, max_batch_wait_ms / 1000, endpoint)
@@ -2,7 +2,8 @@ from subprocess import Popen
 import os
 import posixpath
 from pathlib import Path
-from typing import IO, Optional, Union
+import shutil
+from typing import IO, Any, Dict, Optional, Union
 
 import click
 from mlflow.pyfunc import (
@@ -12,6 +13,8 @@ from mlflow.models import (
     docker_utils as mlflow_docker_utils,
 )
 
+from meowlflow import artifacts
+
 
 _DOCKERFILE_TEMPLATE = """
 #### BEGIN MLFLOW SCRIPT
@@ -95,14 +98,20 @@ ENTRYPOINT ["python", "-c", "from mlflow.models import container as C; C._serve(
     "--schema-path",
     type=click.Path(exists=True, dir_okay=False),
 )
+@artifacts.options
 def generate(
-    model_uri: str, workdir: Path, custom_steps: str, schema_path: Path
+    model_uri: str,
+    workdir: Path,
+    custom_steps: str,
+    schema_path: Path,
+    **kwargs: Dict[str, Any],
 ) -> None:
     _dockerfile = dockerfile(
         model_uri,
         workdir,
         custom_steps=custom_steps,
         schema_path=schema_path,
+        artifact_cache=artifacts.create(**artifacts.parse_kwargs(**kwargs)),
     )
     print(_dockerfile)
 
@@ -129,8 +138,14 @@ def generate(
     "--schema-path",
     type=click.Path(exists=True, dir_okay=False),
 )
+@artifacts.options
 def build(
-    model_uri: str, tag: str, ssh_key: IO[str], custom_steps: str, schema_path: Path
+    model_uri: str,
+    tag: str,
+    ssh_key: IO[str],
+    custom_steps: str,
+    schema_path: Path,
+    **kwargs: Dict[str, Any],
 ) -> None:
     """MODEL_URI is a URI pointing to a model located in S3,
     eg: s3://mlflow/prod/artifacts/6/3a0...5d1/artifacts/model
@@ -165,6 +180,10 @@ def build(
         if provided, the schema will be added to the container
         eg:
             "model/schema.py"
+
+    artifact_cache_* : see `artifacts.ArtifactCache`
+        if a cache directory is provided, the model is copied from the cache
+        rather than downloaded for every build
     """
     if ssh_key:
         raw_ssh_key = ssh_key.read()
@@ -182,6 +201,7 @@ def build(
             cwd,
             custom_steps=custom_steps,
             schema_path=schema_path,
+            artifact_cache=artifacts.create(**artifacts.parse_kwargs(**kwargs)),
         )
 
         with open(os.path.join(cwd, "Dockerfile"), "w") as f:
@@ -219,6 +239,7 @@ def dockerfile(
     mlflow_home: Optional[Union[str, Path]] = None,
     custom_steps: Optional[str] = None,
     schema_path: Optional[Path] = None,
+    artifact_cache: Optional[artifacts.ArtifactCache] = None,
 ) -> str:
     """produce a DOCKERFILE suitable for building yuor MLFlow model server
 
@@ -235,6 +256,10 @@ def dockerfile(
         (multiline) string with custom Dockerfile directives (steps)
         eg:
             "RUN apt-get install x"
+    schema_path : Path, default: None
+    artifact_cache : artifacts.ArtifactCache, default: None
+        cache from which the model is copied into the build context, after being
+        downloaded into it unless it is cached already
 
     Returns
     -------
@@ -246,9 +271,16 @@ def dockerfile(
     ) -> str:
         model_cwd = os.path.join(dockerfile_context_dir, "model_dir")
         os.mkdir(model_cwd)
-        model_path = mlflow_backend._download_artifact_from_uri(
-            model_uri, output_path=model_cwd
-        )
+        if artifact_cache is not None:
+            cached_path = os.path.normpath(artifact_cache.download(model_uri))
+            model_path = os.path.join(model_cwd, os.path.basename(cached_path))
+            # files are hard-linked rather than copied when the cache is on the
+            # same file system as the build context
+            shutil.copytree(cached_path, model_path, copy_function=_link)
+        else:
+            model_path = mlflow_backend._download_artifact_from_uri(
+                model_uri, output_path=model_cwd
+            )
         return """
 COPY {model_dir} /opt/ml/model
 RUN python -c \
@@ -286,3 +318,10 @@ COPY {schema_path} /var/lib/meowlflow/schema.py
         model_install_steps=copy_model_into_container(cwd),
         copy_model_schema_steps=copy_model_schema_steps,
     )
+
+
+def _link(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
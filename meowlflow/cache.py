@@ -0,0 +1,390 @@
+from collections import OrderedDict
+import hashlib
+import json
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import click
+from prometheus_client import Counter, Gauge
+
+from meowlflow import data
+
+
+RT = TypeVar("RT")
+VT = TypeVar("VT")
+
+CACHE_HITS = Counter(
+    "meowlflow_response_cache_hits_total",
+    "Number of inference requests answered from the response cache",
+    ("endpoint",),
+)
+CACHE_MISSES = Counter(
+    "meowlflow_response_cache_misses_total",
+    "Number of inference requests that were not found in the response cache",
+    ("endpoint",),
+)
+CACHE_EVICTIONS = Counter(
+    "meowlflow_response_cache_evictions_total",
+    "Number of responses removed from the response cache",
+    ("endpoint", "reason"),
+)
+CACHE_BYTES = Gauge(
+    "meowlflow_response_cache_bytes",
+    "Size of the responses held in the response cache",
+    ("endpoint",),
+    multiprocess_mode="livesum",
+)
+ROW_CACHE_HITS = Counter(
+    "meowlflow_row_cache_hits_total",
+    "Number of input rows whose prediction was found in the row cache",
+    ("endpoint",),
+)
+ROW_CACHE_MISSES = Counter(
+    "meowlflow_row_cache_misses_total",
+    "Number of input rows whose prediction was not found in the row cache",
+    ("endpoint",),
+)
+ROW_CACHE_EVICTIONS = Counter(
+    "meowlflow_row_cache_evictions_total",
+    "Number of predictions removed from the row cache",
+    ("endpoint", "reason"),
+)
+ROW_CACHE_ROWS = Gauge(
+    "meowlflow_row_cache_rows",
+    "Number of predictions held in the row cache",
+    ("endpoint",),
+    multiprocess_mode="livesum",
+)
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--cache-ttl",
+        default=0.0,
+        type=float,
+        show_default=True,
+        help="seconds for which a cached response or row is served, 0 keeps them \
+until they are evicted",
+    )(function)
+    function = click.option(
+        "--cache-max-rows",
+        default=0,
+        type=int,
+        show_default=True,
+        help="maximum number of predictions cached per input row by each worker, 0 \
+disables the row cache",
+    )(function)
+    function = click.option(
+        "--cache-max-bytes",
+        default=0,
+        type=int,
+        show_default=True,
+        help="maximum size of the cached responses of each worker, 0 disables the \
+response cache",
+    )(function)
+    return function
+
+
+def parse_kwargs(**kwargs: Any) -> Dict[str, Any]:
+    cache_kwargs = {}
+    for k, v in kwargs.items():
+        if k.startswith("cache_"):
+            key = k[len("cache_") :]
+            cache_kwargs[key] = v
+    return cache_kwargs
+
+
+class _LRUCache(Generic[VT]):
+    """An LRU cache with a TTL whose entries are bounded by their total size."""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        version: str,
+        endpoint: str,
+        hits: Counter,
+        misses: Counter,
+        evictions: Counter,
+        size: Gauge,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self.endpoint = endpoint
+        self.size = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, VT]]" = OrderedDict()
+        self._hits = hits.labels(endpoint)
+        self._misses = misses.labels(endpoint)
+        self._evictions = evictions
+        self._size = size.labels(endpoint)
+
+    def _get(self, key: Hashable) -> Optional[VT]:
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl > 0 and entry[0] <= time.monotonic():
+            self._evict(key, "expired")
+            entry = None
+        if entry is None:
+            self._misses.inc()
+            return None
+        self._entries.move_to_end(key)
+        self._hits.inc()
+        return entry[2]
+
+    def _put(self, key: Hashable, value: VT, size: int) -> None:
+        if size > self.max_size:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._resize(size)
+        while self.size > self.max_size:
+            self._evict(next(iter(self._entries)), "size")
+
+    def set_version(self, version: str) -> None:
+        """drop all cached entries if the model version changed"""
+        if version == self.version:
+            return
+        self.version = version
+        while self._entries:
+            self._evict(next(iter(self._entries)), "version")
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._resize(-size)
+
+    def _evict(self, key: Hashable, reason: str) -> None:
+        self._remove(key)
+        self._evictions.labels(self.endpoint, reason).inc()
+
+    def _resize(self, delta: int) -> None:
+        self.size += delta
+        self._size.inc(delta)
+
+
+class ResponseCache(_LRUCache[bytes]):
+    """An in-memory LRU cache of encoded inference responses.
+
+    Responses are keyed on a hash of the canonical encoding of the validated
+    request, see `BaseRequest.canonical`, and of the model version, and evicted
+    when they expire, when the cache grows beyond `max_bytes` or when the model
+    version changes.
+    Only use it for deterministic models.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float = 0.0,
+        version: str = "",
+        endpoint: str = "",
+    ) -> None:
+        super().__init__(
+            max_bytes,
+            ttl,
+            version,
+            endpoint,
+            CACHE_HITS,
+            CACHE_MISSES,
+            CACHE_EVICTIONS,
+            CACHE_BYTES,
+        )
+
+    def key(self, canonical: bytes) -> str:
+        """hash the canonical encoding of a request for the current model version"""
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(b"\0")
+        digest.update(canonical)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._get(key)
+
+    def put(self, key: str, value: bytes) -> None:
+        self._put(key, value, len(value))
+
+
+RowKey = Callable[[Any], Hashable]
+
+
+def row_keys(rows: Any) -> List[Hashable]:
+    """compute the default cache keys of the rows of a model input
+
+    Rows of DataFrames are keyed on the tuple of their values, rows of arrays on
+    their bytes and items of lists on themselves, or on their JSON encoding if
+    they are not hashable.
+    """
+    if data.isinstance_of(rows, "pandas", "DataFrame"):
+        return list(rows.itertuples(index=False, name=None))
+    if data.isinstance_of(rows, "pandas", "Series"):
+        return list(rows)
+    if data.isinstance_of(rows, "numpy", "ndarray"):
+        dtype = str(rows.dtype)
+        return [(dtype, row.tobytes()) for row in rows]
+    keys: List[Hashable] = []
+    for row in rows:
+        try:
+            hash(row)
+            keys.append(row)
+        except TypeError:
+            keys.append(json.dumps(row, sort_keys=True, default=str))
+    return keys
+
+
+class RowCache(_LRUCache[Any]):
+    """An in-memory LRU cache of model predictions per input row.
+
+    Wrapping an inference callable with `wrap` splits each input into the rows
+    whose predictions are cached and those that are not; only the latter are
+    passed to the model and the predictions are reassembled in the order of
+    the input. Only use it for deterministic models whose predictions for a
+    row do not depend on the other rows of the input.
+
+    Once the model returns outputs that cannot be split by row, inputs are passed
+    to the model as they are until the model version changes.
+    """
+
+    def __init__(
+        self,
+        max_rows: int,
+        ttl: float = 0.0,
+        version: str = "",
+        endpoint: str = "",
+    ) -> None:
+        super().__init__(
+            max_rows,
+            ttl,
+            version,
+            endpoint,
+            ROW_CACHE_HITS,
+            ROW_CACHE_MISSES,
+            ROW_CACHE_EVICTIONS,
+            ROW_CACHE_ROWS,
+        )
+        self._splittable = True
+
+    def set_version(self, version: str) -> None:
+        # the outputs of another model may be split by row
+        if version != self.version:
+            self._splittable = True
+        super().set_version(version)
+
+    def keys(self, rows: Any, row_key: Optional[RowKey] = None) -> List[Hashable]:
+        """compute the cache keys of the rows of a model input
+
+        Parameters
+        ----------
+        rows : list, numpy.ndarray, pandas.DataFrame or pandas.Series
+        row_key : callable, default: None
+            function returning the key of a row, which is an item of a list or
+            array, or a dict for the rows of a DataFrame; by default, see
+            `row_keys`
+        """
+        if row_key is None:
+            keys = row_keys(rows)
+        elif data.isinstance_of(rows, "pandas", "DataFrame"):
+            keys = [row_key(row) for row in rows.to_dict(orient="records")]
+        else:
+            keys = [row_key(row) for row in rows]
+        return [(self.version, key) for key in keys]
+
+    def wrap(
+        self,
+        infer: Callable[[Any], Awaitable[Any]],
+        row_key: Optional[RowKey] = None,
+    ) -> Callable[[Any], Awaitable[Any]]:
+        """wrap an inference callable so that it only predicts uncached rows
+
+        Parameters
+        ----------
+        infer : Infer
+            async callable running the model on the output of `Request.transform`
+        row_key : callable, default: None
+            see `keys`
+
+        Returns
+        -------
+        Infer
+        """
+
+        async def cached_infer(rows: Any) -> Any:
+            n = data.size(rows)
+            if not n or not self._splittable:
+                return await infer(rows)
+
+            keys = self.keys(rows, row_key)
+            parts: List[Any] = [None] * n
+            # rows that are missing from the cache, keyed on the index of their
+            # first occurrence in the input
+            missing: Dict[Hashable, int] = {}
+            for i, key in enumerate(keys):
+                if key not in missing:
+                    parts[i] = self._get(key)
+                    if parts[i] is None:
+                        missing[key] = i
+            if not missing:
+                return data.concat([parts[i] for i in range(n)])
+
+            indices = list(missing.values())
+            outputs = await infer(data.take(rows, indices))
+            if not _has_rows(outputs, len(indices)):
+                # the outputs of the model cannot be split by row, so the row
+                # cache is skipped rather than predicting inputs twice
+                self._splittable = False
+                if len(indices) == n:
+                    return outputs
+                # the cached predictions of the other rows cannot be used either
+                return await infer(rows)
+
+            for i, part in zip(indices, data.split(outputs, [1] * len(indices))):
+                parts[i] = part
+                # copy the row so that the cache does not keep the whole output
+                # of the model alive
+                self._put(keys[i], data.take(part, [0]), 1)
+            for i, key in enumerate(keys):
+                if parts[i] is None:
+                    parts[i] = parts[missing[key]]
+            return data.concat(parts)
+
+        return cached_infer
+
+
+def _has_rows(outputs: Any, n: int) -> bool:
+    if isinstance(outputs, dict):
+        return bool(outputs) and all(data.size(v) == n for v in outputs.values())
+    return data.size(outputs) == n
+
+
+def create(
+    max_bytes: int = 0,
+    max_rows: int = 0,
+    ttl: float = 0.0,
+    version: str = "",
+    endpoint: str = "",
+) -> Tuple[Optional[ResponseCache], Optional[RowCache]]:
+    """create the response and row caches of an endpoint
+
+    Returns
+    -------
+    the response cache and the row cache, each of which is None if disabled
+    """
+    response_cache = None
+    if max_bytes > 0:
+        response_cache = ResponseCache(
+            max_bytes, ttl=ttl, version=version, endpoint=endpoint
+        )
+    row_cache = None
+    if max_rows > 0:
+        row_cache = RowCache(max_rows, ttl=ttl, version=version, endpoint=endpoint)
+    return response_cache, row_cache
@@ -1,14 +1,58 @@
+import importlib
+from typing import Any, Dict, List, Optional
+
 import click
 
 import meowlflow
-from meowlflow.sidecar import sidecar
-from meowlflow.build import build, generate
-from meowlflow.promote import promote_model
-from meowlflow.openapi import openapi
-from meowlflow.serve import serve
 
 
-@click.group()
+class LazyGroup(click.Group):
+    """A group importing the module of a subcommand only when it is run.
+
+    Commands pull in heavy dependencies, e.g. mlflow and pandas, which `sidecar`
+    does not need; importing only the command being run keeps them from slowing
+    down its startup.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        lazy_subcommands: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        # map of command names to the "module:function" implementing them
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_subcommands})
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.commands or cmd_name not in self.lazy_subcommands:
+            return super().get_command(ctx, cmd_name)
+        module_name, function_name = self.lazy_subcommands[cmd_name].split(":")
+        function = getattr(importlib.import_module(module_name), function_name)
+        # the command is kept, since `click.command` consumes the options of the
+        # function and can only be applied to it once
+        command = click.command(cmd_name)(function)
+        self.add_command(command)
+        return command
+
+
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        "sidecar": "meowlflow.sidecar:sidecar",
+        "build": "meowlflow.build:build",
+        "generate": "meowlflow.build:generate",
+        "promote": "meowlflow.promote:promote_model",
+        "promote-batch": "meowlflow.promote:promote_batch",
+        "openapi": "meowlflow.openapi:openapi",
+        "proto": "meowlflow.rpc:proto",
+        "serve": "meowlflow.serve:serve",
+        "score": "meowlflow.score:score",
+    },
+)
 @click.version_option(version=meowlflow.__version__)
 def cli() -> None:
     """
@@ -17,12 +61,5 @@ def cli() -> None:
     pass
 
 
-cli.command("sidecar")(sidecar)
-cli.command("build")(build)
-cli.command("generate")(generate)
-cli.command("promote")(promote_model)
-cli.command("openapi")(openapi)
-cli.command("serve")(serve)
-
 if __name__ == "__main__":
     cli()
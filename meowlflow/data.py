@@ -0,0 +1,130 @@
+import sys
+from typing import Any, List, Optional
+
+from meowlflow.exception import Unexpected
+
+
+def isinstance_of(obj: Any, module: str, *names: str) -> bool:
+    """whether an object is an instance of the named types of a module
+
+    The module is not imported: an object cannot be an instance of its types
+    unless it has been imported already, so that heavy modules such as pandas
+    are only imported by the schemas and models that use them.
+    """
+    imported = sys.modules.get(module)
+    if imported is None:
+        return False
+    return isinstance(obj, tuple(getattr(imported, name) for name in names))
+
+
+def _is_frame(data: Any) -> bool:
+    return isinstance_of(data, "pandas", "DataFrame", "Series")
+
+
+def _is_array(data: Any) -> bool:
+    return isinstance_of(data, "numpy", "ndarray")
+
+
+def size(data: Any) -> Optional[int]:
+    """number of rows in a model input or output
+
+    Parameters
+    ----------
+    data : list, tuple, numpy.ndarray, pandas.DataFrame or pandas.Series
+
+    Returns
+    -------
+    number of rows, or None if the rows of the given type cannot be counted
+    """
+    if isinstance(data, (list, tuple)) or _is_array(data) or _is_frame(data):
+        return len(data)
+    return None
+
+
+def concat(parts: List[Any]) -> Any:
+    """concatenate several model inputs or outputs along their rows
+
+    Parameters
+    ----------
+    parts : list of list, numpy.ndarray, pandas.DataFrame, pandas.Series or dict
+        all parts must be of the same kind; dicts are concatenated value by value
+
+    Returns
+    -------
+    a single object of the same kind as the parts
+    """
+    if len(parts) == 1:
+        return parts[0]
+    first = parts[0]
+    if isinstance(first, dict):
+        return {k: concat([part[k] for part in parts]) for k in first}
+    if isinstance(first, (list, tuple)):
+        return [row for part in parts for row in part]
+    if _is_frame(first):
+        import pandas
+
+        return pandas.concat(parts, ignore_index=True)
+    if _is_array(first):
+        import numpy
+
+        return numpy.concatenate(parts)
+    raise TypeError(f"Cannot concatenate objects of type {type(first)}")
+
+
+def split(data: Any, sizes: List[int]) -> List[Any]:
+    """split a model input or output into consecutive parts of the given sizes
+
+    Parameters
+    ----------
+    data : list, numpy.ndarray, pandas.DataFrame, pandas.Series or dict
+        a dict is split value by value, eg: {"predictions": [...]}
+    sizes : list of int
+
+    Returns
+    -------
+    list of parts, one for each of the given sizes
+    """
+    if isinstance(data, dict):
+        columns = {k: split(v, sizes) for k, v in data.items()}
+        return [{k: v[i] for k, v in columns.items()} for i in range(len(sizes))]
+
+    total = size(data)
+    if total != sum(sizes):
+        raise Unexpected(
+            f"Expected {sum(sizes)} rows in model output but got {total}",
+            {"type": str(type(data))},
+        )
+
+    parts = []
+    start = 0
+    for n in sizes:
+        if _is_frame(data):
+            parts.append(data.iloc[start : start + n])
+        else:
+            parts.append(data[start : start + n])
+        start += n
+    return parts
+
+
+def take(data: Any, indices: List[int]) -> Any:
+    """select rows of a model input or output by their position
+
+    Parameters
+    ----------
+    data : list, numpy.ndarray, pandas.DataFrame, pandas.Series or dict
+        a dict is indexed value by value
+    indices : list of int
+
+    Returns
+    -------
+    a new object of the same kind as data, containing only the given rows
+    """
+    if isinstance(data, dict):
+        return {k: take(v, indices) for k, v in data.items()}
+    if _is_frame(data):
+        return data.iloc[indices].reset_index(drop=True)
+    if _is_array(data):
+        return data[indices]
+    if isinstance(data, (list, tuple)):
+        return [data[i] for i in indices]
+    raise TypeError(f"Cannot select rows of objects of type {type(data)}")
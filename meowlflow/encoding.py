@@ -0,0 +1,208 @@
+import csv
+import io
+import json
+from typing import Any, Dict, List, Sequence
+
+from fastapi.encoders import jsonable_encoder
+
+from meowlflow.api import responses
+from meowlflow.data import isinstance_of
+from meowlflow.exception import UpstreamError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+# the wire formats of the inputs of `mlflow models serve`, set as the
+# `upstream_format` of a sidecar schema module
+PANDAS_RECORDS = "pandas-records"
+PANDAS_SPLIT = "pandas-split"
+CSV = "csv"
+TENSOR = "tensor"
+
+
+def _dumps(data: Any) -> bytes:
+    try:
+        return responses.dumps(data)
+    except TypeError:
+        # e.g. pydantic dataclasses when orjson is not installed
+        return responses.dumps(jsonable_encoder(data))
+
+
+def _loads(body: bytes) -> Any:
+    try:
+        if orjson is not None:
+            return orjson.loads(body)
+        return json.loads(body)
+    except ValueError as e:
+        raise UpstreamError(
+            "Invalid JSON response from upstream", {"error": str(e)}
+        ) from e
+
+
+def _is_numeric(frame: Any) -> bool:
+    """whether the columns of a frame share a numeric dtype, which NumPy keeps"""
+    from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+    dtypes = set(frame.dtypes)
+    if len(dtypes) != 1:
+        return False
+    (dtype,) = dtypes
+    return is_numeric_dtype(dtype) and not is_bool_dtype(dtype)
+
+
+def _columns(records: Sequence[Any]) -> List[str]:
+    """the keys of a list of records, in the order in which they first appear"""
+    columns: Dict[str, None] = {}
+    for record in records:
+        columns.update(dict.fromkeys(record))
+    return list(columns)
+
+
+class Encoder:
+    """Encode the output of `Request.transform` for the upstream, and decode
+    its predictions.
+
+    Outputs of `Request.transform` that are already encoded, i.e. strings or
+    bytes, are sent as they are with the content type of the encoder.
+    """
+
+    content_type = "application/json"
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, str):
+            return data.encode("utf-8")
+        return self._encode(data)
+
+    def _encode(self, data: Any) -> bytes:
+        return _dumps(data)
+
+    def decode(self, body: bytes) -> Any:
+        return _loads(body)
+
+
+class PandasRecordsEncoder(Encoder):
+    """A list of records, e.g. `[{"a": 1, "b": 2}, ...]`."""
+
+    content_type = "application/json; format=pandas-records"
+
+    def _encode(self, data: Any) -> bytes:
+        if isinstance_of(data, "pandas", "DataFrame"):
+            # pandas' encoder is vectorized, but rounds floats to the given number
+            # of significant digits, at most 15
+            body: str = data.to_json(orient="records", double_precision=15)
+            return body.encode("utf-8")
+        return _dumps(data)
+
+
+class PandasSplitEncoder(Encoder):
+    """The columns and the rows of values of a frame, e.g.
+    `{"columns": ["a", "b"], "data": [[1, 2], ...]}`."""
+
+    content_type = "application/json; format=pandas-split"
+
+    def _encode(self, data: Any) -> bytes:
+        if isinstance_of(data, "pandas", "DataFrame"):
+            if orjson is None:
+                return data.to_json(
+                    orient="split", index=False, double_precision=15
+                ).encode("utf-8")
+            # orjson encodes numeric arrays natively, and floats without rounding
+            import numpy
+
+            if _is_numeric(data):
+                values: Any = numpy.ascontiguousarray(data.to_numpy())
+            else:
+                # converted to Python objects, so that e.g. integer columns are not
+                # converted to floats like they would be by a numeric `to_numpy`
+                values = data.to_numpy(dtype=object).tolist()
+            return _dumps({"columns": data.columns.tolist(), "data": values})
+        if isinstance(data, (list, tuple)) and data and isinstance(data[0], dict):
+            columns = _columns(data)
+            return _dumps(
+                {
+                    "columns": columns,
+                    "data": [[record.get(c) for c in columns] for record in data],
+                }
+            )
+        return _dumps({"data": data})
+
+
+class CSVEncoder(Encoder):
+    """A CSV file with a header."""
+
+    content_type = "text/csv"
+
+    def _encode(self, data: Any) -> bytes:
+        buffer = io.BytesIO()
+        if isinstance_of(data, "pandas", "DataFrame"):
+            data.to_csv(buffer, index=False)
+            return buffer.getvalue()
+        if not isinstance(data, (list, tuple)) or not all(
+            isinstance(record, dict) for record in data
+        ):
+            raise TypeError(f"Cannot encode objects of type {type(data)} as CSV")
+        with io.TextIOWrapper(buffer, encoding="utf-8", newline="") as text:
+            writer = csv.DictWriter(text, fieldnames=_columns(data))
+            writer.writeheader()
+            writer.writerows(data)
+            text.flush()
+            return buffer.getvalue()
+
+
+class TensorEncoder(Encoder):
+    """The inputs of a tensor-based model, e.g. `{"inputs": [[1, 2], ...]}` or
+    `{"inputs": {"a": [1, ...], "b": [2, ...]}}`.
+
+    Predictions are decoded to NumPy arrays where possible, e.g. `[[1, 2], ...]`,
+    or `{"predictions": [1, ...]}` to `{"predictions": array([1, ...])}`.
+    """
+
+    def _encode(self, data: Any) -> bytes:
+        if isinstance_of(data, "pandas", "DataFrame", "Series"):
+            data = data.to_numpy()
+        return _dumps({"inputs": data})
+
+    def decode(self, body: bytes) -> Any:
+        predictions = _loads(body)
+        if isinstance(predictions, dict):
+            return {k: _to_array(v) for k, v in predictions.items()}
+        return _to_array(predictions)
+
+
+def _to_array(value: Any) -> Any:
+    """convert a list of numbers, or of lists of numbers, to a NumPy array"""
+    if not isinstance(value, list):
+        return value
+    import numpy
+
+    try:
+        array = numpy.asarray(value)
+    except ValueError:
+        # ragged lists
+        return value
+    if array.dtype.kind not in "biuf":
+        return value
+    return array
+
+
+ENCODERS: Dict[str, Encoder] = {
+    PANDAS_RECORDS: PandasRecordsEncoder(),
+    PANDAS_SPLIT: PandasSplitEncoder(),
+    CSV: CSVEncoder(),
+    TENSOR: TensorEncoder(),
+}
+
+
+def get_encoder(format: str = PANDAS_RECORDS) -> Encoder:
+    """the encoder of a wire format, see `ENCODERS`"""
+    try:
+        return ENCODERS[format]
+    except KeyError:
+        raise ValueError(
+            f"Unknown upstream format {format}, expected one of {list(ENCODERS)}"
+        ) from None
@@ -1,4 +1,4 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
 class MeowlflowException(Exception):
@@ -6,6 +6,9 @@ class MeowlflowException(Exception):
     errorcode = "internal-error"
     message: str
     payload: Any
+    headers: Optional[Dict[str, str]] = None
+    # whether the error is logged and passed to the error-handling integrations
+    reported = True
 
     def __init__(self, message: str, payload: Any = None):
         super().__init__()
@@ -56,3 +59,43 @@ class Unsupported(MeowlflowException):
 class Unexpected(MeowlflowException):
     status_code = 500
     errorcode = "unexpected-error"
+
+
+class NotReady(MeowlflowException):
+    status_code = 503
+    errorcode = "not-ready"
+    reported = False
+
+
+class UpstreamError(MeowlflowException):
+    status_code = 502
+    errorcode = "upstream-error"
+
+
+class UpstreamRejected(MeowlflowException):
+    # the upstream answered with a 4xx status, which is forwarded to the client
+    status_code = 400
+    errorcode = "upstream-rejected"
+
+    def __init__(self, message: str, payload: Any = None, status_code: int = 400):
+        super().__init__(message, payload)
+        self.status_code = status_code
+
+
+class UpstreamUnavailable(MeowlflowException):
+    status_code = 503
+    errorcode = "upstream-unavailable"
+    # every upstream is known to be failing, which has been reported already
+    reported = False
+
+
+class Overloaded(MeowlflowException):
+    status_code = 503
+    errorcode = "overloaded"
+    # shedding load is expected under load, and reporting every shed request
+    # would only add to it
+    reported = False
+
+    def __init__(self, message: str, payload: Any = None, retry_after: int = 1):
+        super().__init__(message, payload)
+        self.headers = {"Retry-After": str(retry_after)}
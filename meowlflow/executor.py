@@ -0,0 +1,150 @@
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+from typing import Any, Callable, Optional, TypeVar
+
+import click
+from mlflow.models import Model
+from mlflow.models.model import MLMODEL_FILE_NAME
+from mlflow.pyfunc import (
+    PyFuncModel,
+    load_model,
+)
+from mlflow.utils.file_utils import local_file_uri_to_path
+
+
+RT = TypeVar("RT")
+
+KINDS = ["inline", "thread", "process"]
+
+# the model loaded by each process of a process pool
+_model: Optional[PyFuncModel] = None
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--predict-workers",
+        default=1,
+        type=int,
+        show_default=True,
+        help="number of threads or processes used to run predictions",
+    )(function)
+    function = click.option(
+        "--predict-executor",
+        default="inline",
+        type=click.Choice(KINDS, case_sensitive=False),
+        show_default=True,
+        help="where to run predictions: on the event loop, in a thread pool or in a \
+process pool with one copy of the model per process",
+    )(function)
+    return function
+
+
+class _Unloaded:
+    def predict(self, data: Any) -> Any:
+        raise RuntimeError("The model is only loaded by the processes of the executor")
+
+
+def load_metadata(model_uri: str) -> PyFuncModel:
+    """a model with the metadata of a local model, without loading the model
+
+    The processes of the process executor load the model on their own, so the
+    process starting them only needs its metadata, e.g. to identify its version.
+    The returned model cannot predict.
+    """
+    path = local_file_uri_to_path(model_uri)
+    metadata = Model.load(os.path.join(path, MLMODEL_FILE_NAME))
+    return PyFuncModel(model_meta=metadata, model_impl=_Unloaded())
+
+
+def _init_worker(model_uri: str) -> None:
+    global _model
+    _model = load_model(model_uri)
+
+
+def _predict(data: Any) -> Any:
+    assert _model is not None
+    return _model.predict(data)
+
+
+def _ready() -> None:
+    pass
+
+
+class Predictor:
+    """Run the predictions of a pyfunc model.
+
+    Parameters
+    ----------
+    model : PyFuncModel
+        the model, used directly by the inline and thread executors; the process
+        executor only needs its metadata, see `load_metadata`
+    model_uri : str
+        local URI of the model, loaded once by every process of the process
+        executor
+    kind : str in {"inline", "thread", "process"}, default: "inline"
+        "inline" calls the model on the event loop and blocks it for the duration
+        of the prediction; "thread" runs the model in a thread pool, which helps
+        models that release the GIL; "process" runs the model in a pool of
+        processes, so that CPU-bound models can use several cores
+    workers : int, default: 1
+        size of the thread or process pool
+    """
+
+    def __init__(
+        self,
+        model: PyFuncModel,
+        model_uri: str,
+        kind: str = "inline",
+        workers: int = 1,
+    ) -> None:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown executor {kind}, expected one of {KINDS}")
+        self.model = model
+        self.model_uri = model_uri
+        self.kind = kind
+        self.workers = workers
+        self._pool: Optional[concurrent.futures.Executor] = None
+
+    async def startup(self) -> None:
+        if self.kind == "thread":
+            self._pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="meowlflow-predict",
+            )
+        elif self.kind == "process":
+            # processes are spawned rather than forked, since forking a process
+            # that runs an event loop and other threads is unsafe
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_uri,),
+            )
+            # start every process and wait until all of them have loaded the model
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                *[loop.run_in_executor(self._pool, _ready) for _ in range(self.workers)]
+            )
+
+    async def shutdown(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            # waiting for the workers to exit would block the event loop, and the
+            # other shutdown handlers
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, functools.partial(pool.shutdown, wait=True)
+            )
+
+    async def predict(self, data: Any) -> Any:
+        if self._pool is None:
+            return self.model.predict(data)
+        loop = asyncio.get_running_loop()
+        if self.kind == "process":
+            # inputs and outputs are pickled; NumPy arrays and pandas objects are
+            # shipped as contiguous buffers rather than row by row
+            return await loop.run_in_executor(self._pool, _predict, data)
+        return await loop.run_in_executor(self._pool, self.model.predict, data)
@@ -0,0 +1,664 @@
+import abc
+import asyncio
+from collections import OrderedDict
+import concurrent.futures
+import functools
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import socket
+import sqlite3
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+import uuid
+
+import click
+from fastapi import FastAPI
+from prometheus_client import Counter, Gauge, Histogram
+
+from meowlflow.exception import MeowlflowException, Overloaded, Unexpected
+
+
+RT = TypeVar("RT")
+
+# the statuses of a job, in the order in which they are reached
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JOBS_SUBMITTED = Counter(
+    "meowlflow_jobs_submitted_total",
+    "Number of inference jobs submitted",
+    ("endpoint",),
+)
+JOBS_REJECTED = Counter(
+    "meowlflow_jobs_rejected_total",
+    "Number of inference jobs rejected because the job queue was full",
+    ("endpoint",),
+)
+JOBS_FINISHED = Counter(
+    "meowlflow_jobs_finished_total",
+    "Number of inference jobs that finished, by status",
+    ("endpoint", "status"),
+)
+JOBS_QUEUED = Gauge(
+    "meowlflow_jobs_queued",
+    "Number of inference jobs waiting to run",
+    multiprocess_mode="livesum",
+)
+JOBS_RUNNING = Gauge(
+    "meowlflow_jobs_running",
+    "Number of inference jobs running",
+    multiprocess_mode="livesum",
+)
+JOB_QUEUE_WAIT = Histogram(
+    "meowlflow_job_queue_wait_seconds",
+    "Time an inference job spent waiting in the job queue",
+    ("endpoint",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+JOB_STORE_EVICTIONS = Counter(
+    "meowlflow_job_store_evictions_total",
+    "Number of finished jobs removed from the job store",
+    ("reason",),
+)
+
+# bounds of the interval at which jobs run by other workers are polled
+_MIN_POLL_INTERVAL = 0.05
+_MAX_POLL_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--jobs-sqlite-path",
+        default=None,
+        type=click.Path(dir_okay=False),
+        help="SQLite file in which jobs are kept, which is shared by all workers; \
+by default, jobs are kept in the memory of the worker that runs them",
+    )(function)
+    function = click.option(
+        "--jobs-ttl",
+        default=3600.0,
+        type=float,
+        show_default=True,
+        help="seconds for which finished jobs and their results are kept",
+    )(function)
+    function = click.option(
+        "--jobs-max-bytes",
+        default=100 * 1024 * 1024,
+        type=int,
+        show_default=True,
+        help="maximum size of the results of the jobs kept; the jobs that finished \
+first are removed beyond it",
+    )(function)
+    function = click.option(
+        "--jobs-max-queue",
+        default=100,
+        type=int,
+        show_default=True,
+        help="maximum number of jobs waiting to run in each worker, beyond which \
+jobs are rejected",
+    )(function)
+    function = click.option(
+        "--jobs-workers",
+        default=0,
+        type=int,
+        show_default=True,
+        help="number of jobs run at once by each worker; jobs are submitted to the \
+/jobs companion of the inference endpoint, which is disabled by 0",
+    )(function)
+    return function
+
+
+def parse_kwargs(**kwargs: Any) -> Dict[str, Any]:
+    jobs_kwargs = {}
+    for k, v in kwargs.items():
+        if k.startswith("jobs_"):
+            key = k[len("jobs_") :]
+            jobs_kwargs[key] = v
+    return jobs_kwargs
+
+
+class Job:
+    """An inference job and, once it has finished, its result or error.
+
+    The result is the JSON body of the response of the inference endpoint, and
+    the error the dict of a `MeowlflowException`. Times are UNIX timestamps.
+    """
+
+    __slots__ = (
+        "id",
+        "endpoint",
+        "status",
+        "priority",
+        "created_at",
+        "started_at",
+        "finished_at",
+        "result",
+        "error",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        endpoint: str,
+        priority: int = 0,
+        status: str = QUEUED,
+        created_at: Optional[float] = None,
+        started_at: Optional[float] = None,
+        finished_at: Optional[float] = None,
+        result: Optional[bytes] = None,
+        error: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.id = id
+        self.endpoint = endpoint
+        self.priority = priority
+        self.status = status
+        self.created_at = time.time() if created_at is None else created_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.result = result
+        self.error = error
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    @property
+    def size(self) -> int:
+        """the size of the result of the job, or of its error"""
+        if self.result is not None:
+            return len(self.result)
+        if self.error is not None:
+            return len(json.dumps(self.error))
+        return 0
+
+
+class JobStore(abc.ABC):
+    """Keep jobs and the results of finished jobs.
+
+    Finished jobs are removed once they are older than `ttl` seconds, and the
+    jobs that finished first are removed when the results of the jobs exceed
+    `max_bytes`. Jobs that have not finished are kept.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = 0.0) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    @abc.abstractmethod
+    def put(self, job: Job) -> None:
+        """add or update a job"""
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """the job with the given id, or None if it is unknown or was removed"""
+
+    def recover(self) -> List[Job]:
+        """fail the jobs left unfinished by workers that are no longer running
+
+        Returns
+        -------
+        the jobs that failed
+        """
+        return []
+
+    def close(self) -> None:
+        pass
+
+    async def run(self, function: Callable[..., RT], *args: Any) -> RT:
+        """call a method of the store from the event loop
+
+        Stores whose methods block, e.g. on disk, call them in a thread.
+        """
+        return function(*args)
+
+    def _expires_at(self, job: Job) -> Optional[float]:
+        if job.finished_at is None or self.ttl <= 0:
+            return None
+        return job.finished_at + self.ttl
+
+
+class MemoryJobStore(JobStore):
+    """A job store in the memory of the worker, see `JobStore`."""
+
+    def __init__(self, max_bytes: int, ttl: float = 0.0) -> None:
+        super().__init__(max_bytes, ttl)
+        self.size = 0
+        self._jobs: Dict[str, Job] = {}
+        # the finished jobs, in the order in which they finished
+        self._finished: "OrderedDict[str, Optional[float]]" = OrderedDict()
+
+    def put(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        if not job.finished or job.id in self._finished:
+            return
+        self._finished[job.id] = self._expires_at(job)
+        self.size += job.size
+        self._expire()
+        while self.size > self.max_bytes and self._finished:
+            self._evict(next(iter(self._finished)), "size")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._finished:
+            job_id, expires_at = next(iter(self._finished.items()))
+            if expires_at is None or expires_at > now:
+                return
+            self._evict(job_id, "expired")
+
+    def _evict(self, job_id: str, reason: str) -> None:
+        del self._finished[job_id]
+        self.size -= self._jobs.pop(job_id).size
+        JOB_STORE_EVICTIONS.labels(reason).inc()
+
+
+class SQLiteJobStore(JobStore):
+    """A job store in a SQLite file, which can be shared by several workers, see
+    `JobStore`.
+
+    Each process opens its own connection, on first use, so that the store can
+    be created before the workers are forked, and makes its calls from the event
+    loop in a thread of its own, see `run`.
+
+    The host and process of the worker that last wrote a job are kept with it,
+    so that `recover` can fail the jobs of workers that stopped, e.g. crashed,
+    before their jobs finished.
+    """
+
+    def __init__(
+        self, path: Union[str, Path], max_bytes: int, ttl: float = 0.0
+    ) -> None:
+        super().__init__(max_bytes, ttl)
+        self.path = str(path)
+        self._host = socket.gethostname()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_pid = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            # autocommit, since every statement is a transaction of its own
+            connection = sqlite3.connect(
+                self.path, timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            # readers do not block the writer, and vice versa
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    expires_at REAL,
+                    result BLOB,
+                    error TEXT,
+                    size INTEGER NOT NULL,
+                    host TEXT NOT NULL,
+                    pid INTEGER NOT NULL
+                )"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)"
+            )
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def put(self, job: Job) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO jobs "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job.id,
+                job.endpoint,
+                job.status,
+                job.priority,
+                job.created_at,
+                job.started_at,
+                job.finished_at,
+                self._expires_at(job),
+                job.result,
+                None if job.error is None else json.dumps(job.error),
+                job.size,
+                self._host,
+                os.getpid(),
+            ),
+        )
+        if job.finished:
+            self._expire()
+            self._evict_to_size()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self.connection.execute(
+            "SELECT id, endpoint, priority, status, created_at, started_at, "
+            "finished_at, result, error, expires_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        *values, error, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self._expire()
+            return None
+        job = Job(*values)
+        job.error = None if error is None else json.loads(error)
+        return job
+
+    def recover(self) -> List[Job]:
+        rows = self.connection.execute(
+            "SELECT id, pid FROM jobs WHERE finished_at IS NULL AND host = ?",
+            (self._host,),
+        ).fetchall()
+        error = Unexpected("The worker running the job stopped before it finished")
+        failed = []
+        for job_id, pid in rows:
+            # the jobs of this process, e.g. of a worker whose pid is reused, are
+            # from another run
+            if pid != os.getpid() and _is_running(pid):
+                continue
+            job = self.get(job_id)
+            if job is None or job.finished:
+                continue
+            job.status, job.error, job.finished_at = (
+                FAILED,
+                error.to_dict(),
+                time.time(),
+            )
+            # unless another worker recovered it first
+            updated = self.connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ?, "
+                "error = ?, size = ? WHERE id = ? AND finished_at IS NULL",
+                (
+                    job.status,
+                    job.finished_at,
+                    self._expires_at(job),
+                    json.dumps(job.error),
+                    job.size,
+                    job.id,
+                ),
+            ).rowcount
+            if updated > 0:
+                failed.append(job)
+        if failed:
+            self._evict_to_size()
+        return failed
+
+    def _expire(self) -> None:
+        expired = self.connection.execute(
+            "DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+        if expired > 0:
+            JOB_STORE_EVICTIONS.labels("expired").inc(expired)
+
+    def _evict_to_size(self) -> None:
+        (size,) = self.connection.execute("SELECT TOTAL(size) FROM jobs").fetchone()
+        if size <= self.max_bytes:
+            return
+        evicted: List[str] = []
+        for job_id, job_size in self.connection.execute(
+            "SELECT id, size FROM jobs WHERE finished_at IS NOT NULL "
+            "ORDER BY finished_at"
+        ):
+            if size <= self.max_bytes:
+                break
+            evicted.append(job_id)
+            size -= job_size
+        self.connection.executemany(
+            "DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in evicted]
+        )
+        JOB_STORE_EVICTIONS.labels("size").inc(len(evicted))
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        if self._executor is not None and self._executor_pid == os.getpid():
+            # without waiting, since the store may be closed from its own thread
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+    async def run(self, function: Callable[..., RT], *args: Any) -> RT:
+        if self._executor is None or self._executor_pid != os.getpid():
+            # a single thread keeps the calls of the process in order
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                1, thread_name_prefix="meowlflow-jobs"
+            )
+            self._executor_pid = os.getpid()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args)
+        )
+
+
+def _is_running(pid: int) -> bool:
+    """whether a process of this host is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process of another user
+        return True
+    return True
+
+
+Run = Callable[[], Awaitable[bytes]]
+
+
+class JobQueue:
+    """Run inference jobs in the background, by priority, on a bounded pool of
+    workers, and keep them in a `JobStore`.
+
+    Each worker process runs the jobs submitted to it: jobs with a higher
+    priority run first, and jobs of the same priority in the order in which
+    they were submitted. At most `max_queue` jobs wait to run; further jobs are
+    rejected with an `Overloaded` error. Jobs that have not finished when the
+    queue is shut down fail, and so do the jobs of the stopped workers of this
+    host that the store still has as unfinished once the queue starts up, see
+    `JobStore.recover`.
+
+    The queue must be started on the event loop that runs the jobs, so
+    `startup` and `shutdown` should be registered as application event
+    handlers, e.g. with `attach`.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 1, max_queue: int = 100) -> None:
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: Optional["asyncio.PriorityQueue[Tuple[int, int, str]]"] = None
+        self._order = itertools.count()
+        # the number of jobs submitted that have not started, including those
+        # that are being added to the store
+        self._waiting = 0
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        # the jobs of this process that have not finished, with the function
+        # running each job and an event set once it has finished
+        self._jobs: Dict[str, Tuple[Job, Run, asyncio.Event]] = {}
+
+    def attach(self, app: FastAPI) -> None:
+        """start the queue with the app, and shut it down before the other
+        shutdown handlers of the app, which may be needed by running jobs"""
+        app.on_event("startup")(self.startup)
+        app.router.on_shutdown.insert(0, self.shutdown)
+
+    async def startup(self) -> None:
+        for job in await self.store.run(self.store.recover):
+            logger.warning(f"Failed job {job.id}, whose worker stopped while it ran")
+            JOBS_FINISHED.labels(job.endpoint, job.status).inc()
+        self._queue = asyncio.PriorityQueue()
+        loop = asyncio.get_running_loop()
+        self._tasks = {loop.create_task(self._work()) for _ in range(self.workers)}
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = set()
+        for job, _, event in list(self._jobs.values()):
+            await self._finish(
+                job,
+                event,
+                error=Unexpected("The server shut down before the job finished"),
+            )
+        await self.store.run(self.store.close)
+
+    async def submit(self, endpoint: str, run: Run, priority: int = 0) -> Job:
+        """queue a job running the given function, which returns its result"""
+        if self._queue is None:
+            raise RuntimeError("The job queue has not been started")
+        if self._waiting >= self.max_queue:
+            JOBS_REJECTED.labels(endpoint).inc()
+            raise Overloaded("The job queue is full")
+        job = Job(uuid.uuid4().hex, endpoint, priority)
+        self._waiting += 1
+        try:
+            await self.store.run(self.store.put, job)
+        except BaseException:
+            self._waiting -= 1
+            raise
+        self._jobs[job.id] = (job, run, asyncio.Event())
+        self._queue.put_nowait((-priority, next(self._order), job.id))
+        JOBS_SUBMITTED.labels(endpoint).inc()
+        JOBS_QUEUED.inc()
+        return job
+
+    async def wait(self, job_id: str, timeout: float = 0.0) -> Optional[Job]:
+        """the job with the given id, once it has finished or after `timeout`
+        seconds, or None if it is unknown
+
+        Jobs run by another worker, which shares a SQLite store, are polled.
+        """
+        job = await self.store.run(self.store.get, job_id)
+        deadline = time.monotonic() + timeout
+        interval = _MIN_POLL_INTERVAL
+        while job is not None and not job.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if job_id in self._jobs:
+                _, _, event = self._jobs[job_id]
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(interval, remaining))
+                interval = min(interval * 2, _MAX_POLL_INTERVAL)
+            job = await self.store.run(self.store.get, job_id)
+        return job
+
+    async def _work(self) -> None:
+        assert self._queue is not None
+        while True:
+            _, _, job_id = await self._queue.get()
+            self._waiting -= 1
+            JOBS_QUEUED.dec()
+            job, run, event = self._jobs[job_id]
+            job.status, job.started_at = RUNNING, time.time()
+            JOB_QUEUE_WAIT.labels(job.endpoint).observe(job.started_at - job.created_at)
+            JOBS_RUNNING.inc()
+            try:
+                await self.store.run(self.store.put, job)
+                result = await run()
+            except MeowlflowException as e:
+                if e.reported:
+                    logger.exception(e)
+                await self._finish(job, event, error=e)
+            except Exception as e:
+                logger.exception(e)
+                await self._finish(
+                    job,
+                    event,
+                    error=Unexpected("Unexpected error while running the job"),
+                )
+            else:
+                await self._finish(job, event, result=result)
+            finally:
+                JOBS_RUNNING.dec()
+
+    async def _finish(
+        self,
+        job: Job,
+        event: asyncio.Event,
+        result: Optional[bytes] = None,
+        error: Optional[MeowlflowException] = None,
+    ) -> None:
+        if job.status == QUEUED:
+            JOBS_QUEUED.dec()
+        job.finished_at = time.time()
+        if error is None and result is not None and len(result) > self.store.max_bytes:
+            error = Unexpected(
+                "The result of the job is larger than the job store",
+                {"size": len(result)},
+            )
+        if error is None:
+            job.status, job.result = SUCCEEDED, result
+        else:
+            job.status, job.error = FAILED, error.to_dict()
+        # the job is done with in this process even if it cannot be stored
+        del self._jobs[job.id]
+        try:
+            await self.store.run(self.store.put, job)
+        finally:
+            JOBS_FINISHED.labels(job.endpoint, job.status).inc()
+            event.set()
+
+
+def create(
+    workers: int = 0,
+    max_queue: int = 100,
+    max_bytes: int = 100 * 1024 * 1024,
+    ttl: float = 3600.0,
+    sqlite_path: Optional[str] = None,
+    processes: int = 1,
+) -> Optional[JobQueue]:
+    """create the job queue of the command line options, see `options`
+
+    Parameters
+    ----------
+    processes : int, default: 1
+        number of worker processes of the server, which must share a SQLite
+        store so that the jobs run by one can be read by the others
+
+    Returns
+    -------
+    JobQueue, or None if jobs are disabled
+    """
+    if workers <= 0:
+        return None
+    store: JobStore
+    if sqlite_path:
+        store = SQLiteJobStore(sqlite_path, max_bytes, ttl)
+    elif processes > 1:
+        raise click.UsageError(
+            "--jobs-workers requires --jobs-sqlite-path with --workers"
+        )
+    else:
+        store = MemoryJobStore(max_bytes, ttl)
+    return JobQueue(store, workers=workers, max_queue=max_queue)
@@ -0,0 +1,300 @@
+import asyncio
+from collections import OrderedDict
+import logging
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+
+import click
+from mlflow.pyfunc import PyFuncModel
+from mlflow.utils.file_utils import local_file_uri_to_path
+from prometheus_client import Counter, Gauge
+from pydantic import BaseModel, Field
+import yaml
+
+from meowlflow import executor
+
+
+RT = TypeVar("RT")
+
+MODELS_LOADED = Gauge(
+    "meowlflow_manifest_models_loaded",
+    "Number of models of the manifest that are loaded",
+    multiprocess_mode="livesum",
+)
+MODEL_BYTES = Gauge(
+    "meowlflow_manifest_model_bytes",
+    "Size on disk of the models of the manifest that are loaded",
+    multiprocess_mode="livesum",
+)
+MODEL_LOADS = Counter(
+    "meowlflow_manifest_model_loads_total",
+    "Number of times a model of the manifest was loaded",
+    ("endpoint",),
+)
+MODEL_EVICTIONS = Counter(
+    "meowlflow_manifest_model_evictions_total",
+    "Number of times a model of the manifest was unloaded to stay within the \
+memory budget",
+    ("endpoint",),
+)
+
+# loads a model from a URI into a directory, returning the model and its local URI
+Load = Callable[[str, str], Tuple[PyFuncModel, str]]
+# creates a started predictor for a model and its local URI
+Start = Callable[[PyFuncModel, str], Awaitable[executor.Predictor]]
+# releases the local URI of a model once it is unloaded
+Release = Callable[[str], None]
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--manifest-memory-budget-mb",
+        default=0.0,
+        type=float,
+        show_default=True,
+        help="total size of the models of the manifest kept loaded, beyond which \
+the least recently used models are unloaded; 0 keeps every model loaded",
+    )(function)
+    function = click.option(
+        "--manifest",
+        default=None,
+        type=click.Path(exists=True, dir_okay=False),
+        help="YAML file mapping endpoints to a model and a schema, to serve \
+several models from one server instead of --endpoint, --model-path and \
+--schema-path",
+    )(function)
+    return function
+
+
+class Entry(BaseModel):
+    model: str = Field(..., description="local path or URI of the model")
+    schema_path: Path = Field(..., alias="schema")
+    warm_up_path: Optional[Path] = Field(None, alias="warm_up")
+
+
+class Manifest(BaseModel):
+    __root__: Dict[str, Entry]
+
+
+def load_manifest(manifest_path: Path) -> Dict[str, Entry]:
+    """read a manifest of the models to serve
+
+    The manifest maps endpoints to the path or URI of a model, the path of a
+    schema module and, optionally, the path of a JSON request used to warm up
+    the model; relative paths, including the local paths of models, are
+    relative to the manifest, e.g.:
+
+    ```yaml
+    /wine:
+      model: models:/wine/Production
+      schema: schemas/wine.py
+      warm_up: requests/wine.json
+    /documents:
+      model: models/documents
+      schema: schemas/documents.py
+    ```
+    """
+    with open(manifest_path) as f:
+        entries = Manifest.parse_obj(yaml.safe_load(f)).__root__
+    directory = Path(manifest_path).parent
+    for endpoint, entry in entries.items():
+        if not urlparse(entry.model).scheme:
+            entry.model = str(directory / entry.model)
+        entry.schema_path = directory / entry.schema_path
+        if not entry.schema_path.is_file():
+            raise FileNotFoundError(
+                f"Schema {entry.schema_path} of endpoint {endpoint} does not exist"
+            )
+        if entry.warm_up_path is not None:
+            entry.warm_up_path = directory / entry.warm_up_path
+    return entries
+
+
+def _size(model_uri: str) -> int:
+    """the size on disk of a local model, used as an estimate of its memory"""
+    path = local_file_uri_to_path(model_uri)
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+class _Loaded:
+    def __init__(
+        self, predictor: executor.Predictor, version: str, path: str, size: int
+    ) -> None:
+        self.predictor = predictor
+        self.version = version
+        self.path = path
+        self.size = size
+        self.in_flight = 0
+
+
+class ModelPool:
+    """Load the models of a manifest when they are first used.
+
+    Models are loaded on the first prediction of their endpoint, and the least
+    recently used models whose predictions have completed are unloaded whenever
+    the total size on disk of the loaded models exceeds the memory budget.
+
+    Parameters
+    ----------
+    output_path : str
+        local directory into which models are downloaded
+    load : callable
+        function loading a model from a path into a directory, see
+        `serve.load_model_artifact`
+    start : callable
+        coroutine function creating and starting a predictor for a model
+    version_of : callable
+        function returning the version of a model, see `serve.model_version`
+    memory_budget : int, default: 0
+        bytes of models kept loaded, 0 keeps every model loaded
+    release : callable, default: None
+        function called with the local URI of a model once it is unloaded, see
+        `serve.release_model_artifact`
+    logger : logging.Logger, default: None
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        load: Load,
+        start: Start,
+        version_of: Callable[[PyFuncModel, str], str],
+        memory_budget: int = 0,
+        release: Optional[Release] = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.output_path = output_path
+        self.memory_budget = memory_budget
+        self._load = load
+        self._start = start
+        self._version_of = version_of
+        self._release = release
+        self._logger = logger or logging.getLogger(__name__)
+        self._loaded: "OrderedDict[str, _Loaded]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._size = 0
+
+    def predictor(self, endpoint: str, model_path: str) -> "LazyPredictor":
+        return LazyPredictor(self, endpoint, model_path)
+
+    async def shutdown(self) -> None:
+        while self._loaded:
+            await self._unload(next(iter(self._loaded)))
+
+    async def predict(
+        self,
+        endpoint: str,
+        model_path: str,
+        data: Any,
+        on_load: List[Callable[[str], Any]],
+    ) -> Any:
+        loaded = self._loaded.get(endpoint)
+        if loaded is None:
+            loaded = await self._acquire(endpoint, model_path, on_load)
+        self._loaded.move_to_end(endpoint)
+        loaded.in_flight += 1
+        try:
+            return await loaded.predictor.predict(data)
+        finally:
+            loaded.in_flight -= 1
+
+    async def _acquire(
+        self, endpoint: str, model_path: str, on_load: List[Callable[[str], Any]]
+    ) -> _Loaded:
+        lock = self._locks.setdefault(endpoint, asyncio.Lock())
+        async with lock:
+            loaded = self._loaded.get(endpoint)
+            if loaded is not None:
+                # loaded by a concurrent request
+                return loaded
+
+            self._logger.info(f"Loading model {model_path} of endpoint {endpoint}")
+            loop = asyncio.get_running_loop()
+            path = tempfile.mkdtemp(dir=self.output_path)
+            try:
+                model, model_uri = await loop.run_in_executor(
+                    None, self._load, model_path, path
+                )
+                try:
+                    size = _size(model_uri)
+                    await self._evict(size)
+                    predictor = await self._start(model, model_uri)
+                except BaseException:
+                    if self._release is not None:
+                        self._release(model_uri)
+                    raise
+            except BaseException:
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+
+            loaded = _Loaded(predictor, self._version_of(model, model_uri), path, size)
+            self._loaded[endpoint] = loaded
+            self._size += size
+            MODELS_LOADED.inc()
+            MODEL_BYTES.inc(size)
+            MODEL_LOADS.labels(endpoint).inc()
+            for callback in on_load:
+                callback(loaded.version)
+            return loaded
+
+    async def _evict(self, size: int) -> None:
+        """unload idle models until a model of the given size fits in the budget"""
+        if not self.memory_budget:
+            return
+        for endpoint, loaded in list(self._loaded.items()):
+            if self._size + size <= self.memory_budget:
+                return
+            if loaded.in_flight == 0:
+                self._logger.info(f"Unloading model of endpoint {endpoint}")
+                MODEL_EVICTIONS.labels(endpoint).inc()
+                await self._unload(endpoint)
+        if self._size + size > self.memory_budget:
+            self._logger.warning(
+                "Loaded models exceed the memory budget of "
+                f"{self.memory_budget} bytes: {self._size + size} bytes"
+            )
+
+    async def _unload(self, endpoint: str) -> None:
+        loaded = self._loaded.pop(endpoint)
+        self._size -= loaded.size
+        MODELS_LOADED.dec()
+        MODEL_BYTES.dec(loaded.size)
+        await loaded.predictor.shutdown()
+        if self._release is not None:
+            self._release(loaded.predictor.model_uri)
+        shutil.rmtree(loaded.path, ignore_errors=True)
+
+
+class LazyPredictor:
+    """Run the predictions of an endpoint with the model loaded by a pool."""
+
+    def __init__(self, pool: ModelPool, endpoint: str, model_path: str) -> None:
+        self.pool = pool
+        self.endpoint = endpoint
+        self.model_path = model_path
+        self._version = ""
+        self._callbacks: List[Callable[[str], Any]] = [self._set_version]
+
+    def _set_version(self, version: str) -> None:
+        self._version = version
+
+    def get_version(self) -> str:
+        """the version of the model last loaded, or "" if it was never loaded"""
+        return self._version
+
+    def on_load(self, callback: Callable[[str], Any]) -> None:
+        """call a function with the version of the model whenever it is loaded"""
+        self._callbacks.append(callback)
+
+    async def predict(self, data: Any) -> Any:
+        return await self.pool.predict(
+            self.endpoint, self.model_path, data, self._callbacks
+        )
@@ -0,0 +1,91 @@
+import json
+from typing import Any, AsyncIterator, List
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from meowlflow import data
+
+
+MEDIA_TYPE = "application/x-ndjson"
+
+
+class DecodeError(Exception):
+    """a line of a newline-delimited JSON stream is not a JSON document"""
+
+
+class NDJSONResponse(StreamingResponse):
+    """Stream newline-delimited JSON while the request body is still being read.
+
+    Unlike StreamingResponse, this response does not listen for the client to
+    disconnect while streaming, since doing so would consume the request body.
+    """
+
+    media_type = MEDIA_TYPE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def records(stream: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """decode newline-delimited JSON records from a stream of bytes
+
+    Only the current, incomplete line is buffered, so memory use does not grow
+    with the length of the stream. Lines that are not JSON documents raise a
+    DecodeError.
+    """
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _loads(line)
+    if buffer.strip():
+        yield _loads(buffer)
+
+
+def _loads(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        # JSON and Unicode decoding errors
+        raise DecodeError(str(e)) from e
+
+
+async def chunks(stream: AsyncIterator[bytes], size: int) -> AsyncIterator[List[Any]]:
+    """group the newline-delimited JSON records of a stream into lists of records"""
+    chunk: List[Any] = []
+    async for record in records(stream):
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rows(outputs: Any, n: int) -> List[Any]:
+    """split model outputs into one part per input row, if the rows can be counted
+
+    Parameters
+    ----------
+    outputs : Any
+        output of a model for n input rows
+    n : int
+        number of input rows
+
+    Returns
+    -------
+    list of n single-row outputs, or a list containing only the given outputs if
+    they do not have exactly one row per input row
+    """
+    if isinstance(outputs, dict):
+        sizes = {data.size(v) for v in outputs.values()}
+    else:
+        sizes = {data.size(outputs)}
+    if sizes != {n}:
+        return [outputs]
+    return data.split(outputs, [1] * n)
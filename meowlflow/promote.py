@@ -1,11 +1,16 @@
+import concurrent.futures
+import functools
 import sys
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import click
 from mlflow.entities import Run
+from mlflow.tracking import MlflowClient
 from mlflow.tracking._model_registry.client import ModelRegistryClient
 from mlflow.entities.model_registry import ModelVersion
 import mlflow
+from pydantic import BaseModel, Field, validator
+import yaml
 
 
 _COMPARE = {
@@ -14,8 +19,24 @@ _COMPARE = {
 }
 
 
+@functools.lru_cache(maxsize=None)
+def _registry(registry_uri: str) -> ModelRegistryClient:
+    return ModelRegistryClient(registry_uri)
+
+
+@functools.lru_cache(maxsize=None)
+def _client(tracking_uri: str) -> MlflowClient:
+    return MlflowClient(tracking_uri)
+
+
 def _get_registry() -> ModelRegistryClient:
-    return ModelRegistryClient(mlflow.get_registry_uri())
+    """the registry client of the current registry URI, reused across calls"""
+    return _registry(mlflow.get_registry_uri())
+
+
+def _get_client() -> MlflowClient:
+    """the tracking client of the current tracking URI, reused across calls"""
+    return _client(mlflow.get_tracking_uri())
 
 
 def get_run_by_sha(commit: str, experiment_id: int) -> Run:
@@ -30,13 +51,16 @@ def get_run_by_sha(commit: str, experiment_id: int) -> Run:
     -------
     mlflow Run instance
     """
-    run = mlflow.search_runs(
-        [int(experiment_id)],
+    runs = _get_client().search_runs(
+        [str(experiment_id)],
         filter_string=f'tags.mlflow.source.git.commit = "{commit}"',
         max_results=1,
-        output_format="list",
-    )[0]
-    return run
+    )
+    if not runs:
+        raise ValueError(
+            f"Found no run for commit {commit} in experiment {experiment_id}"
+        )
+    return runs[0]
 
 
 def get_run_by_stage(stage: str, model_name: str, auto_create: bool) -> Optional[Run]:
@@ -54,20 +78,31 @@ def get_run_by_stage(stage: str, model_name: str, auto_create: bool) -> Optional
     -------
     mlflow Run instance or None
     """
+    found, run = _find_staged_run(stage, model_name)
+    if not found:
+        _create_registered_model(model_name, auto_create)
+    return run
+
+
+def _find_staged_run(stage: str, model_name: str) -> Tuple[bool, Optional[Run]]:
+    """whether the model is registered, and the run of its version in the stage"""
     rms = _get_registry().search_registered_models(
         filter_string=f"name='{model_name}'",
         max_results=1,
     )
     if not rms:
-        if not auto_create:
-            raise ValueError(f"Found no registered model with name: {model_name}")
-        _get_registry().create_registered_model(model_name)
-        return None
+        return False, None
 
     for version in rms[0].latest_versions:
         if version.current_stage.lower() == stage.lower():
-            return mlflow.get_run(version.run_id)
-    return None
+            return True, _get_client().get_run(version.run_id)
+    return True, None
+
+
+def _create_registered_model(model_name: str, auto_create: bool) -> None:
+    if not auto_create:
+        raise ValueError(f"Found no registered model with name: {model_name}")
+    _get_registry().create_registered_model(model_name)
 
 
 def register_model(run: Run, model_name: str) -> ModelVersion:
@@ -86,6 +121,57 @@ def register_model(run: Run, model_name: str) -> ModelVersion:
     return _get_registry().create_model_version(model_name, model_uri, run.info.run_id)
 
 
+def promote(
+    commit: str,
+    experiment_id: int,
+    model_name: str,
+    metric: str = "test_f1",
+    direction: str = "maximize",
+    stage: str = "staging",
+    force: bool = False,
+    auto_create: bool = True,
+) -> Optional[ModelVersion]:
+    """register and promote the model of a commit if it beats the staged model
+
+    The run of the commit and the run of the staged model are looked up
+    concurrently; see `promote_model` for the parameters.
+
+    Returns
+    -------
+    mlflow ModelVersion instance, or None if the model was not promoted
+    """
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        run_future = pool.submit(get_run_by_sha, commit, experiment_id)
+        staged_run_future = pool.submit(_find_staged_run, stage, model_name)
+        run = run_future.result()
+        found, staged_run = staged_run_future.result()
+    # the model is only created once the run to register is known to exist
+    if not found:
+        _create_registered_model(model_name, auto_create)
+
+    if staged_run is not None:
+        promoted = force or _COMPARE[direction](
+            run.data.metrics[metric],
+            staged_run.data.metrics[metric],
+        )
+
+        if not promoted:
+            print(
+                f"Run {run.info.run_id} was not promoted over run {staged_run.info.run_id} to stage '{stage}'"  # noqa: E501
+            )
+            return None
+
+    model_version = register_model(run, model_name)
+    model_version = _get_registry().transition_model_version_stage(
+        model_name,
+        model_version.version,
+        stage=stage,
+    )
+
+    print(f"Promoted {run.info.run_id} to stage '{stage}'!")
+    return model_version
+
+
 @click.argument("commit", type=str)
 @click.argument("experiment_id", type=int)
 @click.argument("model_name", type=str)
@@ -162,27 +248,154 @@ def promote_model(
     -------
     mlflow RegisteredModelVersion instance
     """
-    run = get_run_by_sha(commit, experiment_id)
-    staged_run = get_run_by_stage(stage, model_name, not do_not_create_model)
-
-    if staged_run is not None:
-        promote = force or _COMPARE[direction](
-            run.data.metrics[metric],
-            staged_run.data.metrics[metric],
-        )
-
-        if not promote:
-            print(
-                f"Run {run.info.run_id} was not promoted over run {staged_run.info.run_id} to stage '{stage}'"  # noqa: E501
-            )
-            sys.exit(exit_code)
-
-    model_version = register_model(run, model_name)
-    model_version = _get_registry().transition_model_version_stage(
+    model_version = promote(
+        commit,
+        experiment_id,
         model_name,
-        model_version.version,
+        metric=metric,
+        direction=direction,
         stage=stage,
+        force=force,
+        auto_create=not do_not_create_model,
     )
-
-    print(f"Promoted {run.info.run_id} to stage '{stage}'!")
+    if model_version is None:
+        sys.exit(exit_code)
     return model_version
+
+
+class BatchEntry(BaseModel):
+    commit: str
+    experiment_id: int
+    model_name: str
+    metric: Optional[str] = None
+    direction: Optional[str] = Field(None, regex="^(maximize|minimize)$")
+    stage: Optional[str] = None
+    force: bool = False
+
+    @validator("direction", pre=True)
+    def _lower_direction(cls, value: Any) -> Any:
+        # like the --direction option, directions are case-insensitive
+        return value.lower() if isinstance(value, str) else value
+
+
+class Batch(BaseModel):
+    __root__: List[BatchEntry]
+
+
+@click.argument("batch_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--metric",
+    default="test_f1",
+    type=str,
+    show_default=True,
+    help="metric of the entries that do not set one",
+)
+@click.option(
+    "--direction",
+    default="maximize",
+    type=click.Choice(list(_COMPARE.keys()), case_sensitive=False),
+    show_default=True,
+    help="direction of the entries that do not set one",
+)
+@click.option(
+    "--stage",
+    default="staging",
+    type=str,
+    show_default=True,
+    help="stage of the entries that do not set one",
+)
+@click.option(
+    "--do-not-create-model",
+    is_flag=True,
+    help="do not try to automatically create a model with the given name if no \
+matching model is found",
+)
+@click.option(
+    "--workers",
+    default=8,
+    type=int,
+    show_default=True,
+    help="number of models promoted at once",
+)
+@click.option(
+    "--exit-code",
+    default=0,
+    type=int,
+    show_default=True,
+    help="exit code to return when any model is NOT promoted",
+)
+def promote_batch(
+    batch_path: str,
+    metric: str,
+    direction: str,
+    stage: str,
+    do_not_create_model: bool,
+    workers: int,
+    exit_code: int,
+) -> Dict[str, List[Optional[ModelVersion]]]:
+    """Attempt promotion of every model listed in BATCH_PATH.
+
+    BATCH_PATH is a YAML or JSON list of entries with the keys of the arguments
+    and options of `promote`, e.g.:
+
+    \b
+    - commit: 1a2b3c
+      experiment_id: 1
+      model_name: wine
+      metric: test_rmse
+      direction: minimize
+
+    Different models are promoted concurrently with one registry client, while
+    the entries of a model are promoted one after the other, in order. An entry
+    that fails because of an error does not stop the others: the errors of all
+    entries are reported once every entry has been tried, and the command then
+    fails. Otherwise, it returns --exit-code if any model is NOT promoted.
+
+    Returns
+    -------
+    dict of model name to the promoted mlflow ModelVersion instances, or None for
+    the entries that were not promoted
+    """
+    with open(batch_path) as f:
+        entries = Batch.parse_obj(yaml.safe_load(f)).__root__
+
+    by_model: Dict[str, List[BatchEntry]] = {}
+    for entry in entries:
+        by_model.setdefault(entry.model_name, []).append(entry)
+
+    errors: List[str] = []
+
+    def promote_entries(
+        model_entries: List[BatchEntry],
+    ) -> List[Optional[ModelVersion]]:
+        versions = []
+        for entry in model_entries:
+            try:
+                version = promote(
+                    entry.commit,
+                    entry.experiment_id,
+                    entry.model_name,
+                    metric=entry.metric or metric,
+                    direction=entry.direction or direction,
+                    stage=entry.stage or stage,
+                    force=entry.force,
+                    auto_create=not do_not_create_model,
+                )
+            except Exception as e:
+                errors.append(f"{entry.model_name} at commit {entry.commit}: {e}")
+                version = None
+            versions.append(version)
+        return versions
+
+    with concurrent.futures.ThreadPoolExecutor(max(workers, 1)) as pool:
+        futures = {
+            model_name: pool.submit(promote_entries, model_entries)
+            for model_name, model_entries in by_model.items()
+        }
+        results = {model_name: f.result() for model_name, f in futures.items()}
+
+    if errors:
+        raise click.ClickException("Failed to promote models:\n" + "\n".join(errors))
+    if any(version is None for versions in results.values() for version in versions):
+        sys.exit(exit_code)
+    return results
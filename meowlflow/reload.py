@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+import click
+from mlflow.models import Model
+from mlflow.models.model import MLMODEL_FILE_NAME
+from mlflow.pyfunc import PyFuncModel
+from mlflow.tracking import MlflowClient
+from mlflow.utils.file_utils import local_file_uri_to_path
+from mlflow.utils.uri import is_local_uri
+from prometheus_client import Counter, Gauge
+
+from meowlflow import executor, startup
+
+
+RT = TypeVar("RT")
+
+MODEL_INFO = Gauge(
+    "meowlflow_model_info",
+    "Version of the model served by an endpoint, set to 1 for the current version",
+    ("endpoint", "version"),
+    multiprocess_mode="liveall",
+)
+MODEL_RELOADS = Counter(
+    "meowlflow_model_reloads_total",
+    "Number of attempts to reload the model of an endpoint",
+    ("endpoint", "result"),
+)
+
+# loads a model from a URI into a directory, returning the model and its local URI
+Load = Callable[[str, str], Tuple[PyFuncModel, str]]
+# creates a started predictor for a model and its local URI
+Start = Callable[[PyFuncModel, str], Awaitable[executor.Predictor]]
+# releases the local URI of a model once it is unloaded
+Release = Callable[[str], None]
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--reload-interval",
+        default=0.0,
+        type=float,
+        show_default=True,
+        help="seconds between checks for a new version of the model, eg: a new \
+version in the stage of a models:/ URI; 0 disables reloading",
+    )(function)
+    return function
+
+
+def resolve(model_path: str) -> str:
+    """identify the version of the model a path or URI currently points at
+
+    Registry URIs with a stage, eg: "models:/name/Production", are resolved to the
+    URI of the latest version in that stage, eg: "models:/name/3", and local paths
+    are identified by the UUID or creation time of their model. Other URIs are
+    assumed to always point at the same model.
+    """
+    if model_path.startswith("models:/"):
+        name, _, stage = model_path[len("models:/") :].strip("/").rpartition("/")
+        if stage.isdigit():
+            return model_path
+        versions = MlflowClient().get_latest_versions(name, stages=[stage])
+        if not versions:
+            raise LookupError(f"No version of model {name} in stage {stage}")
+        return f"models:/{name}/{versions[0].version}"
+
+    path = local_file_uri_to_path(model_path) if is_local_uri(model_path) else None
+    if path is not None and os.path.isfile(os.path.join(path, MLMODEL_FILE_NAME)):
+        model = Model.load(os.path.join(path, MLMODEL_FILE_NAME))
+        return "{}@{}".format(
+            model_path,
+            getattr(model, "model_uuid", None) or model.utc_time_created,
+        )
+    return model_path
+
+
+def pin(model_path: str, resolved: Optional[str]) -> str:
+    """the URI from which to load the version a model path was resolved to
+
+    Registry URIs are pinned to the resolved version, so that the loaded version
+    is the one that was resolved even if the stage changes in the meantime;
+    other paths cannot be pinned.
+    """
+    if resolved is not None and resolved.startswith("models:/"):
+        return resolved
+    return model_path
+
+
+class _Generation:
+    """A version of the model and the number of predictions it is running."""
+
+    def __init__(
+        self, predictor: executor.Predictor, version: str, path: Optional[str]
+    ) -> None:
+        self.predictor = predictor
+        self.version = version
+        self.path = path
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+
+class ReloadingPredictor:
+    """Run predictions with the latest version of a model.
+
+    Every `interval` seconds, the version the model path points at is checked
+    with `resolve`; a new version is downloaded and loaded in the background,
+    warmed up, and then swapped in for new predictions at once. The previous
+    version is shut down once the predictions it is running have completed.
+
+    Parameters
+    ----------
+    predictor : executor.Predictor
+        predictor of the version of the model loaded at startup
+    version : str
+        version of the model loaded at startup, see `serve.model_version`
+    resolved : str or None
+        what `resolve` returned for the model path before the model loaded at
+        startup was loaded from `pin(model_path, resolved)`, or None if it could
+        not be resolved, in which case the first version resolved is reloaded
+    model_path : str
+        local path or URI of the model to watch
+    output_path : str
+        local directory into which new versions of the model are downloaded
+    load : callable
+        function loading a model from a path into a directory, see
+        `serve.load_model_artifact`
+    start : callable
+        coroutine function creating and starting a predictor for a model
+    version_of : callable
+        function returning the version of a model, see `serve.model_version`
+    interval : float, default: 0.0
+        seconds between checks, 0 disables reloading
+    endpoint : str, default: ""
+    warm_up : callable, default: None
+        coroutine function warming up a new version before it is swapped in, see
+        `startup.get_warm_up`
+    release : callable, default: None
+        function called with the local URI of each version of the model once it
+        is unloaded, see `serve.release_model_artifact`
+    logger : logging.Logger, default: None
+    """
+
+    def __init__(
+        self,
+        predictor: executor.Predictor,
+        version: str,
+        resolved: Optional[str],
+        model_path: str,
+        output_path: str,
+        load: Load,
+        start: Start,
+        version_of: Callable[[PyFuncModel, str], str],
+        interval: float = 0.0,
+        endpoint: str = "",
+        warm_up: Optional[startup.WarmUp] = None,
+        release: Optional[Release] = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.model_path = model_path
+        self.output_path = output_path
+        self.interval = interval
+        self.endpoint = endpoint
+        self._load = load
+        self._start = start
+        self._version_of = version_of
+        self.warm_up = warm_up
+        self._release = release
+        self._logger = logger or logging.getLogger(__name__)
+        self._current = _Generation(predictor, version, None)
+        self._resolved = resolved
+        self._callbacks: List[Callable[[str], Any]] = []
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def version(self) -> str:
+        return self._current.version
+
+    def get_version(self) -> str:
+        return self._current.version
+
+    def on_swap(self, callback: Callable[[str], Any]) -> None:
+        """call a function with the new version whenever a new version is swapped in"""
+        self._callbacks.append(callback)
+
+    async def startup(self) -> None:
+        await self._current.predictor.startup()
+        MODEL_INFO.labels(self.endpoint, self.version).set(1)
+        for callback in self._callbacks:
+            callback(self.version)
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._current.predictor.shutdown()
+
+    async def predict(self, data: Any) -> Any:
+        generation = self._current
+        generation.in_flight += 1
+        generation.idle.clear()
+        try:
+            return await generation.predictor.predict(data)
+        finally:
+            generation.in_flight -= 1
+            if generation.in_flight == 0:
+                generation.idle.set()
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                MODEL_RELOADS.labels(self.endpoint, "failure").inc()
+                self._logger.exception(f"Failed to reload {self.model_path}")
+
+    async def reload(self) -> bool:
+        """load, warm up and swap in the model if a new version is available
+
+        Returns
+        -------
+        whether a new version was swapped in
+        """
+        loop = asyncio.get_running_loop()
+        resolved = await loop.run_in_executor(None, resolve, self.model_path)
+        if resolved == self._resolved:
+            return False
+
+        self._logger.info(f"Loading new version {resolved} of {self.model_path}")
+        path = tempfile.mkdtemp(dir=self.output_path)
+        try:
+            uri = pin(self.model_path, resolved)
+            model, model_uri = await loop.run_in_executor(None, self._load, uri, path)
+            try:
+                version = self._version_of(model, model_uri)
+                predictor = await self._start(model, model_uri)
+                try:
+                    if self.warm_up is not None:
+                        await self.warm_up(predictor.predict)
+                except BaseException:
+                    await predictor.shutdown()
+                    raise
+            except BaseException:
+                if self._release is not None:
+                    self._release(model_uri)
+                raise
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+        await self._swap(_Generation(predictor, version, path))
+        self._resolved = resolved
+        return True
+
+    async def _swap(self, generation: _Generation) -> None:
+        previous, self._current = self._current, generation
+        MODEL_INFO.labels(self.endpoint, previous.version).set(0)
+        MODEL_INFO.labels(self.endpoint, generation.version).set(1)
+        MODEL_RELOADS.labels(self.endpoint, "success").inc()
+        for callback in self._callbacks:
+            callback(generation.version)
+        self._logger.info(
+            f"Swapped model version {previous.version} for {generation.version}"
+        )
+
+        # let the predictions of the previous version complete before shutting it
+        # down, eg: stopping its process pool
+        await previous.idle.wait()
+        await previous.predictor.shutdown()
+        if self._release is not None:
+            # eg: lets the artifact cache evict the previous version
+            self._release(previous.predictor.model_uri)
+        if previous.path is not None:
+            shutil.rmtree(previous.path, ignore_errors=True)
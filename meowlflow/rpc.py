@@ -0,0 +1,719 @@
+import asyncio
+import datetime
+import json
+import logging
+import numbers
+from pathlib import Path
+import re
+import signal
+import time
+import types
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+import uuid
+
+import click
+from fastapi import FastAPI
+from google.protobuf import (
+    descriptor_pb2,
+    descriptor_pool,
+    json_format,
+    message_factory,
+    struct_pb2,
+)
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.message import Message
+from prometheus_client import Counter, Histogram
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import (
+    SHAPE_DEQUE,
+    SHAPE_FROZENSET,
+    SHAPE_ITERABLE,
+    SHAPE_LIST,
+    SHAPE_SEQUENCE,
+    SHAPE_SET,
+    SHAPE_SINGLETON,
+    SHAPE_TUPLE_ELLIPSIS,
+    ModelField,
+)
+
+from meowlflow import timing
+from meowlflow.api import base, info
+from meowlflow.exception import InvalidParams, MeowlflowException, Unexpected
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+GRPC_REQUESTS = Counter(
+    "meowlflow_grpc_requests_total",
+    "Number of calls to the gRPC inference endpoints",
+    ("method", "code"),
+)
+GRPC_REQUEST_DURATION = Histogram(
+    "meowlflow_grpc_request_duration_seconds",
+    "Latency of calls to the gRPC inference endpoints; streams are observed once \
+they end",
+    ("method",),
+)
+
+# number of messages of a stream that are predicted concurrently, while the
+# responses of the earlier messages are sent
+_STREAM_WINDOW = 32
+
+# the status codes of the errors of the HTTP endpoints
+_STATUS_CODES = {
+    400: "INVALID_ARGUMENT",
+    401: "UNAUTHENTICATED",
+    403: "PERMISSION_DENIED",
+    404: "NOT_FOUND",
+    422: "INVALID_ARGUMENT",
+    501: "UNIMPLEMENTED",
+    502: "UNAVAILABLE",
+    503: "UNAVAILABLE",
+}
+
+_F = descriptor_pb2.FieldDescriptorProto
+_VALUE = ".google.protobuf.Value"
+_SEQUENCES = {
+    SHAPE_LIST,
+    SHAPE_SET,
+    SHAPE_FROZENSET,
+    SHAPE_SEQUENCE,
+    SHAPE_TUPLE_ELLIPSIS,
+    SHAPE_DEQUE,
+    SHAPE_ITERABLE,
+}
+# the scalar types of fields of simple types; bool comes first since it is an int,
+# and types that are encoded as strings in JSON are strings
+_SCALARS: List[Tuple[Union[type, Tuple[type, ...]], "_F.Type.ValueType"]] = [
+    (bool, _F.TYPE_BOOL),
+    (int, _F.TYPE_INT64),
+    (float, _F.TYPE_DOUBLE),
+    (str, _F.TYPE_STRING),
+    ((datetime.date, datetime.time, uuid.UUID), _F.TYPE_STRING),
+]
+_TYPE_NAMES = {
+    _F.TYPE_BOOL: "bool",
+    _F.TYPE_INT64: "int64",
+    _F.TYPE_DOUBLE: "double",
+    _F.TYPE_STRING: "string",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _require_grpc() -> Any:
+    # grpcio is an optional dependency, only imported by the servers that use it
+    try:
+        import grpc
+        import grpc.aio
+    except ImportError:  # pragma: no cover
+        raise click.UsageError("gRPC requires grpcio, eg: pip install meowlflow[grpc]")
+    return grpc
+
+
+def _field_name(field: ModelField) -> str:
+    if field.name == "__root__":
+        return "items" if field.shape in _SEQUENCES else "value"
+    return field.name
+
+
+def _root(model: Type[BaseModel]) -> Optional[str]:
+    """the name of the field of the message of a model with a custom root type"""
+    root = model.__fields__.get("__root__")
+    if root is None:
+        return None
+    return _field_name(root)
+
+
+class _MessageTypes:
+    """Add a message type for each model of a schema to a proto file.
+
+    Fields of simple types are scalars, and fields of models or pydantic
+    dataclasses are messages; lists and sets of those are repeated fields. Values
+    of other types, e.g. dicts, lists of lists or unions, are
+    `google.protobuf.Value`s, which hold any JSON value.
+
+    Singular scalar fields are optional, so that fields that are not set are
+    missing from the validated request rather than zero.
+    """
+
+    def __init__(self, file: descriptor_pb2.FileDescriptorProto) -> None:
+        self.file = file
+        self._names: Dict[Type[BaseModel], str] = {}
+        # the names of the messages of the schema's Request and Response
+        self._reserved = {"Request", "Response"}
+
+    def add(self, model: Type[BaseModel], name: str = "") -> str:
+        if model in self._names:
+            return self._names[model]
+        if not name:
+            taken = self._reserved | {m.name for m in self.file.message_type}
+            name = model.__name__
+            i = 1
+            while name in taken:
+                i += 1
+                name = f"{model.__name__}{i}"
+        self._names[model] = name
+        message = self.file.message_type.add(name=name)
+        for number, field in enumerate(model.__fields__.values(), 1):
+            self._add_field(message, number, field)
+        return name
+
+    def _add_field(
+        self, message: descriptor_pb2.DescriptorProto, number: int, field: ModelField
+    ) -> None:
+        name = _field_name(field)
+        proto = message.field.add(
+            name=name,
+            number=number,
+            json_name=name if field.name == "__root__" else field.alias,
+        )
+        repeated = field.shape in _SEQUENCES and bool(field.sub_fields)
+        item = field.sub_fields[0] if field.sub_fields and repeated else field
+        if item.shape != SHAPE_SINGLETON or (repeated and item.allow_none):
+            proto.type, type_name = _F.TYPE_MESSAGE, _VALUE
+        else:
+            proto.type, type_name = self._type(item.type_)
+        if type_name:
+            proto.type_name = type_name
+
+        if repeated:
+            proto.label = _F.LABEL_REPEATED
+            return
+        proto.label = _F.LABEL_OPTIONAL
+        if proto.type != _F.TYPE_MESSAGE:
+            proto.proto3_optional = True
+            proto.oneof_index = len(message.oneof_decl)
+            message.oneof_decl.add(name=f"_{name}")
+
+    def _type(self, type_: Any) -> Tuple["_F.Type.ValueType", str]:
+        model = getattr(type_, "__pydantic_model__", type_)
+        if isinstance(model, type):
+            if issubclass(model, BaseModel):
+                if "__root__" in model.__fields__:
+                    return _F.TYPE_MESSAGE, _VALUE
+                return _F.TYPE_MESSAGE, f".{self.file.package}.{self.add(model)}"
+            for types_, proto_type in _SCALARS:
+                if issubclass(model, types_):
+                    return proto_type, ""
+        return _F.TYPE_MESSAGE, _VALUE
+
+
+def _package(endpoint: str) -> str:
+    """the proto package of an endpoint, eg: "meowlflow.api.v1.infer" """
+    parts = []
+    for part in endpoint.strip("/").split("/"):
+        part = re.sub(r"[^0-9A-Za-z_]", "_", part)
+        if part:
+            parts.append(f"_{part}" if part[0].isdigit() else part)
+    return ".".join(["meowlflow", *parts])
+
+
+def build_file(
+    endpoint: str, schema: types.ModuleType
+) -> descriptor_pb2.FileDescriptorProto:
+    """build the proto file of the messages and service of an inference endpoint
+
+    The service `Model` of the package of the endpoint, eg: `meowlflow.infer` for
+    "/infer", has two methods: `Infer`, and `InferStream` which answers each of a
+    stream of requests in order.
+    """
+    package = _package(endpoint)
+    file = descriptor_pb2.FileDescriptorProto(
+        name=package.replace(".", "/") + ".proto", package=package, syntax="proto3"
+    )
+    message_types = _MessageTypes(file)
+    message_types.add(schema.Request, "Request")
+    message_types.add(schema.Response, "Response")
+    if any(f.type_name == _VALUE for m in file.message_type for f in m.field):
+        file.dependency.append("google/protobuf/struct.proto")
+
+    service = file.service.add(name="Model")
+    request, response = f".{package}.Request", f".{package}.Response"
+    service.method.add(name="Infer", input_type=request, output_type=response)
+    service.method.add(
+        name="InferStream",
+        input_type=request,
+        output_type=response,
+        client_streaming=True,
+        server_streaming=True,
+    )
+    return file
+
+
+def render(file: descriptor_pb2.FileDescriptorProto) -> str:
+    """render a proto file built by `build_file` as the source of a .proto file"""
+
+    def type_name(name: str) -> str:
+        prefix = f".{file.package}."
+        return name[len(prefix) :] if name.startswith(prefix) else name.lstrip(".")
+
+    lines = [f'syntax = "{file.syntax}";', "", f"package {file.package};", ""]
+    lines.extend(f'import "{dependency}";' for dependency in file.dependency)
+    for service in file.service:
+        lines.extend(["", f"service {service.name} {{"])
+        for method in service.method:
+            request = type_name(method.input_type)
+            response = type_name(method.output_type)
+            if method.client_streaming:
+                request = f"stream {request}"
+            if method.server_streaming:
+                response = f"stream {response}"
+            lines.append(f"  rpc {method.name}({request}) returns ({response});")
+        lines.append("}")
+    for message in file.message_type:
+        lines.extend(["", f"message {message.name} {{"])
+        for field in message.field:
+            label = ""
+            if field.label == _F.LABEL_REPEATED:
+                label = "repeated "
+            elif field.proto3_optional:
+                label = "optional "
+            if field.type == _F.TYPE_MESSAGE:
+                name = type_name(field.type_name)
+            else:
+                name = _TYPE_NAMES[field.type]
+            option = ""
+            if field.json_name != field.name:
+                option = f" [json_name = {json.dumps(field.json_name)}]"
+            lines.append(f"  {label}{name} {field.name} = {field.number}{option};")
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _message_classes(
+    *files: descriptor_pb2.FileDescriptorProto,
+) -> Dict[str, Type[Message]]:
+    """the classes of the messages of proto files, by their full name"""
+    # a pool of its own keeps the messages of endpoints, and of reloaded schemas,
+    # from clashing with each other and with generated code
+    pool: Any = descriptor_pool.DescriptorPool()
+    pool.AddSerializedFile(struct_pb2.DESCRIPTOR.serialized_pb)
+    get_class = getattr(message_factory, "GetMessageClass", None)
+    if get_class is None:  # pragma: no cover
+        # protobuf < 4.22
+        get_class = message_factory.MessageFactory(pool).GetPrototype
+    classes = {}
+    for file in files:
+        pool.AddSerializedFile(file.SerializeToString())
+        for message in file.message_type:
+            name = f"{file.package}.{message.name}"
+            classes[name] = get_class(pool.FindMessageTypeByName(name))
+    return classes
+
+
+def _to_dict(message: Message) -> Dict[str, Any]:
+    """convert a message built by `build_file` to the JSON of its model
+
+    Unlike `json_format.MessageToDict`, 64-bit integers are not converted to
+    strings, and unset fields are missing rather than set to their defaults.
+    """
+    data = {}
+    for field in message.DESCRIPTOR.fields:
+        value = getattr(message, field.name)
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            data[field.json_name] = [_to_value(field, v) for v in value]
+        elif message.HasField(field.name):
+            data[field.json_name] = _to_value(field, value)
+    return data
+
+
+def _to_value(field: FieldDescriptor, value: Any) -> Any:
+    if field.message_type is None:
+        return value
+    if field.message_type.full_name == "google.protobuf.Value":
+        return json_format.MessageToDict(value)
+    return _to_dict(value)
+
+
+def _from_dict(message: Message, data: Mapping[str, Any]) -> Message:
+    """set the fields of a message built by `build_file` from the JSON of its model
+
+    The counterpart of `_to_dict`: fields whose values are missing or None are
+    left unset, and keys that are not fields of the message are ignored.
+    """
+    for field in message.DESCRIPTOR.fields:
+        value = data.get(field.json_name)
+        if value is None:
+            continue
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            if field.message_type is None:
+                getattr(message, field.name).extend(value)
+            else:
+                items = getattr(message, field.name)
+                for item in value:
+                    _from_value(field, items.add(), item)
+        elif field.message_type is None:
+            setattr(message, field.name, value)
+        else:
+            _from_value(field, getattr(message, field.name), value)
+    return message
+
+
+def _from_value(field: FieldDescriptor, message: Message, value: Any) -> None:
+    if field.message_type.full_name != "google.protobuf.Value":
+        message.SetInParent()
+        _from_dict(message, value)
+    elif value is None:
+        setattr(message, "null_value", struct_pb2.NULL_VALUE)
+    elif isinstance(value, bool):
+        setattr(message, "bool_value", value)
+    elif isinstance(value, str):
+        setattr(message, "string_value", value)
+    elif isinstance(value, numbers.Number):
+        setattr(message, "number_value", value)
+    elif isinstance(value, Mapping):
+        # set even if it is empty
+        getattr(message, "struct_value").SetInParent()
+        getattr(message, "struct_value").update(value)
+    else:
+        getattr(message, "list_value").SetInParent()
+        getattr(message, "list_value").extend(value)
+
+
+def _loads(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _status(error: Exception) -> Tuple[Any, str]:
+    """the status code and details of the status of a call that raised an error
+
+    The details are the JSON of the error, like the body of the error responses
+    of the HTTP endpoints.
+    """
+    grpc = _require_grpc()
+    if isinstance(error, ValidationError):
+        # invalid requests are not logged, like those of the HTTP endpoints
+        error = InvalidParams("Invalid request", {"errors": error.errors()})
+    elif not isinstance(error, MeowlflowException):
+        logger.exception(error)
+        error = Unexpected("Unexpected error while running the model")
+    elif error.reported:
+        logger.exception(error)
+    code = getattr(grpc.StatusCode, _STATUS_CODES.get(error.status_code, "INTERNAL"))
+    return code, json.dumps({"error": error.to_dict()})
+
+
+def _observe(method: str, code: str, start_time: float) -> None:
+    GRPC_REQUESTS.labels(method, code).inc()
+    GRPC_REQUEST_DURATION.labels(method).observe(time.perf_counter() - start_time)
+
+
+class _Endpoint:
+    """The gRPC service of an inference endpoint, see `build_file`."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        schema: types.ModuleType,
+        respond: Callable[[base.BaseRequest], Awaitable[Any]],
+        model_version: Union[str, Callable[[], str]] = "",
+    ) -> None:
+        self.file = build_file(endpoint, schema)
+        self.service = f"{self.file.package}.Model"
+        self.schema = schema
+        self.respond = respond
+        classes = _message_classes(self.file)
+        self.request_class = classes[f"{self.file.package}.Request"]
+        self.response_class = classes[f"{self.file.package}.Response"]
+        self.request_root = _root(schema.Request)
+        self.response_root = _root(schema.Response)
+        # the stages of the calls of each method are timed like those of the
+        # HTTP endpoints, labelled with the path of the method
+        self.timers = {
+            method: timing.StageTimer(
+                f"/{self.service}/{method}", model_version=model_version
+            )
+            for method in ("Infer", "InferStream")
+        }
+
+    def handler(self) -> Any:
+        grpc = _require_grpc()
+        kwargs = {
+            "request_deserializer": self.request_class.FromString,
+            "response_serializer": self.response_class.SerializeToString,
+        }
+        return grpc.method_handlers_generic_handler(
+            self.service,
+            {
+                "Infer": grpc.unary_unary_rpc_method_handler(self.infer, **kwargs),
+                "InferStream": grpc.stream_stream_rpc_method_handler(
+                    self.infer_stream, **kwargs
+                ),
+            },
+        )
+
+    async def _predict(self, message: Message) -> Message:
+        data: Any = _to_dict(message)
+        if self.request_root is not None:
+            data = data.get(self.request_root)
+        request = self.schema.Request.parse_obj(data)
+        timing.mark(timing.PARSE)
+
+        # the response is the content of the response of the HTTP endpoint, or
+        # its JSON body if it comes from their response cache
+        response = await self.respond(request)
+        if isinstance(response, bytes):
+            response = _loads(response)
+        if self.response_root is not None:
+            response = {self.response_root: response}
+        return _from_dict(self.response_class(), response)
+
+    async def infer(self, message: Message, context: Any) -> Message:
+        method = f"/{self.service}/Infer"
+        start_time = time.perf_counter()
+        code = "UNKNOWN"
+        try:
+            with self.timers["Infer"].stages():
+                response = await self._predict(message)
+            code = "OK"
+            return response
+        except asyncio.CancelledError:
+            code = "CANCELLED"
+            raise
+        except Exception as e:
+            status, details = _status(e)
+            code = status.name
+            await context.abort(status, details)
+            raise
+        finally:
+            _observe(method, code, start_time)
+
+    async def infer_stream(
+        self, messages: AsyncIterator[Message], context: Any
+    ) -> AsyncIterator[Message]:
+        method = f"/{self.service}/InferStream"
+        start_time = time.perf_counter()
+        code = "UNKNOWN"
+        timer = self.timers["InferStream"]
+        # the messages are predicted as they arrive, e.g. so that they are batched
+        # together, and their responses are sent in order
+        pending: "asyncio.Queue[Optional[asyncio.Task[Message]]]" = asyncio.Queue(
+            _STREAM_WINDOW
+        )
+
+        async def predict(message: Message) -> Message:
+            with timer.stages():
+                return await self._predict(message)
+
+        async def read() -> None:
+            try:
+                async for message in messages:
+                    await pending.put(asyncio.ensure_future(predict(message)))
+            finally:
+                await pending.put(None)
+
+        reader = asyncio.ensure_future(read())
+        try:
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                yield await task
+            await reader
+            code = "OK"
+        except (asyncio.CancelledError, GeneratorExit):
+            code = "CANCELLED"
+            raise
+        except Exception as e:
+            status, details = _status(e)
+            code = status.name
+            await context.abort(status, details)
+        finally:
+            reader.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None and not task.cancel() and not task.cancelled():
+                    # the error of a task that is done is retrieved, so that it is
+                    # not logged again
+                    task.exception()
+            _observe(method, code, start_time)
+
+
+def _health_file() -> descriptor_pb2.FileDescriptorProto:
+    """the messages of the standard gRPC health checking protocol"""
+    file = descriptor_pb2.FileDescriptorProto(
+        name="grpc/health/v1/health.proto", package="grpc.health.v1", syntax="proto3"
+    )
+    request = file.message_type.add(name="HealthCheckRequest")
+    request.field.add(
+        name="service",
+        number=1,
+        type=_F.TYPE_STRING,
+        label=_F.LABEL_OPTIONAL,
+        json_name="service",
+    )
+    response = file.message_type.add(name="HealthCheckResponse")
+    status = response.enum_type.add(name="ServingStatus")
+    for number, name in enumerate(
+        ["UNKNOWN", "SERVING", "NOT_SERVING", "SERVICE_UNKNOWN"]
+    ):
+        status.value.add(name=name, number=number)
+    response.field.add(
+        name="status",
+        number=1,
+        type=_F.TYPE_ENUM,
+        type_name=".grpc.health.v1.HealthCheckResponse.ServingStatus",
+        label=_F.LABEL_OPTIONAL,
+        json_name="status",
+    )
+    return file
+
+
+class GrpcServer:
+    """Serve the inference endpoints of an app over gRPC.
+
+    Endpoints are added by `sidecar.register_infer_endpoint`, and share the
+    model, batcher and caches of the HTTP endpoints. The server is started on
+    the event loop of the app once the app has started, e.g. warmed up its
+    models, by each worker; workers share the port.
+
+    The server also implements the standard health checking protocol, whose
+    services are serving once the app is ready.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 50051,
+        only: bool = False,
+        grace: float = 5.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.only = only
+        # seconds for which calls in flight are awaited on shutdown
+        self.grace = grace
+        self.endpoints: List[_Endpoint] = []
+        self._grpc = _require_grpc()
+        self._server: Any = None
+
+        health = _health_file()
+        classes = _message_classes(health)
+        self._health_request = classes["grpc.health.v1.HealthCheckRequest"]
+        self._health_response = classes["grpc.health.v1.HealthCheckResponse"]
+
+    def add_endpoint(
+        self,
+        endpoint: str,
+        schema: types.ModuleType,
+        respond: Callable[[base.BaseRequest], Awaitable[Any]],
+        model_version: Union[str, Callable[[], str]] = "",
+    ) -> None:
+        """serve an inference endpoint
+
+        Parameters
+        ----------
+        endpoint : str
+        schema : module
+            schema module of the endpoint
+        respond : callable
+            coroutine function returning the content of the response to a
+            validated request, i.e. the JSON data of the response model, or the
+            JSON body of the response
+        model_version : str or callable, default: ""
+        """
+        self.endpoints.append(_Endpoint(endpoint, schema, respond, model_version))
+
+    def attach(self, app: FastAPI) -> None:
+        """start the server after the other startup handlers of the app, and stop
+        it before the other shutdown handlers"""
+        app.on_event("startup")(self.startup)
+        app.router.on_shutdown.insert(0, self.shutdown)
+
+    async def startup(self) -> None:
+        grpc = self._grpc
+        self._server = grpc.aio.server(options=[("grpc.so_reuseport", 1)])
+        self._server.add_generic_rpc_handlers(
+            [endpoint.handler() for endpoint in self.endpoints]
+            + [
+                grpc.method_handlers_generic_handler(
+                    "grpc.health.v1.Health",
+                    {
+                        "Check": grpc.unary_unary_rpc_method_handler(
+                            self.check,
+                            request_deserializer=self._health_request.FromString,
+                            response_serializer=self._health_response.SerializeToString,
+                        )
+                    },
+                )
+            ]
+        )
+        # port 0 binds any free port
+        self.port = self._server.add_insecure_port(f"{self.host}:{self.port}")
+        await self._server.start()
+        services = ", ".join(endpoint.service for endpoint in self.endpoints)
+        logger.info(f"Serving {services} over gRPC on {self.host}:{self.port}")
+
+    async def shutdown(self) -> None:
+        if self._server is not None:
+            await self._server.stop(self.grace)
+            self._server = None
+
+    async def check(self, request: Message, context: Any) -> Message:
+        service = getattr(request, "service")
+        if service not in {"", *(endpoint.service for endpoint in self.endpoints)}:
+            await context.abort(
+                self._grpc.StatusCode.NOT_FOUND, f"Unknown service {service}"
+            )
+        status = "SERVING" if info.is_ready() else "NOT_SERVING"
+        return self._health_response(status=status)
+
+    def run(self, logger: logging.Logger, app: FastAPI, host: str, port: int) -> None:
+        """serve only over gRPC, and the Prometheus metrics on the given port
+
+        The startup and shutdown handlers of the app are run as they would be by
+        uvicorn.
+        """
+        from prometheus_client import start_http_server
+
+        logger.info(f"Serving metrics on {host}:{port}")
+        start_http_server(port, host)
+        asyncio.run(self._run(app))
+
+    async def _run(self, app: FastAPI) -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await app.router.startup()
+        try:
+            await stop.wait()
+        finally:
+            await app.router.shutdown()
+
+
+@click.option(
+    "--endpoint",
+    default="/infer",
+    type=click.Path(),
+    show_default=True,
+)
+@click.option(
+    "--schema-path",
+    default="/var/lib/meowlflow/schema.py",
+    type=click.Path(exists=True, dir_okay=False),
+    show_default=True,
+)
+def proto(endpoint: str, schema_path: Path) -> None:
+    # the sidecar module imports this one for its options
+    from meowlflow.sidecar import load_schema
+
+    print(render(build_file(endpoint, load_schema(schema_path))), end="")
@@ -0,0 +1,273 @@
+from collections import deque
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import IO, Any, Deque, Dict, Iterator, List, Optional
+import types
+
+import click
+from mlflow.models.container import MODEL_PATH
+from mlflow.pyfunc import (
+    PyFuncModel,
+    load_model,
+)
+import pandas
+from pydantic import ValidationError
+
+from meowlflow import ndjson
+from meowlflow.api.base import ColumnarRequest
+from meowlflow.exception import InvalidParams, Unsupported
+from meowlflow.serve import download_model_artifact, load_model_artifact
+from meowlflow.sidecar import load_schema
+
+
+FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "ndjson",
+    ".ndjson": "ndjson",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+# the model and schema loaded by each process of a process pool
+_model: Optional[PyFuncModel] = None
+_schema: Optional[types.ModuleType] = None
+_report_invalid = False
+
+
+def _read_chunks(path: Path, input_format: str, chunk_size: int) -> Iterator[Any]:
+    if input_format == "csv":
+        yield from pandas.read_csv(path, chunksize=chunk_size, memory_map=True)
+    elif input_format == "parquet":
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            raise Unsupported(
+                "Reading Parquet files requires pyarrow, "
+                "eg: pip install meowlflow[arrow]"
+            )
+        parquet_file = pyarrow.parquet.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas(split_blocks=True, self_destruct=True)
+    else:
+        with open(path, "rb") as f:
+            records: List[Any] = []
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+                if len(records) >= chunk_size:
+                    yield records
+                    records = []
+            if records:
+                yield records
+
+
+def _parse(schema: types.ModuleType, chunk: Any) -> Any:
+    if isinstance(chunk, pandas.DataFrame):
+        if issubclass(schema.Request, ColumnarRequest):
+            # the columns read from the file are validated as they are
+            return schema.Request.parse_frame(chunk)
+        return schema.Request.parse_obj(chunk.to_dict(orient="records"))
+    return schema.Request.parse_obj(chunk)
+
+
+def _take(chunk: Any, indices: List[int]) -> Any:
+    if isinstance(chunk, pandas.DataFrame):
+        return chunk.iloc[indices]
+    return [chunk[i] for i in indices]
+
+
+def score_chunk(
+    model: PyFuncModel,
+    schema: types.ModuleType,
+    chunk: Any,
+    report_invalid: bool = False,
+) -> List[str]:
+    """score a chunk of records and return one JSON-encoded Response per record
+
+    Parameters
+    ----------
+    model : PyFuncModel
+    schema : schema module
+    chunk : list of records or pandas.DataFrame with one record per row
+    report_invalid : bool, default: False
+        whether invalid records are answered with a JSON-encoded error in place of
+        their Response and the other records of the chunk are still scored,
+        instead of failing the whole chunk
+
+    Returns
+    -------
+    list of str
+    """
+    errors: Dict[int, str] = {}
+    try:
+        request = _parse(schema, chunk)
+    except ValidationError:
+        if not report_invalid:
+            raise
+        # find the invalid records, and score the others
+        for i in range(len(chunk)):
+            try:
+                _parse(schema, _take(chunk, [i]))
+            except ValidationError as e:
+                error = InvalidParams("Invalid record", {"errors": e.errors()})
+                errors[i] = json.dumps({"error": error.to_dict()}, default=str)
+        valid = [i for i in range(len(chunk)) if i not in errors]
+        request = _parse(schema, _take(chunk, valid)) if valid else None
+
+    lines: List[str] = []
+    if request is not None:
+        n = len(chunk) - len(errors)
+        parts = ndjson.rows(model.predict(request.transform()), n)
+        if len(parts) != n:
+            raise click.ClickException(
+                f"The model returned outputs that cannot be split into one \
+Response per record for a chunk of {n} records"
+            )
+        lines = [
+            schema.Response.parse_obj(schema.Response.transform(part)).json()
+            for part in parts
+        ]
+    for i, line in sorted(errors.items()):
+        lines.insert(i, line)
+    return lines
+
+
+def _init_worker(model_uri: str, schema_path: Path, report_invalid: bool) -> None:
+    global _model, _schema, _report_invalid
+    _model = load_model(model_uri)
+    _schema = load_schema(schema_path)
+    _report_invalid = report_invalid
+
+
+def _score(chunk: Any) -> List[str]:
+    assert _model is not None and _schema is not None
+    return score_chunk(_model, _schema, chunk, _report_invalid)
+
+
+def _map_ordered(
+    pool: concurrent.futures.Executor, chunks: Iterator[Any], window: int
+) -> Iterator[List[str]]:
+    # unlike Executor.map, only submit a bounded number of chunks ahead of the
+    # chunk being written, so that the input is not read into memory all at once
+    pending: Deque["concurrent.futures.Future[List[str]]"] = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(_score, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+@click.argument("input-path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output", type=click.File("w"), default="-")
+@click.option(
+    "--schema-path",
+    default="/var/lib/meowlflow/schema.py",
+    type=click.Path(exists=True, dir_okay=False),
+    show_default=True,
+)
+@click.option(
+    "--model-path",
+    default=MODEL_PATH,
+    type=str,
+    show_default=True,
+)
+@click.option(
+    "--input-format",
+    type=click.Choice(sorted(set(FORMATS.values())), case_sensitive=False),
+    help="format of the input file, by default guessed from its extension",
+)
+@click.option(
+    "--chunk-size",
+    default=10000,
+    type=int,
+    show_default=True,
+    help="number of records read and passed to the model at once",
+)
+@click.option(
+    "--jobs",
+    default=1,
+    type=int,
+    show_default=True,
+    help="number of processes scoring chunks in parallel, each with its own copy \
+of the model",
+)
+@click.option(
+    "--invalid-records",
+    default="fail",
+    type=click.Choice(["fail", "report"], case_sensitive=False),
+    show_default=True,
+    help="whether an invalid record fails the command, or is answered with an \
+error line in place of its Response",
+)
+def score(
+    input_path: Path,
+    output: IO[str],
+    schema_path: Path,
+    model_path: str,
+    input_format: Optional[str],
+    chunk_size: int,
+    jobs: int,
+    invalid_records: str,
+) -> None:
+    """Score the records in INPUT_PATH without running a server.
+
+    INPUT_PATH is a CSV, Parquet or newline-delimited JSON file whose records are
+    items of the schema's Request; one JSON-encoded Response per record is written
+    to OUTPUT, or to stdout by default, as newline-delimited JSON in the order of
+    the input. Unless --invalid-records is report, the first invalid record
+    fails the command.
+    """
+    log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    logging.basicConfig(level=logging.INFO, format=log_fmt)
+    logger = logging.getLogger(__name__)
+
+    if input_format is None:
+        extension = os.path.splitext(input_path)[1].lower()
+        if extension not in FORMATS:
+            raise click.BadParameter(
+                f"cannot guess the format of {input_path}, use --input-format",
+                param_hint="INPUT_PATH",
+            )
+        input_format = FORMATS[extension]
+    logger.info(f"Scoring {input_format} file {input_path} with {jobs} jobs")
+    report_invalid = invalid_records.lower() == "report"
+
+    with TemporaryDirectory() as temp_dir:
+        chunks = _read_chunks(input_path, input_format, chunk_size)
+
+        results: Iterator[List[str]]
+        pool: Optional[concurrent.futures.Executor] = None
+        if jobs > 1:
+            # the model is only loaded by the processes that score the chunks
+            model_uri = download_model_artifact(logger, model_path, temp_dir)
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_uri, schema_path, report_invalid),
+            )
+            results = _map_ordered(pool, chunks, 2 * jobs)
+        else:
+            model, _ = load_model_artifact(logger, model_path, temp_dir)
+            schema = load_schema(schema_path)
+            results = (
+                score_chunk(model, schema, chunk, report_invalid) for chunk in chunks
+            )
+
+        try:
+            count = 0
+            for lines in results:
+                for line in lines:
+                    output.write(line)
+                    output.write("\n")
+                count += len(lines)
+                logger.info(f"Scored {count} records")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
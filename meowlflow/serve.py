@@ -1,9 +1,22 @@
 import logging
+import functools
+import os
 from pathlib import Path
+import time
 from tempfile import TemporaryDirectory
-from typing import Any, Dict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import click
+from fastapi import FastAPI
 from mlflow.models.container import MODEL_PATH
 from mlflow.pyfunc import (
     PyFuncModel,
@@ -15,16 +28,31 @@ from mlflow.utils.file_utils import (
 from mlflow.pyfunc import (
     backend as mlflow_backend,
 )
-import uvicorn
-
+import meowlflow
+from meowlflow import (
+    artifacts,
+    batching,
+    cache,
+    executor,
+    jobs,
+    manifest,
+    reload,
+    server,
+    startup,
+)
 from meowlflow.api import api, info
+from meowlflow.api.middlewares import admission
 from meowlflow.sidecar import (
     Infer,
+    infer_options,
     register_infer_endpoint,
 )
 from meowlflow.app import build_app
 from meowlflow.integrations import sentry
 
+if TYPE_CHECKING:
+    from meowlflow import rpc
+
 
 @click.option(
     "--endpoint",
@@ -35,7 +63,8 @@ from meowlflow.integrations import sentry
 @click.option(
     "--schema-path",
     default="/var/lib/meowlflow/schema.py",
-    type=click.Path(exists=True, dir_okay=False),
+    # the schema path is checked by serve, since it is not used with a manifest
+    type=click.Path(dir_okay=False),
     show_default=True,
 )
 @click.option(
@@ -56,6 +85,17 @@ from meowlflow.integrations import sentry
     type=int,
     show_default=True,
 )
+@infer_options
+@cache.options
+@batching.options
+@executor.options
+@startup.options
+@reload.options
+@manifest.options
+@artifacts.options
+@jobs.options
+@server.options
+@admission.options
 @sentry.options
 def serve(
     endpoint: str,
@@ -63,57 +103,545 @@ def serve(
     model_path: str,
     host: str,
     port: int,
+    stream_chunk_size: int,
+    server_timing: bool,
+    fast_response: bool,
+    max_batch_size: int,
+    max_batch_wait_ms: float,
+    predict_executor: str,
+    predict_workers: int,
+    warm_up_requests: int,
+    warm_up_path: Optional[Path],
+    reload_interval: float,
+    manifest: Optional[Path],
+    manifest_memory_budget_mb: float,
+    workers: int,
     **kwargs: Dict[str, Any],
 ) -> None:
+    startup.record(startup.IMPORTS, time.perf_counter() - meowlflow._import_start)
+    if manifest is not None and reload_interval > 0:
+        raise click.UsageError("--reload-interval cannot be used with --manifest")
+    if manifest is None and not Path(schema_path).is_file():
+        raise click.BadParameter(
+            f"File '{schema_path}' does not exist.", param_hint="'--schema-path'"
+        )
+
     log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     logging.basicConfig(level=logging.INFO, format=log_fmt)
     logger = logging.getLogger(__name__)
 
-    logger.info(f"Setting inference endpoint to {endpoint}")
+    if manifest is not None:
+        logger.info(f"Setting inference endpoints from manifest {manifest}")
+    else:
+        logger.info(f"Setting inference endpoint to {endpoint}")
     logger.info(f"Using host {host}")
     logger.info(f"Using port {port}")
+    if max_batch_size > 1:
+        logger.info(
+            f"Batching up to {max_batch_size} rows for at most {max_batch_wait_ms}ms"
+        )
+    logger.info(f"Running predictions with {predict_executor} executor")
+    if reload_interval > 0:
+        logger.info(f"Checking for new model versions every {reload_interval}s")
+    grpc_server = server.create_grpc_server(
+        host, workers=workers, **server.parse_grpc_kwargs(**kwargs)
+    )
+    job_queue = jobs.create(processes=workers, **jobs.parse_kwargs(**kwargs))
 
-    try:
-        # try to load a local artifact
-        model = load_model(path_to_local_file_uri(model_path))
-        logger.info(f"Loaded local model artifact from {model_path}")
-    except OSError as e:
+    with TemporaryDirectory() as temp_dir:
+        # remote artifacts are downloaded into a directory that outlives the
+        # server, so that predictor processes can load the model from it
+        if manifest is not None:
+            app = create_manifest_app(
+                logger,
+                manifest,
+                temp_dir,
+                stream_chunk_size=stream_chunk_size,
+                server_timing=server_timing,
+                fast_response=fast_response,
+                cache_config=cache.parse_kwargs(**kwargs),
+                max_batch_size=max_batch_size,
+                max_batch_wait_ms=max_batch_wait_ms,
+                predict_executor=predict_executor,
+                predict_workers=predict_workers,
+                warm_up_requests=warm_up_requests,
+                warm_up_path=warm_up_path,
+                memory_budget_mb=manifest_memory_budget_mb,
+                artifact_cache=artifacts.create(**artifacts.parse_kwargs(**kwargs)),
+                admission_config=admission.parse_kwargs(**kwargs),
+                sentry_config=sentry.parse_kwargs(**kwargs),
+                grpc_server=grpc_server,
+                job_queue=job_queue,
+            )
+            server.run(logger, app, host, port, workers, grpc_server)
+            return
+
+        app = create_app(
+            logger,
+            endpoint,
+            schema_path,
+            model_path,
+            temp_dir,
+            stream_chunk_size=stream_chunk_size,
+            server_timing=server_timing,
+            fast_response=fast_response,
+            cache_config=cache.parse_kwargs(**kwargs),
+            max_batch_size=max_batch_size,
+            max_batch_wait_ms=max_batch_wait_ms,
+            predict_executor=predict_executor,
+            predict_workers=predict_workers,
+            warm_up_requests=warm_up_requests,
+            warm_up_path=warm_up_path,
+            reload_interval=reload_interval,
+            artifact_cache=artifacts.create(**artifacts.parse_kwargs(**kwargs)),
+            admission_config=admission.parse_kwargs(**kwargs),
+            sentry_config=sentry.parse_kwargs(**kwargs),
+            grpc_server=grpc_server,
+            job_queue=job_queue,
+        )
+        server.run(logger, app, host, port, workers, grpc_server)
+
+
+def create_app(
+    logger: logging.Logger,
+    endpoint: str,
+    schema_path: Path,
+    model_path: str,
+    output_path: str,
+    stream_chunk_size: int = 1000,
+    server_timing: bool = False,
+    fast_response: bool = False,
+    cache_config: Optional[Dict[str, Any]] = None,
+    max_batch_size: int = 0,
+    max_batch_wait_ms: float = 5.0,
+    predict_executor: str = "inline",
+    predict_workers: int = 1,
+    warm_up_requests: int = 0,
+    warm_up_path: Optional[Path] = None,
+    reload_interval: float = 0.0,
+    artifact_cache: Optional[artifacts.ArtifactCache] = None,
+    admission_config: Optional[Dict[str, Any]] = None,
+    sentry_config: Optional[Dict[str, Any]] = None,
+    grpc_server: Optional["rpc.GrpcServer"] = None,
+    job_queue: Optional[jobs.JobQueue] = None,
+) -> FastAPI:
+    """build an app serving a model
+
+    The model is loaded while building the app, so that it is shared by all
+    workers forked from the process that called this factory.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    endpoint : str
+    schema_path : Path
+    model_path : str
+        local path or URI of a remote model artifact
+    output_path : str
+        local directory into which a remote artifact is downloaded; it must
+        exist for as long as the app is served
+    stream_chunk_size : int, default: 1000
+    server_timing : bool, default: False
+    fast_response : bool, default: False
+    cache_config : dict, default: None
+        keyword arguments for the response cache, see `cache.create`
+    max_batch_size : int, default: 0
+    max_batch_wait_ms : float, default: 5.0
+    predict_executor : str in {"inline", "thread", "process"}, default: "inline"
+    predict_workers : int, default: 1
+    warm_up_requests : int, default: 0
+        number of predictions run on startup before the app is ready, see
+        `startup.get_warm_up`; new versions of the model are warmed up with at
+        least one prediction before they are swapped in
+    warm_up_path : Path, default: None
+        JSON file with the request used to warm up the model instead of the
+        example of the schema's Request
+    reload_interval : float, default: 0.0
+        seconds between checks for a new version of the model, which is then
+        loaded and swapped in without downtime, see `reload.ReloadingPredictor`;
+        0 disables reloading
+    artifact_cache : artifacts.ArtifactCache, default: None
+        cache into which remote artifacts are downloaded instead of output_path
+    admission_config : dict, default: None
+        keyword arguments for the admission controller, see
+        `admission.AdmissionMiddleware`
+    sentry_config : dict, default: None
+    grpc_server : rpc.GrpcServer, default: None
+        server to which the inference endpoint is also added, and which is
+        started once the model has been warmed up
+    job_queue : jobs.JobQueue, default: None
+        queue running the jobs submitted to the job endpoints, which are only
+        registered if it is given
+
+    Returns
+    -------
+    FastAPI app
+    """
+    # the processes of the process executor load the model on their own
+    load = functools.partial(
+        load_model_artifact,
+        logger,
+        artifact_cache=artifact_cache,
+        load=predict_executor != "process",
+    )
+    resolved = None
+    if reload_interval > 0:
+        # the version the path resolves to is loaded, so that the reloader does
+        # not mistake a version released in the meantime for the loaded one
         try:
-            # try to load a remote artifact
-            with TemporaryDirectory() as temp_dir:
-                local_path = mlflow_backend._download_artifact_from_uri(
-                    model_path,
-                    output_path=temp_dir,
-                )
-                model = load_model(path_to_local_file_uri(local_path))
-                logger.info(f"Loaded remote model artifact from {model_path}")
-        except Exception:
-            # if both fail, raise the original error
-            raise e
+            resolved = reload.resolve(model_path)
+        except Exception as e:
+            logger.warning(f"Failed to resolve {model_path}: {e}")
+    model, model_uri = load(reload.pin(model_path, resolved), output_path)
+    version = model_version(model, model_uri)
+
+    predictor = reload.ReloadingPredictor(
+        executor.Predictor(
+            model,
+            model_uri,
+            kind=predict_executor,
+            workers=predict_workers,
+        ),
+        version,
+        resolved,
+        model_path,
+        output_path,
+        load,
+        get_start(predict_executor, predict_workers),
+        model_version,
+        interval=reload_interval,
+        endpoint=endpoint,
+        release=functools.partial(release_model_artifact, artifact_cache),
+        logger=logger,
+    )
 
-    sentry_kwargs = sentry.parse_kwargs(**kwargs)
-    app = build_app(sentry_kwargs)
+    app = build_app(sentry_config or {}, admission_config)
+    app.on_event("shutdown")(predictor.shutdown)
 
-    register_infer_endpoint(
+    response_cache, row_cache = cache.create(
+        version=version,
+        endpoint=endpoint,
+        **(cache_config or {}),
+    )
+    predictor.on_swap(functools.partial(info.set_model_version, endpoint))
+    if response_cache is not None:
+        predictor.on_swap(response_cache.set_version)
+    if row_cache is not None:
+        predictor.on_swap(row_cache.set_version)
+    schema = register_infer_endpoint(
         logger,
         app,
         api.router,
         endpoint,
-        get_infer(model),
+        batching.wrap(
+            get_infer(predictor), max_batch_size, max_batch_wait_ms, endpoint
+        ),
         schema_path,
+        stream_chunk_size=stream_chunk_size,
+        response_cache=response_cache,
+        row_cache=row_cache,
+        model_version=predictor.get_version,
+        server_timing=server_timing,
+        fast_response=fast_response,
+        grpc_server=grpc_server,
+        job_queue=job_queue,
     )
+    warm_up = startup.get_warm_up(schema, warm_up_path, warm_up_requests)
+    if reload_interval > 0:
+        # new versions are warmed up with the example of the schema, if it has
+        # one, even if the initial version is not
+        predictor.warm_up = startup.get_warm_up(
+            schema,
+            warm_up_path,
+            max(warm_up_requests, 1),
+            required=warm_up_requests > 0,
+        )
+
+    async def start() -> None:
+        with startup.stage(startup.PREDICTOR):
+            await predictor.startup()
+        if warm_up is not None:
+            with startup.stage(startup.WARM_UP):
+                await warm_up(predictor.predict)
+        startup.finish(logger)
+        info.set_ready(True)
+
+    # the app is not ready until the model has been warmed up by each worker
+    info.set_ready(False)
+    app.on_event("startup")(start)
+    if job_queue is not None:
+        job_queue.attach(app)
+    if grpc_server is not None:
+        grpc_server.attach(app)
     app.include_router(info.router)
     app.include_router(api.router)
-    uvicorn.run(
-        app,
-        host=host,
-        port=port,
-        log_level="debug",
+    return app
+
+
+def create_manifest_app(
+    logger: logging.Logger,
+    manifest_path: Path,
+    output_path: str,
+    stream_chunk_size: int = 1000,
+    server_timing: bool = False,
+    fast_response: bool = False,
+    cache_config: Optional[Dict[str, Any]] = None,
+    max_batch_size: int = 0,
+    max_batch_wait_ms: float = 5.0,
+    predict_executor: str = "inline",
+    predict_workers: int = 1,
+    warm_up_requests: int = 0,
+    warm_up_path: Optional[Path] = None,
+    memory_budget_mb: float = 0.0,
+    artifact_cache: Optional[artifacts.ArtifactCache] = None,
+    admission_config: Optional[Dict[str, Any]] = None,
+    sentry_config: Optional[Dict[str, Any]] = None,
+    grpc_server: Optional["rpc.GrpcServer"] = None,
+    job_queue: Optional[jobs.JobQueue] = None,
+) -> FastAPI:
+    """build an app serving the models of a manifest, see `manifest.load_manifest`
+
+    Unlike `create_app`, the models are loaded on the first request to their
+    endpoint, by each worker, and unloaded when the models loaded by a worker
+    exceed the memory budget, see `manifest.ModelPool`. Each endpoint has its
+    own caches and batcher.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    manifest_path : Path
+    output_path : str
+        local directory into which remote artifacts are downloaded; it must
+        exist for as long as the app is served
+    warm_up_requests : int, default: 0
+        number of predictions run on startup by every endpoint before the app is
+        ready, which loads every model
+    memory_budget_mb : float, default: 0.0
+        megabytes of models, measured by their size on disk, kept loaded by each
+        worker; 0 keeps every model loaded
+    artifact_cache : artifacts.ArtifactCache, default: None
+
+    See `create_app` for the other parameters.
+
+    Returns
+    -------
+    FastAPI app
+    """
+    entries = manifest.load_manifest(manifest_path)
+    pool = manifest.ModelPool(
+        output_path,
+        functools.partial(
+            load_model_artifact,
+            logger,
+            artifact_cache=artifact_cache,
+            load=predict_executor != "process",
+        ),
+        get_start(predict_executor, predict_workers),
+        model_version,
+        memory_budget=int(memory_budget_mb * 1024 * 1024),
+        release=functools.partial(release_model_artifact, artifact_cache),
+        logger=logger,
     )
 
+    app = build_app(sentry_config or {}, admission_config)
+    app.on_event("shutdown")(pool.shutdown)
+
+    warm_ups = []
+    for i, (endpoint, entry) in enumerate(entries.items()):
+        predictor = pool.predictor(endpoint, entry.model)
+        response_cache, row_cache = cache.create(
+            endpoint=endpoint, **(cache_config or {})
+        )
+        predictor.on_load(functools.partial(info.set_model_version, endpoint))
+        if response_cache is not None:
+            predictor.on_load(response_cache.set_version)
+        if row_cache is not None:
+            predictor.on_load(row_cache.set_version)
+        schema = register_infer_endpoint(
+            logger,
+            app,
+            api.router,
+            endpoint,
+            batching.wrap(
+                get_infer(predictor), max_batch_size, max_batch_wait_ms, endpoint
+            ),
+            entry.schema_path,
+            stream_chunk_size=stream_chunk_size,
+            response_cache=response_cache,
+            row_cache=row_cache,
+            model_version=predictor.get_version,
+            server_timing=server_timing,
+            fast_response=fast_response,
+            grpc_server=grpc_server,
+            job_queue=job_queue,
+            # distinct module names keep the models of the schemas apart in the
+            # OpenAPI document
+            schema_module=f"schema{i}",
+        )
+        warm_up = startup.get_warm_up(
+            schema, entry.warm_up_path or warm_up_path, warm_up_requests
+        )
+        if warm_up is not None:
+            warm_ups.append((warm_up, predictor))
+
+    async def start() -> None:
+        with startup.stage(startup.WARM_UP):
+            for warm_up, predictor in warm_ups:
+                await warm_up(predictor.predict)
+        startup.finish(logger)
+        info.set_ready(True)
+
+    info.set_ready(False)
+    app.on_event("startup")(start)
+    if job_queue is not None:
+        job_queue.attach(app)
+    if grpc_server is not None:
+        grpc_server.attach(app)
+    app.include_router(info.router)
+    app.include_router(api.router)
+    return app
+
+
+def load_model_artifact(
+    logger: logging.Logger,
+    model_path: str,
+    output_path: str,
+    artifact_cache: Optional[artifacts.ArtifactCache] = None,
+    load: bool = True,
+) -> Tuple[PyFuncModel, str]:
+    """load a model from a local path or, failing that, from a remote artifact store
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    model_path : str
+        local path or URI of a remote model artifact
+    output_path : str
+        local directory into which a remote artifact is downloaded
+    artifact_cache : artifacts.ArtifactCache, default: None
+        cache into which a remote artifact is downloaded instead of output_path,
+        unless it is cached already
+    load : bool, default: True
+        whether to load the implementation of the model, or only its metadata,
+        see `executor.load_metadata`
+
+    Returns
+    -------
+    the model and the local URI it was loaded from
+    """
+    if not load:
+        model_uri = download_model_artifact(
+            logger, model_path, output_path, artifact_cache
+        )
+        with startup.stage(startup.LOAD_MODEL):
+            model = executor.load_metadata(model_uri)
+        return model, model_uri
+    try:
+        # try to load a local artifact
+        model_uri = path_to_local_file_uri(model_path)
+        with startup.stage(startup.LOAD_MODEL):
+            model = load_model(model_uri)
+        logger.info(f"Loaded local model artifact from {model_path}")
+    except OSError as e:
+        try:
+            # try to load a remote artifact
+            model_uri = _download_model_artifact(
+                model_path, output_path, artifact_cache
+            )
+            with startup.stage(startup.LOAD_MODEL):
+                model = load_model(model_uri)
+            logger.info(f"Loaded remote model artifact from {model_path}")
+        except Exception:
+            # if both fail, raise the original error
+            raise e
+    return model, model_uri
+
+
+def download_model_artifact(
+    logger: logging.Logger,
+    model_path: str,
+    output_path: str,
+    artifact_cache: Optional[artifacts.ArtifactCache] = None,
+) -> str:
+    """download a model from a remote artifact store unless it is local, without
+    loading it, e.g. for processes that load it on their own
+
+    See `load_model_artifact` for the parameters.
+
+    Returns
+    -------
+    the local URI of the model
+    """
+    if os.path.exists(model_path):
+        local_uri: str = path_to_local_file_uri(model_path)
+        return local_uri
+    model_uri = _download_model_artifact(model_path, output_path, artifact_cache)
+    logger.info(f"Downloaded remote model artifact from {model_path}")
+    return model_uri
+
+
+def release_model_artifact(
+    artifact_cache: Optional[artifacts.ArtifactCache], model_uri: str
+) -> None:
+    """release a model loaded by `load_model_artifact` from the artifact cache, if
+    it was, so that it can be evicted"""
+    if artifact_cache is None:
+        return
+    key = artifact_cache.key(model_uri)
+    if key is not None:
+        artifact_cache.release(key)
+
+
+def _download_model_artifact(
+    model_path: str,
+    output_path: str,
+    artifact_cache: Optional[artifacts.ArtifactCache] = None,
+) -> str:
+    with startup.stage(startup.DOWNLOAD):
+        if artifact_cache is not None:
+            local_path = artifact_cache.download(model_path)
+        else:
+            local_path = mlflow_backend._download_artifact_from_uri(
+                model_path,
+                output_path=output_path,
+            )
+    model_uri: str = path_to_local_file_uri(local_path)
+    return model_uri
+
+
+def model_version(model: PyFuncModel, model_uri: str) -> str:
+    """identify a loaded model by its UUID, or by its run and URI for older models"""
+    metadata = model.metadata
+    model_uuid = getattr(metadata, "model_uuid", None)
+    if model_uuid:
+        return str(model_uuid)
+    return f"{getattr(metadata, 'run_id', None)}:{model_uri}"
+
+
+def get_start(
+    predict_executor: str, predict_workers: int
+) -> Callable[[PyFuncModel, str], Awaitable[executor.Predictor]]:
+    """create and start predictors of models with the given executor"""
+
+    async def start(model: PyFuncModel, model_uri: str) -> executor.Predictor:
+        predictor = executor.Predictor(
+            model,
+            model_uri,
+            kind=predict_executor,
+            workers=predict_workers,
+        )
+        await predictor.startup()
+        return predictor
+
+    return start
+
 
-def get_infer(model: PyFuncModel) -> Infer:
+def get_infer(
+    predictor: Union[
+        executor.Predictor, reload.ReloadingPredictor, manifest.LazyPredictor
+    ]
+) -> Infer:
     async def infer(data: Any) -> Any:
-        return model.predict(data)
+        return await predictor.predict(data)
 
     return infer
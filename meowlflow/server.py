@@ -0,0 +1,140 @@
+import glob
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, TypeVar
+
+import click
+from fastapi import FastAPI
+import uvicorn
+
+if TYPE_CHECKING:
+    from meowlflow.rpc import GrpcServer
+
+
+RT = TypeVar("RT")
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--grpc-only",
+        is_flag=True,
+        default=False,
+        help="serve the inference endpoints over gRPC only; the HTTP port then \
+only serves the Prometheus metrics",
+    )(function)
+    function = click.option(
+        "--grpc-port",
+        default=0,
+        type=int,
+        show_default=True,
+        help="port of a gRPC server serving the inference endpoints alongside the \
+HTTP server, eg: 50051, 0 disables it; see `meowlflow proto` for its messages",
+    )(function)
+    function = click.option(
+        "--workers",
+        default=1,
+        type=int,
+        show_default=True,
+        help="number of worker processes; the app, including the model, is built \
+once and then forked into every worker",
+    )(function)
+    return function
+
+
+def parse_grpc_kwargs(**kwargs: Any) -> Dict[str, Any]:
+    grpc_kwargs = {}
+    for k, v in kwargs.items():
+        if k.startswith("grpc_"):
+            key = k[len("grpc_") :]
+            grpc_kwargs[key] = v
+    return grpc_kwargs
+
+
+def create_grpc_server(
+    host: str, port: int = 0, only: bool = False, workers: int = 1
+) -> Optional["GrpcServer"]:
+    """create the gRPC server of the command line options, see `options`
+
+    The `rpc` module, and protobuf, are only imported if gRPC is enabled.
+
+    Returns
+    -------
+    GrpcServer, or None if gRPC is disabled
+    """
+    if port <= 0:
+        if only:
+            raise click.UsageError("--grpc-only requires --grpc-port")
+        return None
+    if only and workers > 1:
+        raise click.UsageError("--grpc-only cannot be used with --workers")
+    from meowlflow.rpc import GrpcServer
+
+    return GrpcServer(host, port, only=only)
+
+
+def _clean_multiprocess_dir(logger: logging.Logger) -> None:
+    path = os.environ.get(
+        "PROMETHEUS_MULTIPROC_DIR", os.environ.get("prometheus_multiproc_dir")
+    )
+    if not path:
+        logger.warning(
+            "PROMETHEUS_MULTIPROC_DIR is not set; metrics will only reflect the \
+worker that serves each /metrics request"
+        )
+        return
+    # metrics left behind by a previous run would otherwise be aggregated
+    for f in glob.glob(os.path.join(path, "*.db")):
+        os.remove(f)
+
+
+def run(
+    logger: logging.Logger,
+    app: FastAPI,
+    host: str,
+    port: int,
+    workers: int = 1,
+    grpc_server: Optional["GrpcServer"] = None,
+) -> None:
+    """serve an app on the given host and port with one or more worker processes
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    app : FastAPI
+    host : str
+    port : int
+    workers : int, default: 1
+        with a single worker, the app is served by uvicorn in the current process;
+        otherwise gunicorn forks the given number of uvicorn workers
+    grpc_server : rpc.GrpcServer, default: None
+        gRPC server of the app, which serves the app instead of uvicorn if it is
+        gRPC only, see `rpc.GrpcServer.run`
+    """
+    if grpc_server is not None and grpc_server.only:
+        grpc_server.run(logger, app, host, port)
+        return
+
+    if workers <= 1:
+        uvicorn.run(
+            app,
+            host=host,
+            port=port,
+            log_level="debug",
+        )
+        return
+
+    # gunicorn is only imported when it is used, since it takes a while to import
+    from meowlflow.workers import Application, child_exit
+
+    logger.info(f"Using {workers} workers")
+    _clean_multiprocess_dir(logger)
+    Application(
+        app,
+        {
+            "bind": f"{host}:{port}",
+            "workers": workers,
+            "worker_class": "uvicorn.workers.UvicornWorker",
+            "child_exit": child_exit,
+            "loglevel": "debug",
+        },
+    ).run()
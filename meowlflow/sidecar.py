@@ -1,18 +1,57 @@
 from pathlib import Path
+import json
 import logging
+import traceback
 import importlib.util
-from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 import types
 
-import aiohttp
 import click
-from fastapi import FastAPI, routing
-import uvicorn
+from fastapi import APIRouter, FastAPI, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 
-from meowlflow.api import api, info, base
+from meowlflow import (
+    arrow,
+    batching,
+    cache,
+    encoding,
+    jobs,
+    ndjson,
+    server,
+    startup,
+    timing,
+    upstreams,
+)
+from meowlflow.api import api, info, base, responses, routing
+from meowlflow.api.jobs import register_job_endpoints
+from meowlflow.api.middlewares import admission
 from meowlflow.app import build_app
+from meowlflow.exception import (
+    InvalidParams,
+    InvalidUsage,
+    MeowlflowException,
+    Unexpected,
+)
 from meowlflow.integrations import sentry
 
+if TYPE_CHECKING:
+    # the rpc module imports protobuf, which is only needed if gRPC is enabled
+    from meowlflow import rpc
+
 
 def _load_module(module_path: Path, module_name: str) -> types.ModuleType:
     spec = importlib.util.spec_from_file_location(module_name, module_path)
@@ -33,6 +72,35 @@ def _to_endpoint_path(endpoint: str) -> str:
     return "/"
 
 
+RT = TypeVar("RT")
+
+
+def infer_options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--stream-chunk-size",
+        default=1000,
+        type=int,
+        show_default=True,
+        help="number of records streamed to the /stream endpoint that are passed to \
+the model at once",
+    )(function)
+    function = click.option(
+        "--fast-response",
+        is_flag=True,
+        default=False,
+        help="encode the output of Response.transform as JSON without validating \
+it against the Response model",
+    )(function)
+    function = click.option(
+        "--server-timing",
+        is_flag=True,
+        default=False,
+        help="report the time spent in each stage of the inference endpoint in a \
+Server-Timing response header",
+    )(function)
+    return function
+
+
 @click.option(
     "--endpoint",
     default="/infer",
@@ -41,9 +109,12 @@ def _to_endpoint_path(endpoint: str) -> str:
 )
 @click.option(
     "--upstream",
-    default="http://127.0.0.1:8080/invocations",
+    default=["http://127.0.0.1:8080/invocations"],
     type=str,
+    multiple=True,
     show_default=True,
+    help="URL of the model upstream; requests are balanced over the replicas of \
+the model if the option is given several times",
 )
 @click.option(
     "--schema-path",
@@ -63,13 +134,26 @@ def _to_endpoint_path(endpoint: str) -> str:
     type=int,
     show_default=True,
 )
+@infer_options
+@batching.options
+@cache.options
+@upstreams.options
+@jobs.options
+@server.options
+@admission.options
 @sentry.options
 def sidecar(
     endpoint: str,
-    upstream: str,
+    upstream: Tuple[str, ...],
     schema_path: Path,
     host: str,
     port: int,
+    stream_chunk_size: int,
+    server_timing: bool,
+    fast_response: bool,
+    workers: int,
+    max_batch_size: int,
+    max_batch_wait_ms: float,
     **kwargs: Dict[str, Any],
 ) -> None:
 
@@ -78,66 +162,244 @@ def sidecar(
     logger = logging.getLogger(__name__)
 
     logger.info(f"Setting inference endpoint to {endpoint}")
-    logger.info(f"Using model upstream at {upstream}")
+    logger.info(f"Using model upstream at {', '.join(upstream)}")
     logger.info(f"Using host {host}")
     logger.info(f"Using port {port}")
 
-    sentry_kwargs = sentry.parse_kwargs(**kwargs)
-    app = build_app(sentry_kwargs)
+    upstream_kwargs = upstreams.parse_kwargs(**kwargs)
+    logger.info(
+        f"Using at most {upstream_kwargs['max_connections']} connections per upstream"
+    )
+    grpc_server = server.create_grpc_server(
+        host, workers=workers, **server.parse_grpc_kwargs(**kwargs)
+    )
+    job_queue = jobs.create(processes=workers, **jobs.parse_kwargs(**kwargs))
 
-    register_infer_endpoint(
+    app = create_app(
+        logger,
+        endpoint,
+        upstream,
+        schema_path,
+        stream_chunk_size=stream_chunk_size,
+        server_timing=server_timing,
+        fast_response=fast_response,
+        max_batch_size=max_batch_size,
+        max_batch_wait_ms=max_batch_wait_ms,
+        cache_config=cache.parse_kwargs(**kwargs),
+        upstream_config=upstream_kwargs,
+        admission_config=admission.parse_kwargs(**kwargs),
+        sentry_config=sentry.parse_kwargs(**kwargs),
+        grpc_server=grpc_server,
+        job_queue=job_queue,
+    )
+    server.run(logger, app, host, port, workers, grpc_server)
+
+
+def create_app(
+    logger: logging.Logger,
+    endpoint: str,
+    upstream: Union[str, Sequence[str]],
+    schema_path: Path,
+    stream_chunk_size: int = 1000,
+    server_timing: bool = False,
+    fast_response: bool = False,
+    max_batch_size: int = 0,
+    max_batch_wait_ms: float = 5.0,
+    cache_config: Optional[Dict[str, Any]] = None,
+    upstream_config: Optional[Dict[str, Any]] = None,
+    admission_config: Optional[Dict[str, Any]] = None,
+    sentry_config: Optional[Dict[str, Any]] = None,
+    grpc_server: Optional["rpc.GrpcServer"] = None,
+    job_queue: Optional[jobs.JobQueue] = None,
+) -> FastAPI:
+    """build an app proxying requests to a model upstream
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    endpoint : str
+    upstream : str or list of str
+        URL of the model upstream, eg: "http://127.0.0.1:8080/invocations", or
+        URLs of its replicas
+    schema_path : Path
+    stream_chunk_size : int, default: 1000
+    server_timing : bool, default: False
+    fast_response : bool, default: False
+    max_batch_size : int, default: 0
+        maximum number of rows sent upstream in one request by merging concurrent
+        requests, 0 disables batching, see `batching.Batcher`
+    max_batch_wait_ms : float, default: 5.0
+    cache_config : dict, default: None
+        keyword arguments for the response cache, see `cache.create`
+    upstream_config : dict, default: None
+        keyword arguments for the upstream client, see `upstreams.UpstreamPool`
+    admission_config : dict, default: None
+        keyword arguments for the admission controller, see
+        `admission.AdmissionMiddleware`
+    sentry_config : dict, default: None
+    grpc_server : rpc.GrpcServer, default: None
+        server to which the inference endpoint is also added, and which is
+        started with the app
+    job_queue : jobs.JobQueue, default: None
+        queue running the jobs submitted to the job endpoints, which are only
+        registered if it is given
+
+    Returns
+    -------
+    FastAPI app
+    """
+    urls = [upstream] if isinstance(upstream, str) else list(upstream)
+    client = upstreams.UpstreamPool(urls, **(upstream_config or {}))
+
+    app = build_app(sentry_config or {}, admission_config)
+    app.on_event("startup")(client.startup)
+    app.on_event("startup")(startup.publish)
+    app.on_event("shutdown")(client.shutdown)
+
+    # the version of the model behind the upstream is unknown, so cached
+    # responses are only invalidated by their TTL
+    response_cache, row_cache = cache.create(
+        version=",".join(urls), endpoint=endpoint, **(cache_config or {})
+    )
+    infer = get_infer(client)
+    schema = register_infer_endpoint(
         logger,
         app,
         api.router,
         endpoint,
-        get_infer(upstream),
+        batching.wrap(infer, max_batch_size, max_batch_wait_ms, endpoint),
         schema_path,
+        stream_chunk_size=stream_chunk_size,
+        response_cache=response_cache,
+        row_cache=row_cache,
+        server_timing=server_timing,
+        fast_response=fast_response,
+        grpc_server=grpc_server,
+        job_queue=job_queue,
     )
+    infer.encoder = encoding.get_encoder(
+        getattr(schema, "upstream_format", encoding.PANDAS_RECORDS)
+    )
+    logger.info(f"Sending {infer.encoder.content_type} requests upstream")
 
+    if job_queue is not None:
+        job_queue.attach(app)
+    if grpc_server is not None:
+        grpc_server.attach(app)
     app.include_router(info.router)
     app.include_router(api.router)
-    uvicorn.run(
-        app,  # nomypy, https://github.com/tiangolo/fastapi/issues/3927
-        host=host,
-        port=port,
-        log_level="debug",
-    )
+    return app
 
 
 Infer = Callable[[Any], Awaitable[Any]]
 
 
-def get_infer(upstream: str) -> Infer:
-    headers = {"Content-Type": "application/json; format=pandas-records"}
+class UpstreamInfer:
+    """Run the model behind an upstream on the output of `Request.transform`.
+
+    The input is encoded, and the predictions decoded, by `encoder`, which
+    defaults to the format of the `upstream_format` of the schema module, see
+    `encoding.ENCODERS`.
+    """
+
+    def __init__(
+        self, client: upstreams.UpstreamPool, encoder: Optional[encoding.Encoder] = None
+    ) -> None:
+        self.client = client
+        self.encoder = encoder or encoding.get_encoder()
+
+    async def __call__(self, data: Any) -> Any:
+        body = self.encoder.encode(data)
+        headers = {"Content-Type": self.encoder.content_type}
+        return self.encoder.decode(await self.client.post(body, headers))
 
-    async def infer(data: Any) -> Any:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                upstream,
-                data=data,
-                headers=headers,
-            ) as response:
-                return await response.json()
 
-    return infer
+def get_infer(
+    client: upstreams.UpstreamPool, encoder: Optional[encoding.Encoder] = None
+) -> UpstreamInfer:
+    return UpstreamInfer(client, encoder)
+
+
+def load_schema(schema_path: Path, module_name: str = "schema") -> types.ModuleType:
+    """load a schema module and check its Request and Response classes
+
+    Schema modules served together must have distinct module names, which
+    qualify the names of their models in the OpenAPI document.
+    """
+    schema = _load_module(schema_path, module_name)
+
+    if not issubclass(schema.Request, base.BaseRequest):
+        raise TypeError(f"Expected {schema.Request} to implement {base.BaseRequest}")
+    if not issubclass(schema.Response, base.BaseResponse):
+        raise TypeError(f"Expected {schema.Response} to implement {base.BaseResponse}")
+    return schema
 
 
 def register_infer_endpoint(
     logger: logging.Logger,
     app: FastAPI,
-    router: routing.APIRouter,
+    router: APIRouter,
     endpoint: str,
     _infer: Infer,
     schema_path: Path,
-) -> None:
+    stream_chunk_size: int = 1000,
+    response_cache: Optional[cache.ResponseCache] = None,
+    row_cache: Optional[cache.RowCache] = None,
+    model_version: Union[str, Callable[[], str]] = "",
+    server_timing: bool = False,
+    fast_response: bool = False,
+    schema_module: str = "schema",
+    grpc_server: Optional["rpc.GrpcServer"] = None,
+    job_queue: Optional[jobs.JobQueue] = None,
+) -> types.ModuleType:
+    """register the inference endpoints of a schema module on a router
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    app : FastAPI
+    router : APIRouter
+    endpoint : str
+        path of the endpoint; records can also be streamed as newline-delimited
+        JSON to the path suffixed with "/stream"
+    _infer : Infer
+        callable running the model on the output of `Request.transform`
+    schema_path : Path
+    stream_chunk_size : int, default: 1000
+        number of streamed records passed to the model at once
+    response_cache : cache.ResponseCache, default: None
+        cache of the JSON responses of the endpoint, keyed on the validated request
+    row_cache : cache.RowCache, default: None
+        cache of the predictions of each row of the output of `Request.transform`,
+        keyed on the `row_key` function of the schema module if it defines one
+    model_version : str or callable, default: ""
+        version of the model, or function returning the version of the model
+        currently served, with which the stage duration metrics are labelled
+    server_timing : bool, default: False
+        whether to report the duration of each stage in a Server-Timing header
+    fast_response : bool, default: False
+        whether to trust the output of `Response.transform` and encode it as JSON
+        without validating it, see `responses.FastJSONResponse`; the OpenAPI
+        document is not affected
+    schema_module : str, default: "schema"
+        name of the schema module, which must differ between the schema modules
+        of endpoints registered on the same app
+    grpc_server : rpc.GrpcServer, default: None
+        server on which the endpoint is also served over gRPC, with messages
+        generated from the Request and Response of the schema module, see
+        `rpc.build_file`
+    job_queue : jobs.JobQueue, default: None
+        queue on which requests submitted to the path of the endpoint suffixed
+        with "/jobs" are run, see `api.jobs.register_job_endpoints`
+
+    Returns
+    -------
+    the schema module
+    """
     if logger is not None:
         logger.info(f"Loading schema module from {schema_path}")
-    schema = _load_module(schema_path, "schema")
-
-    if not issubclass(schema.Request, base.BaseRequest):
-        raise TypeError(f"Expected {schema.Request} to implement {base.BaseRequest}")
-    if not issubclass(schema.Response, base.BaseResponse):
-        raise TypeError(f"Expected {schema.Response} to implement {base.BaseResponse}")
+    with startup.stage(startup.SCHEMA):
+        schema = load_schema(schema_path, schema_module)
 
     for attr in [
         "title",
@@ -152,9 +414,136 @@ def register_infer_endpoint(
             setattr(app, attr, value)
 
     endpoint = _to_endpoint_path(endpoint)
+    if row_cache is not None:
+        _infer = row_cache.wrap(_infer, getattr(schema, "row_key", None))
+
+    def render(response: Any) -> bytes:
+        # encode the output of Response.transform; unless fast responses are
+        # enabled, it is validated like FastAPI validates a route's response_model
+        if fast_response:
+            return responses.dumps(response)
+        return JSONResponse(jsonable_encoder(schema.Response.parse_obj(response))).body
 
-    @router.post(endpoint, response_model=schema.Response)
     async def infer(request: schema.Request) -> Any:  # type: ignore
+        timing.mark(timing.PARSE)
+        if response_cache is None:
+            response = await _predict(request)
+            if fast_response:
+                return responses.FastJSONResponse(response)
+            return response
+        return Response(await _respond(request), media_type="application/json")
+
+    async def _respond(request: base.BaseRequest) -> bytes:
+        # the JSON body of the response, from the response cache if it is enabled
+        if response_cache is None:
+            return render(await _predict(request))
+        key = response_cache.key(request.canonical())
+        body = response_cache.get(key)
+        timing.mark(timing.CACHE)
+        if body is None:
+            body = render(await _predict(request))
+            response_cache.put(key, body)
+        return body
+
+    async def _content(request: base.BaseRequest) -> Any:
+        # the content of the response, validated unless fast responses are
+        # enabled, which is only encoded as JSON if responses are cached
+        if response_cache is not None:
+            return await _respond(request)
+        response = await _predict(request)
+        if fast_response:
+            return response
+        return jsonable_encoder(schema.Response.parse_obj(response))
+
+    async def _predict(request: base.BaseRequest) -> Any:
         data = request.transform()
+        timing.mark(timing.REQUEST_TRANSFORM)
+        response = await _infer(data)
+        timing.mark(timing.INFER)
+        response = schema.Response.transform(response)
+        timing.mark(timing.RESPONSE_TRANSFORM)
+        return response
+
+    async def infer_arrow(request: Request) -> Response:
+        table = arrow.validate(arrow.decode(await request.body()), schema.Request)
+        frame = arrow.to_frame(table)
+        timing.mark(timing.PARSE)
+        data = schema.Request.transform_frame(frame)
+        timing.mark(timing.REQUEST_TRANSFORM)
         response = await _infer(data)
-        return schema.Response.transform(response)
+        timing.mark(timing.INFER)
+        response = schema.Response.transform(response)
+        timing.mark(timing.RESPONSE_TRANSFORM)
+        if arrow.MEDIA_TYPE in request.headers.get("accept", ""):
+            # the same payload as the JSON response, validated unless fast
+            # responses are enabled
+            if not fast_response:
+                response = jsonable_encoder(schema.Response.parse_obj(response))
+            return Response(arrow.encode(response), media_type=arrow.MEDIA_TYPE)
+        return Response(render(response), media_type="application/json")
+
+    router.add_api_route(
+        endpoint,
+        infer,
+        methods=["POST"],
+        response_model=schema.Response,
+        route_class_override=routing.content_type_route(
+            {arrow.MEDIA_TYPE: infer_arrow},
+            timer=timing.StageTimer(
+                endpoint, model_version=model_version, server_timing=server_timing
+            ),
+        ),
+    )
+
+    async def infer_stream(request: Request) -> ndjson.NDJSONResponse:
+        async def lines() -> AsyncIterator[bytes]:
+            offset = 0
+            error: MeowlflowException
+            try:
+                async for records in ndjson.chunks(request.stream(), stream_chunk_size):
+                    data = schema.Request.parse_obj(records).transform()
+                    response = await _infer(data)
+                    for part in ndjson.rows(response, len(records)):
+                        yield render(schema.Response.transform(part)) + b"\n"
+                    offset += len(records)
+                return
+            except ValidationError as e:
+                error = InvalidParams(
+                    f"Invalid record in chunk starting at record {offset}",
+                    {"offset": offset, "errors": e.errors()},
+                )
+            except ndjson.DecodeError as e:
+                error = InvalidUsage(
+                    f"Invalid {ndjson.MEDIA_TYPE} body after record {offset}",
+                    {"offset": offset, "error": str(e)},
+                )
+            except MeowlflowException as e:
+                error = e
+            except Exception:
+                error = Unexpected(
+                    f"Failed to infer the chunk starting at record {offset}",
+                    {"offset": offset},
+                )
+            if error.reported and logger is not None:
+                logger.error(error)
+                logger.error(traceback.format_exc())
+            # the response has already started, so errors are reported in-band
+            yield json.dumps({"error": error.to_dict()}).encode() + b"\n"
+
+        return ndjson.NDJSONResponse(lines())
+
+    # the body of this endpoint is a stream rather than a single JSON document, so
+    # it is left out of the OpenAPI document
+    router.add_api_route(
+        _to_endpoint_path(endpoint + "/stream"),
+        infer_stream,
+        methods=["POST"],
+        include_in_schema=False,
+    )
+    if grpc_server is not None:
+        grpc_server.add_endpoint(endpoint, schema, _content, model_version)
+    if job_queue is not None:
+        register_job_endpoints(
+            router, endpoint, schema, _respond, job_queue, model_version
+        )
+    return schema
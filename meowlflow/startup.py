@@ -0,0 +1,154 @@
+from contextlib import contextmanager
+import json
+import logging
+from pathlib import Path
+import time
+import types
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+import click
+from prometheus_client import Gauge
+
+import meowlflow
+
+
+RT = TypeVar("RT")
+
+STARTUP_DURATION = Gauge(
+    "meowlflow_startup_duration_seconds",
+    "Time spent in each stage of starting the server",
+    ("stage",),
+    multiprocess_mode="max",
+)
+
+# the stages of starting `serve`, in the order in which they run
+IMPORTS = "imports"
+DOWNLOAD = "download"
+LOAD_MODEL = "load_model"
+SCHEMA = "schema"
+PREDICTOR = "predictor"
+WARM_UP = "warm_up"
+
+# runs the warm-up predictions with a function running the model, e.g.
+# `executor.Predictor.predict`
+WarmUp = Callable[[Callable[[Any], Awaitable[Any]]], Awaitable[None]]
+
+_durations: Dict[str, float] = {}
+_started = False
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--warm-up-path",
+        default=None,
+        type=click.Path(exists=True, dir_okay=False),
+        help="JSON file with the body of a request used to warm up the model, \
+instead of the example of the schema's Request",
+    )(function)
+    function = click.option(
+        "--warm-up-requests",
+        default=0,
+        type=int,
+        show_default=True,
+        help="number of predictions run to warm up the model before the server \
+is ready",
+    )(function)
+    return function
+
+
+def record(stage: str, duration: float) -> None:
+    """add to the duration of a stage, unless the server has already started"""
+    if _started:
+        return
+    _durations[stage] = _durations.get(stage, 0.0) + duration
+    STARTUP_DURATION.labels(stage).set(_durations[stage])
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """time a stage of starting the server, see `record`"""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start_time)
+
+
+def publish() -> None:
+    """set the startup metrics to the durations recorded so far
+
+    Workers forked after the app was built, e.g. by gunicorn, start with fresh
+    multiprocess metrics, so each worker publishes the durations of the stages
+    recorded before it was forked again.
+    """
+    for name, duration in _durations.items():
+        STARTUP_DURATION.labels(name).set(duration)
+
+
+def finish(logger: logging.Logger) -> None:
+    """log the duration of each stage of starting the server and stop timing
+
+    The total is measured from when meowlflow started being imported; stages may
+    overlap, e.g. models loaded while warming up.
+    """
+    global _started
+    _started = True
+    publish()
+    total = time.perf_counter() - meowlflow._import_start
+    breakdown = ", ".join(
+        f"{name} {duration:.3f}s" for name, duration in _durations.items()
+    )
+    logger.info(f"Started in {total:.3f}s: {breakdown}")
+
+
+def get_warm_up(
+    schema: types.ModuleType,
+    warm_up_path: Optional[Path] = None,
+    requests: int = 1,
+    required: bool = True,
+) -> Optional[WarmUp]:
+    """run predictions on a request read from a file or the example of a schema
+
+    Each prediction runs the request through `Request.parse_obj`,
+    `Request.transform`, the model and `Response.transform`, like requests to
+    the inference endpoint but without their caches and batching.
+
+    Parameters
+    ----------
+    schema : schema module
+    warm_up_path : Path, default: None
+        JSON file with the request, by default the example of the schema's Request
+    requests : int, default: 1
+        number of predictions
+    required : bool, default: True
+        whether to raise a click.UsageError if there are requests to run but the
+        schema's Request has no example and no file is given, rather than not
+        warming up
+
+    Returns
+    -------
+    the warm-up function, or None if there are no requests to run
+    """
+    if requests < 1:
+        return None
+    if warm_up_path is not None:
+        with open(warm_up_path) as f:
+            example = json.load(f)
+    else:
+        schema_extra = getattr(schema.Request.Config, "schema_extra", None)
+        if not isinstance(schema_extra, dict) or "example" not in schema_extra:
+            if not required:
+                return None
+            raise click.UsageError(
+                f"Cannot warm up the model: the Request of schema \
+{getattr(schema, '__file__', schema.__name__)} has no example in \
+Config.schema_extra, use --warm-up-path"
+            )
+        example = schema_extra["example"]
+
+    async def warm_up(predict: Callable[[Any], Awaitable[Any]]) -> None:
+        for _ in range(requests):
+            data = schema.Request.parse_obj(example).transform()
+            schema.Response.transform(await predict(data))
+
+    return warm_up
@@ -0,0 +1,127 @@
+import contextlib
+from contextvars import ContextVar
+import time
+from typing import Callable, Dict, Iterator, Optional, Union
+
+from fastapi import Request, Response
+from prometheus_client import Histogram
+
+from meowlflow.api.routing import Handler
+
+
+STAGE_DURATION = Histogram(
+    "meowlflow_infer_stage_duration_seconds",
+    "Time spent in each stage of the inference endpoints",
+    ("endpoint", "stage", "model_version"),
+    buckets=(
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    ),
+)
+
+# the stages of the inference endpoints, in the order in which they run
+PARSE = "parse"
+CACHE = "cache"
+REQUEST_TRANSFORM = "request_transform"
+INFER = "infer"
+RESPONSE_TRANSFORM = "response_transform"
+SERIALIZE = "serialize"
+
+
+class _Stages:
+    __slots__ = ("durations", "last")
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = {}
+        self.last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.durations[stage] = self.durations.get(stage, 0.0) + now - self.last
+        self.last = now
+
+
+_stages: ContextVar[Optional[_Stages]] = ContextVar("stages", default=None)
+
+
+def mark(stage: str) -> None:
+    """end a stage of the request being handled, if it is being timed
+
+    The time elapsed since the previous stage ended, or since the request
+    started being handled, is attributed to the given stage.
+    """
+    stages = _stages.get()
+    if stages is not None:
+        stages.mark(stage)
+
+
+class StageTimer:
+    """Time the stages of the requests to an endpoint.
+
+    Handlers run by `time`, or within `stages`, call `mark` at the end of each
+    stage; whatever happens after the handler's last stage, such as FastAPI
+    serializing the returned value, is attributed to the serialize stage.
+
+    The model version may be given as a function returning the version of the
+    model currently served, for models that are reloaded.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        model_version: Union[str, Callable[[], str]] = "",
+        server_timing: bool = False,
+    ) -> None:
+        self.endpoint = endpoint
+        self._model_version = model_version
+        self.server_timing = server_timing
+
+    @property
+    def model_version(self) -> str:
+        if callable(self._model_version):
+            return self._model_version()
+        return self._model_version
+
+    @contextlib.contextmanager
+    def stages(self) -> Iterator[Dict[str, float]]:
+        """time the stages of a request handled within the context
+
+        Yields the durations of the stages, which are complete once the context
+        exits; whatever happens after the last stage marked within the context is
+        attributed to the serialize stage. Requests that raise are not observed.
+        """
+        stages = _Stages()
+        token = _stages.set(stages)
+        try:
+            yield stages.durations
+            stages.mark(SERIALIZE)
+        finally:
+            _stages.reset(token)
+
+        model_version = self.model_version
+        for stage, duration in stages.durations.items():
+            STAGE_DURATION.labels(self.endpoint, stage, model_version).observe(duration)
+
+    async def time(self, handler: Handler, request: Request) -> Response:
+        with self.stages() as durations:
+            response = await handler(request)
+        if self.server_timing:
+            response.headers["Server-Timing"] = ", ".join(
+                f"{stage};dur={duration * 1000:.3f}"
+                for stage, duration in durations.items()
+            )
+        return response
@@ -0,0 +1,508 @@
+import asyncio
+from collections import deque
+import itertools
+import logging
+import time
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+import aiohttp
+import click
+from prometheus_client import Counter, Gauge, Histogram
+
+from meowlflow.exception import UpstreamError, UpstreamRejected, UpstreamUnavailable
+
+
+RT = TypeVar("RT")
+
+UPSTREAM_LATENCY = Histogram(
+    "meowlflow_upstream_request_duration_seconds",
+    "Latency of requests to the model upstream",
+    ("upstream", "status_code"),
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "meowlflow_upstream_requests_in_flight",
+    "Number of requests to the model upstream that have not yet completed",
+    ("upstream",),
+    multiprocess_mode="livesum",
+)
+UPSTREAM_POOL_SATURATED = Counter(
+    "meowlflow_upstream_pool_saturated_total",
+    "Number of requests to the model upstream that had to wait for a free \
+connection because the connection pool was exhausted",
+    ("upstream",),
+)
+UPSTREAM_DEDUPLICATED = Counter(
+    "meowlflow_upstream_deduplicated_total",
+    "Number of requests to the model upstream that shared the response of an \
+identical request in flight instead of being sent",
+)
+UPSTREAM_BREAKER_OPEN = Gauge(
+    "meowlflow_upstream_breaker_open",
+    "Whether the circuit breaker of an upstream is open, i.e. requests are not \
+sent to it",
+    ("upstream",),
+    multiprocess_mode="livemax",
+)
+UPSTREAM_BREAKER_TRIPS = Counter(
+    "meowlflow_upstream_breaker_trips_total",
+    "Number of times the circuit breaker of an upstream opened",
+    ("upstream",),
+)
+UPSTREAM_FAILOVERS = Counter(
+    "meowlflow_upstream_failovers_total",
+    "Number of requests sent to another upstream after a request failed",
+)
+UPSTREAM_HEDGES = Counter(
+    "meowlflow_upstream_hedges_total",
+    "Number of duplicate requests sent to another upstream because a request was \
+slower than the hedging percentile",
+)
+UPSTREAM_HEDGE_WINS = Counter(
+    "meowlflow_upstream_hedge_wins_total",
+    "Number of hedged requests whose duplicate answered first",
+)
+
+# number of characters of the body of a 4xx response of an upstream forwarded to
+# the client
+_MAX_REJECTION_BODY = 1000
+
+# number of recent latencies from which the hedging delay is computed, and the
+# number needed before requests are hedged
+_LATENCY_WINDOW = 200
+_MIN_LATENCIES = 20
+
+logger = logging.getLogger(__name__)
+
+
+def options(function: Callable[..., RT]) -> Callable[..., RT]:
+    function = click.option(
+        "--upstream-hedge-percentile",
+        default=0.0,
+        type=click.FloatRange(0, 100),
+        show_default=True,
+        help="percentile of the recent latencies of the upstreams, eg: 95, after \
+which a request still in flight is also sent to another upstream and the first \
+answer is used; 0 disables hedging",
+    )(function)
+    function = click.option(
+        "--upstream-breaker-cooldown",
+        default=10.0,
+        type=float,
+        show_default=True,
+        help="seconds during which no requests are sent to an upstream after its \
+circuit breaker opens, before a single request tries it again",
+    )(function)
+    function = click.option(
+        "--upstream-breaker-failures",
+        default=5,
+        type=int,
+        show_default=True,
+        help="number of consecutive failed requests to an upstream after which \
+its circuit breaker opens, 0 disables the circuit breaker",
+    )(function)
+    function = click.option(
+        "--upstream-dedupe/--no-upstream-dedupe",
+        default=True,
+        show_default=True,
+        help="whether requests to the upstream with the same body as a request in \
+flight share its response instead of being sent, which assumes the model is \
+deterministic",
+    )(function)
+    function = click.option(
+        "--upstream-read-timeout",
+        default=60.0,
+        type=float,
+        show_default=True,
+        help="seconds to wait for data from the upstream, 0 disables the timeout",
+    )(function)
+    function = click.option(
+        "--upstream-connect-timeout",
+        default=5.0,
+        type=float,
+        show_default=True,
+        help="seconds to wait for a connection to the upstream, including the time \
+spent waiting for a free connection in the pool",
+    )(function)
+    function = click.option(
+        "--upstream-keepalive-timeout",
+        default=15.0,
+        type=float,
+        show_default=True,
+        help="seconds to keep idle connections to the upstream open",
+    )(function)
+    function = click.option(
+        "--upstream-max-connections",
+        default=100,
+        type=int,
+        show_default=True,
+        help="maximum number of concurrent connections to each upstream",
+    )(function)
+    return function
+
+
+def parse_kwargs(**kwargs: Any) -> Dict[str, Any]:
+    upstream_kwargs = {}
+    for k, v in kwargs.items():
+        if k.startswith("upstream_"):
+            key = k[len("upstream_") :]
+            upstream_kwargs[key] = v
+    return upstream_kwargs
+
+
+class Upstream:
+    """A persistent, pooled HTTP client for a model upstream.
+
+    The underlying session must be created on the event loop that uses it, so
+    `startup` and `shutdown` should be registered as application event handlers.
+
+    Requests that cannot reach the upstream, time out or get a 5xx response
+    raise `UpstreamError` and count as failures of the upstream. After
+    `breaker_failures` consecutive failures, its circuit breaker opens and
+    `available` is False for `breaker_cooldown` seconds; then a single request
+    is let through, which closes the breaker if it succeeds and opens it again
+    otherwise. That trial request is reserved with `reserve` before it is sent.
+
+    Requests that get a 4xx response raise `UpstreamRejected`, with the status
+    of the response, and do not count as failures: the upstream is healthy, it
+    rejected the request.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 100,
+        keepalive_timeout: float = 15.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        breaker_failures: int = 5,
+        breaker_cooldown: float = 10.0,
+    ) -> None:
+        self.url = url
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._in_flight = 0
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # the token of the trial request, while one is reserved
+        self._trial: Optional[object] = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def available(self) -> bool:
+        """whether requests may be sent, i.e. the circuit breaker is not open"""
+        if self._opened_at is None:
+            return True
+        return (
+            self._trial is None
+            and time.monotonic() - self._opened_at >= self.breaker_cooldown
+        )
+
+    async def startup(self) -> None:
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        timeout = aiohttp.ClientTimeout(
+            connect=self.connect_timeout or None,
+            sock_read=self.read_timeout or None,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def shutdown(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def reserve(self) -> Optional[object]:
+        """reserve the trial request of the upstream if its breaker is open
+
+        Returns
+        -------
+        the token of the trial, to be passed to `post` and `release`, or None if
+        the breaker is closed
+        """
+        if self._opened_at is None:
+            return None
+        self._trial = object()
+        return self._trial
+
+    def release(self, trial: Optional[object]) -> None:
+        """release the trial request reserved with `reserve`, if it still is"""
+        if trial is not None and self._trial is trial:
+            self._trial = None
+
+    async def post(
+        self, data: Any, headers: Mapping[str, str], trial: Optional[object] = None
+    ) -> bytes:
+        """send a request to the upstream and return the body of its response
+
+        `trial` is the token of the trial request if it was reserved already, see
+        `reserve`.
+        """
+        if self._session is None:
+            raise RuntimeError("Upstream session is not started")
+
+        if self._in_flight >= self.max_connections:
+            UPSTREAM_POOL_SATURATED.labels(self.url).inc()
+        # a request sent while the breaker is open is the trial of the upstream
+        if trial is None:
+            trial = self.reserve()
+        self._in_flight += 1
+        UPSTREAM_IN_FLIGHT.labels(self.url).inc()
+        start_time = time.perf_counter()
+        status_code = "error"
+        success: Optional[bool] = None
+        body: bytes
+        try:
+            async with self._session.post(
+                self.url,
+                data=data,
+                headers=headers,
+            ) as response:
+                status_code = str(response.status)
+                if 400 <= response.status < 500:
+                    success = True
+                    text = (await response.read()).decode(errors="replace")
+                    raise UpstreamRejected(
+                        f"Upstream {self.url} rejected the request with "
+                        f"{response.status}",
+                        {
+                            "upstream": self.url,
+                            "status_code": response.status,
+                            "response": text[:_MAX_REJECTION_BODY],
+                        },
+                        status_code=response.status,
+                    )
+                if response.status >= 500:
+                    raise UpstreamError(
+                        f"Upstream {self.url} responded with {response.status}",
+                        {"upstream": self.url, "status_code": response.status},
+                    )
+                body = await response.read()
+            success = True
+            return body
+        except UpstreamError:
+            success = False
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            success = False
+            raise UpstreamError(
+                f"Failed to reach upstream {self.url}",
+                {"upstream": self.url, "error": repr(e)},
+            ) from e
+        finally:
+            self._in_flight -= 1
+            UPSTREAM_IN_FLIGHT.labels(self.url).dec()
+            UPSTREAM_LATENCY.labels(self.url, status_code).observe(
+                time.perf_counter() - start_time
+            )
+            self.release(trial)
+            # cancelled requests, eg: the slower of hedged requests, say nothing
+            # about the health of the upstream
+            if success is not None:
+                self._record(success)
+
+    def _record(self, success: bool) -> None:
+        if success:
+            if self._opened_at is not None:
+                logger.info(f"Closing the circuit breaker of upstream {self.url}")
+                UPSTREAM_BREAKER_OPEN.labels(self.url).set(0)
+            self._failures = 0
+            self._opened_at = None
+            return
+
+        self._failures += 1
+        if self._opened_at is not None:
+            # the trial request failed, wait for another cooldown
+            self._opened_at = time.monotonic()
+        elif self.breaker_failures and self._failures >= self.breaker_failures:
+            logger.warning(
+                f"Opening the circuit breaker of upstream {self.url} after "
+                f"{self._failures} consecutive failures"
+            )
+            self._opened_at = time.monotonic()
+            UPSTREAM_BREAKER_OPEN.labels(self.url).set(1)
+            UPSTREAM_BREAKER_TRIPS.labels(self.url).inc()
+
+
+class UpstreamPool:
+    """Balance requests over one or more replicas of a model upstream.
+
+    Each request is sent to the available upstream, see `Upstream.available`,
+    with the fewest requests in flight. If it fails, it is sent to another
+    upstream that has not been tried yet, until one answers or none is left. A
+    request rejected by an upstream, see `UpstreamRejected`, is not retried.
+
+    If `hedge_percentile` is set, a request still in flight after that
+    percentile of the recent latencies of the upstreams is also sent to
+    another upstream, and the first answer is used; the other request is
+    cancelled.
+
+    If `dedupe` is set, a request whose encoded body and headers are identical to
+    those of a request in flight is not sent, and waits for the response of the
+    request in flight instead.
+
+    Parameters
+    ----------
+    urls : list of str
+    dedupe : bool, default: True
+    hedge_percentile : float, default: 0.0
+        percentile between 0 and 100, 0 disables hedging
+    **kwargs
+        keyword arguments of each `Upstream`
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        dedupe: bool = True,
+        hedge_percentile: float = 0.0,
+        **kwargs: Any,
+    ) -> None:
+        if not urls:
+            raise ValueError("Expected at least one upstream")
+        self.upstreams = [Upstream(url, **kwargs) for url in urls]
+        self.dedupe = dedupe
+        self.hedge_percentile = hedge_percentile
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._shared: Dict[Tuple[Any, ...], "asyncio.Task[bytes]"] = {}
+        # rotates the upstreams with the fewest requests in flight
+        self._turn = itertools.count()
+
+    @property
+    def urls(self) -> List[str]:
+        return [upstream.url for upstream in self.upstreams]
+
+    async def startup(self) -> None:
+        for upstream in self.upstreams:
+            await upstream.startup()
+
+    async def shutdown(self) -> None:
+        for upstream in self.upstreams:
+            await upstream.shutdown()
+
+    async def post(self, data: Any, headers: Mapping[str, str]) -> bytes:
+        """send a request to an upstream and return the body of its response"""
+        if not self.dedupe or not isinstance(data, (str, bytes)):
+            return await self._send(data, headers)
+
+        key = (data, *sorted(headers.items()))
+        task = self._shared.get(key)
+        if task is None:
+            task = asyncio.create_task(self._send(data, headers))
+            self._shared[key] = task
+            task.add_done_callback(lambda _: self._shared.pop(key, None))
+        else:
+            UPSTREAM_DEDUPLICATED.inc()
+        # the request keeps running for the other callers if this one is cancelled
+        return await asyncio.shield(task)
+
+    def _choose(
+        self, tried: Set[Upstream]
+    ) -> Optional[Tuple[Upstream, Optional[object]]]:
+        """the available upstream not yet tried with the fewest requests in flight
+
+        The trial request of the upstream is reserved before it is returned, so
+        that no other request chooses it while its breaker is half-open.
+
+        Returns
+        -------
+        the upstream and the token of its trial request, see `Upstream.reserve`,
+        or None if no upstream is available
+        """
+        candidates = [u for u in self.upstreams if u not in tried and u.available]
+        if not candidates:
+            return None
+        turn = next(self._turn) % len(candidates)
+        candidates = candidates[turn:] + candidates[:turn]
+        upstream = min(candidates, key=lambda upstream: upstream.in_flight)
+        return upstream, upstream.reserve()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile or len(self.upstreams) < 2:
+            return None
+        if len(self._latencies) < _MIN_LATENCIES:
+            return None
+        latencies = sorted(self._latencies)
+        index = int(len(latencies) * self.hedge_percentile / 100)
+        return latencies[min(index, len(latencies) - 1)]
+
+    async def _send(self, data: Any, headers: Mapping[str, str]) -> bytes:
+        tried: Set[Upstream] = set()
+        tasks: Set["asyncio.Task[bytes]"] = set()
+        hedge: Optional["asyncio.Task[bytes]"] = None
+        hedge_delay = self._hedge_delay()
+        error: Optional[BaseException] = None
+        sent_at: Dict["asyncio.Task[bytes]", float] = {}
+
+        def send(upstream: Upstream, trial: Optional[object]) -> "asyncio.Task[bytes]":
+            tried.add(upstream)
+            task = asyncio.create_task(upstream.post(data, headers, trial))
+            # a task cancelled before it started never releases its trial
+            task.add_done_callback(lambda _: upstream.release(trial))
+            tasks.add(task)
+            sent_at[task] = time.perf_counter()
+            return task
+
+        try:
+            while True:
+                if not tasks:
+                    chosen = self._choose(tried)
+                    if chosen is None:
+                        if error is not None:
+                            raise error
+                        raise UpstreamUnavailable(
+                            "Every upstream is unavailable", {"upstreams": self.urls}
+                        )
+                    if tried:
+                        UPSTREAM_FAILOVERS.inc()
+                    send(*chosen)
+
+                hedging = hedge is None and hedge_delay is not None
+                done, tasks = await asyncio.wait(
+                    tasks,
+                    timeout=hedge_delay if hedging else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # the request is slower than the hedging percentile
+                    chosen = self._choose(tried)
+                    hedge_delay = None
+                    if chosen is not None:
+                        UPSTREAM_HEDGES.inc()
+                        hedge = send(*chosen)
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            UPSTREAM_HEDGE_WINS.inc()
+                        self._latencies.append(time.perf_counter() - sent_at[task])
+                        return task.result()
+                    error = task.exception()
+                    # another upstream would reject the request as well
+                    if isinstance(error, UpstreamRejected):
+                        raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,29 @@
+from typing import Any, Dict
+
+from fastapi import FastAPI
+from gunicorn.app.base import BaseApplication
+from prometheus_client import multiprocess
+
+
+class Application(BaseApplication):  # type: ignore[misc]
+    """A gunicorn application serving an already-built ASGI app with uvicorn workers.
+
+    Since the app is built before gunicorn forks its workers, memory allocated
+    while building it, e.g. for a model, is shared copy-on-write between workers.
+    """
+
+    def __init__(self, app: FastAPI, config: Dict[str, Any]) -> None:
+        self.app = app
+        self.config = config
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.config.items():
+            self.cfg.set(key, value)
+
+    def load(self) -> FastAPI:
+        return self.app
+
+
+def child_exit(server: Any, worker: Any) -> None:
+    multiprocess.mark_process_dead(worker.pid)  # type: ignore[no-untyped-call]
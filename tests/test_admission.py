@@ -0,0 +1,139 @@
+import asyncio
+
+import httpx
+import pytest
+
+from meowlflow.api.middlewares.admission import AdmissionMiddleware
+from meowlflow.api.middlewares.errors import CatchExceptionsMiddleware
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+class App:
+    """an ASGI app whose requests are answered once they are released"""
+
+    def __init__(self):
+        self.started = []
+        self.release = None
+
+    async def __call__(self, scope, receive, send):
+        self.started.append(scope["path"])
+        await self.release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def client(app, **kwargs):
+    app.release = asyncio.Event()
+    middleware = CatchExceptionsMiddleware(AdmissionMiddleware(app, **kwargs))
+    transport = httpx.ASGITransport(app=middleware)
+    return httpx.AsyncClient(transport=transport, base_url="http://t")
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_sheds_requests_beyond_the_queue():
+    app = App()
+
+    async def test():
+        async with await client(app, max_in_flight=1, max_queue=1) as c:
+            requests = [
+                asyncio.create_task(c.post(f"/api/{i}", content=b"")) for i in range(3)
+            ]
+            await settle()
+            # the first request is handled and the second one waits
+            started = list(app.started)
+            shed = await requests[2]
+            app.release.set()
+            return started, shed, await asyncio.gather(*requests[:2])
+
+    started, shed, handled = run(test)
+
+    assert started == ["/api/0"]
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert shed.json()["error"]["code"] == "overloaded"
+    assert [r.status_code for r in handled] == [200, 200]
+
+
+def test_sheds_requests_immediately_without_a_queue():
+    app = App()
+
+    async def test():
+        async with await client(app, max_in_flight=1) as c:
+            first = asyncio.create_task(c.post("/api/0", content=b""))
+            await settle()
+            second = await c.post("/api/1", content=b"")
+            app.release.set()
+            return await first, second
+
+    first, second = run(test)
+
+    assert first.status_code == 200
+    assert second.status_code == 503
+
+
+def test_queued_requests_time_out():
+    app = App()
+
+    async def test():
+        async with await client(
+            app, max_in_flight=1, max_queue=1, queue_timeout_ms=10.0, retry_after=5
+        ) as c:
+            first = asyncio.create_task(c.post("/api/0", content=b""))
+            await settle()
+            second = await c.post("/api/1", content=b"")
+            app.release.set()
+            return await first, second
+
+    first, second = run(test)
+
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == "5"
+
+
+def test_queue_is_served_in_order():
+    app = App()
+
+    async def test():
+        async with await client(app, max_in_flight=1, max_queue=10) as c:
+            requests = []
+            for i in range(4):
+                requests.append(asyncio.create_task(c.post(f"/api/{i}", content=b"")))
+                await settle()
+            app.release.set()
+            return await asyncio.gather(*requests)
+
+    responses = run(test)
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert app.started == [f"/api/{i}" for i in range(4)]
+
+
+@pytest.mark.parametrize(
+    "method, path", [("GET", "/api/v1/infer/jobs/1"), ("POST", "/metrics")]
+)
+def test_exempt_requests(method, path):
+    app = App()
+
+    async def test():
+        async with await client(app, max_in_flight=1) as c:
+            first = asyncio.create_task(c.post("/api/0", content=b""))
+            await settle()
+            # the slot is taken, but the request is not subject to admission
+            exempt = asyncio.create_task(c.request(method, path))
+            await settle()
+            started = list(app.started)
+            app.release.set()
+            return started, await first, await exempt
+
+    started, first, exempt = run(test)
+
+    assert started == ["/api/0", path]
+    assert exempt.status_code == 200
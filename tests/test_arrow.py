@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from fastapi import APIRouter
+import httpx
+import pandas
+import pytest
+
+from meowlflow import arrow, sidecar
+from meowlflow.app import build_app
+from meowlflow.exception import InvalidParams
+
+pyarrow = pytest.importorskip("pyarrow")
+
+SCHEMA = Path(__file__).parent.parent / "e2e" / "mlflow_example_schema.py"
+
+COLUMNS = [
+    "alcohol",
+    "chlorides",
+    "citric_acid",
+    "density",
+    "fixed_acidity",
+    "free_sulfur_dioxide",
+    "pH",
+    "residual_sugar",
+    "sulphates",
+    "total_sulfur_dioxide",
+    "volatile_acidity",
+]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+def stream(table):
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return bytes(sink.getvalue())
+
+
+def records(n):
+    # the columns as integers, which are converted to the fields' floats
+    return pyarrow.table({c: list(range(n)) for c in COLUMNS})
+
+
+async def infer(frame):
+    return frame.sum(axis=1).to_numpy()
+
+
+def post(body, content_type, accept="application/json"):
+    app = build_app({})
+    router = APIRouter()
+    schema = sidecar.register_infer_endpoint(
+        logging.getLogger(__name__), app, router, "/infer", infer, SCHEMA
+    )
+    app.include_router(router)
+
+    async def test():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.post(
+                "/infer",
+                content=body,
+                headers={"Content-Type": content_type, "Accept": accept},
+            )
+
+    return schema, run(test)
+
+
+def test_validate_converts_and_orders_columns():
+    schema, _ = post(b"[]", "application/json")
+    table = (
+        records(2)
+        .select(list(reversed(COLUMNS)))
+        .append_column("unknown", pyarrow.array([0, 0]))
+    )
+
+    validated = arrow.validate(table, schema.Request)
+
+    assert validated.column_names == COLUMNS
+    assert all(t == pyarrow.float64() for t in validated.schema.types)
+    frame = schema.Request.transform_frame(arrow.to_frame(validated))
+    assert "citric acid" in frame.columns
+
+
+def test_validate_rejects_missing_columns():
+    schema, _ = post(b"[]", "application/json")
+
+    with pytest.raises(InvalidParams) as e:
+        arrow.validate(records(1).drop(["pH"]), schema.Request)
+
+    assert e.value.payload == {"missing": ["pH"]}
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        ({"predictions": [1.0, 2.0]}, {"predictions": [1.0, 2.0]}),
+        ({"label": "a", "score": 0.5}, {"label": ["a"], "score": [0.5]}),
+        ([{"a": 1}, {"a": 2}], {"a": [1, 2]}),
+        (pandas.DataFrame({"a": [1, 2]}), {"a": [1, 2]}),
+        ([1.0, 2.0], {"predictions": [1.0, 2.0]}),
+    ],
+)
+def test_encode(data, expected):
+    assert arrow.decode(arrow.encode(data)).to_pydict() == expected
+
+
+def test_negotiates_response_content_type():
+    body = stream(records(3))
+    expected = [s * 11.0 for s in range(3)]
+
+    _, json_response = post(body, arrow.MEDIA_TYPE)
+    _, arrow_response = post(body, arrow.MEDIA_TYPE, accept=arrow.MEDIA_TYPE)
+
+    assert json_response.status_code == 200
+    assert json_response.headers["content-type"] == "application/json"
+    assert json_response.json() == {"predictions": expected}
+    # the Arrow response carries the output of Response.transform too
+    assert arrow_response.status_code == 200
+    assert arrow_response.headers["content-type"] == arrow.MEDIA_TYPE
+    table = arrow.decode(arrow_response.content)
+    assert table.to_pydict() == {"predictions": expected}
+
+
+def test_invalid_body():
+    _, response = post(b"not arrow", arrow.MEDIA_TYPE)
+
+    assert response.status_code == 400
@@ -0,0 +1,155 @@
+import hashlib
+import os
+
+from mlflow.utils.file_utils import path_to_local_file_uri
+import pytest
+
+from benchmarks import model as dummy
+from meowlflow import artifacts, reload
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """create artifacts of a "remote" store of 10 bytes each"""
+
+    def make(name):
+        path = tmp_path / "remote" / name
+        path.mkdir(parents=True)
+        (path / "model.bin").write_bytes(b"0123456789")
+        (path / "conda.yaml").write_text("")
+        return path_to_local_file_uri(str(path))
+
+    return make
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    fetched = []
+    fetch = artifacts.ArtifactCache._fetch
+
+    def record(self, uri, key, entry):
+        fetched.append(uri)
+        fetch(self, uri, key, entry)
+
+    monkeypatch.setattr(artifacts.ArtifactCache, "_fetch", record)
+    return fetched
+
+
+def test_hit_across_instances(tmp_path, remote, fetches):
+    uri = remote("a")
+
+    path = artifacts.ArtifactCache(str(tmp_path / "cache")).download(uri)
+    cached = artifacts.ArtifactCache(str(tmp_path / "cache")).download(uri)
+
+    assert cached == path
+    assert open(os.path.join(path, "model.bin"), "rb").read() == b"0123456789"
+    assert fetches == [uri]
+
+
+def corrupt(path, keep_mtime=False):
+    """corrupt a file, keeping its size"""
+    stat = os.stat(path)
+    with open(path, "wb") as f:
+        f.write(b"9876543210")
+    if keep_mtime:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+@pytest.mark.parametrize("verify", [True, False])
+def test_corrupted_file(tmp_path, remote, fetches, verify):
+    uri = remote("a")
+    path = artifacts.ArtifactCache(str(tmp_path / "cache")).download(uri)
+    corrupt(os.path.join(path, "model.bin"), keep_mtime=True)
+
+    cache = artifacts.ArtifactCache(str(tmp_path / "cache"), verify=verify)
+    path = cache.download(uri)
+
+    content = open(os.path.join(path, "model.bin"), "rb").read()
+    if verify:
+        assert fetches == [uri, uri]
+        assert content == b"0123456789"
+    else:
+        # only the sizes and modification times are checked
+        assert fetches == [uri]
+        assert content == b"9876543210"
+
+
+def test_modified_file(tmp_path, remote, fetches):
+    uri = remote("a")
+    path = artifacts.ArtifactCache(str(tmp_path / "cache")).download(uri)
+    corrupt(os.path.join(path, "model.bin"))
+
+    path = artifacts.ArtifactCache(str(tmp_path / "cache")).download(uri)
+
+    assert fetches == [uri, uri]
+    assert open(os.path.join(path, "model.bin"), "rb").read() == b"0123456789"
+
+
+def test_artifact_in_use_is_not_waited_for_forever(tmp_path, remote, fetches):
+    uri = remote("a")
+    user = artifacts.ArtifactCache(str(tmp_path / "cache"))
+    path = user.download(uri)
+    corrupt(os.path.join(path, "model.bin"))
+
+    cache = artifacts.ArtifactCache(str(tmp_path / "cache"), lock_timeout=0.1)
+    with pytest.raises(TimeoutError):
+        cache.download(uri)
+
+    # once released, the artifact is downloaded again
+    user.release(user.key(path))
+    cache.download(uri)
+    assert fetches == [uri, uri]
+
+
+def test_eviction_skips_artifacts_in_use(tmp_path, remote, fetches):
+    a, b, c, d = remote("a"), remote("b"), remote("c"), remote("d")
+    user = artifacts.ArtifactCache(str(tmp_path / "cache"))
+    cache = artifacts.ArtifactCache(str(tmp_path / "cache"), max_bytes=15)
+    # a is the least recently used artifact, but is used by another instance
+    path_a = user.download(a)
+    path_b = cache.download(b)
+    cache.release(cache.key(path_b))
+
+    cache.download(c)
+
+    assert os.path.exists(path_a)
+    assert not os.path.exists(path_b)
+
+    # once released, a can be evicted
+    key = user.key(path_to_local_file_uri(path_a))
+    assert key is not None
+    user.release(key)
+    cache.download(d)
+
+    assert not os.path.exists(path_a)
+    assert fetches == [a, b, c, d]
+
+
+def test_eviction_makes_room_for_the_incoming_artifact(tmp_path, remote, monkeypatch):
+    a, b = remote("a"), remote("b")
+    cache = artifacts.ArtifactCache(str(tmp_path / "cache"), max_bytes=15)
+    path_a = cache.download(a)
+    cache.release(cache.key(path_a))
+    cached = []
+    sha256 = artifacts._sha256
+
+    def record(path):
+        # whether a is still cached while the files of b are downloaded
+        cached.append(os.path.exists(path_a))
+        return sha256(path)
+
+    monkeypatch.setattr(artifacts, "_sha256", record)
+    cache.download(b)
+
+    assert cached and not any(cached)
+
+
+def test_local_model_is_keyed_on_its_uuid(tmp_path):
+    dummy.save(str(tmp_path / "model"))
+    uri = path_to_local_file_uri(str(tmp_path / "model"))
+    cache = artifacts.ArtifactCache(str(tmp_path / "cache"))
+
+    path = cache.download(uri)
+
+    assert os.path.isfile(os.path.join(path, "MLmodel"))
+    assert cache.key(path) == hashlib.sha256(reload.resolve(uri).encode()).hexdigest()
@@ -0,0 +1,150 @@
+from typing import Any, List, Optional
+
+import pandas
+from pydantic import BaseModel, Field, ValidationError
+import pytest
+
+from meowlflow.api.base import BaseRequest, ColumnarRequest
+
+
+class Record(BaseModel):
+    size: float
+    count: int
+    name: str = Field(..., alias="label")
+    flag: Optional[bool] = None
+    tags: List[str] = []
+
+
+class Request(ColumnarRequest):
+    __root__: List[Record]
+    columns = {"size": "the size"}
+    # validate every request column by column
+    min_rows = 1
+
+
+class RecordRequest(BaseRequest):
+    __root__: List[Record]
+
+    def transform(self) -> Any:
+        return self
+
+
+def records(n=3):
+    return [
+        {"size": i, "count": i, "label": f"r{i}", "tags": ["a"] * i} for i in range(n)
+    ]
+
+
+def test_transform_renames_and_types_columns():
+    request = Request.parse_obj(records())
+
+    frame = request.transform()
+
+    assert request._frame is not None
+    assert list(frame.columns) == ["the size", "count", "name", "flag", "tags"]
+    assert frame["the size"].dtype == "float64"
+    assert frame["count"].dtype == "int64"
+    assert frame["name"].tolist() == ["r0", "r1", "r2"]
+    assert frame["flag"].isna().all()
+    assert frame["tags"].tolist() == [[], ["a"], ["a", "a"]]
+
+
+def test_small_requests_are_validated_by_record():
+    class SmallRequest(Request):
+        min_rows = 4
+
+    request = SmallRequest.parse_obj(records())
+
+    assert request._frame is None
+    # the records are transformed into the same frame
+    pandas.testing.assert_frame_equal(
+        request.transform(), Request.parse_obj(records()).transform()
+    )
+
+
+def test_invalid_column_falls_back_to_records():
+    value = records()
+    # a value that is not an int, but that pydantic converts to one
+    value[1]["count"] = "1"
+
+    request = Request.parse_obj(value)
+
+    assert request._frame is None
+    assert request.transform()["count"].tolist() == [0, 1, 2]
+
+
+@pytest.mark.parametrize(
+    "update",
+    [
+        {"count": "one"},
+        {"size": None},
+        {"label": 1.5, "tags": "a"},
+        {"flag": "maybe"},
+    ],
+)
+def test_errors_match_base_request(update):
+    value = records()
+    value[2].update(update)
+
+    with pytest.raises(ValidationError) as columnar:
+        Request.parse_obj(value)
+    with pytest.raises(ValidationError) as expected:
+        RecordRequest.parse_obj(value)
+
+    assert columnar.value.errors() == expected.value.errors()
+
+
+def test_parse_frame():
+    frame = pandas.DataFrame.from_records(records(5)).iloc[2:]
+
+    request = Request.parse_frame(frame)
+
+    assert request._frame is not None
+    transformed = request.transform()
+    assert transformed["count"].tolist() == [2, 3, 4]
+    assert list(transformed.index) == [0, 1, 2]
+
+    # frames missing a column are validated record by record
+    with pytest.raises(ValidationError) as missing:
+        Request.parse_frame(frame.drop(columns=["label"]))
+    assert missing.value.errors()[0]["loc"] == ("__root__", 0, "label")
+
+
+def test_integers_beyond_int64_fall_back_to_records():
+    value = records()
+    value[1]["count"] = 2**70
+
+    request = Request.parse_obj(value)
+
+    assert request._frame is None
+    assert request.transform()["count"].tolist() == [0, 2**70, 2]
+
+
+class StrictRecord(BaseModel):
+    size: float
+    name: str = Field(..., alias="label")
+
+    class Config:
+        extra = "forbid"
+
+
+class StrictRequest(ColumnarRequest):
+    __root__: List[StrictRecord]
+    min_rows = 1
+
+
+def test_unknown_keys():
+    value = [{"size": i, "label": f"r{i}"} for i in range(3)]
+    assert StrictRequest.parse_obj(value)._frame is not None
+
+    value[1]["count"] = 1
+    with pytest.raises(ValidationError) as columnar:
+        StrictRequest.parse_obj(value)
+    assert columnar.value.errors()[0]["loc"] == ("__root__", 1, "count")
+    with pytest.raises(ValidationError):
+        StrictRequest.parse_frame(pandas.DataFrame.from_records(value))
+
+    # records whose model ignores unknown keys drop them either way
+    value = records()
+    value[1]["unknown"] = 1
+    assert Request.parse_obj(value)._frame is not None
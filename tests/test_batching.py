@@ -0,0 +1,106 @@
+import asyncio
+
+import numpy
+import pandas
+import pytest
+
+from meowlflow import batching
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+class Model:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, inputs):
+        self.calls.append(inputs)
+        if self.fail:
+            raise ValueError("broken")
+        return inputs * 2 if isinstance(inputs, numpy.ndarray) else inputs
+
+
+def test_merges_and_splits_concurrent_inputs():
+    model = Model()
+
+    async def test():
+        batcher = batching.Batcher(model, max_batch_size=4, max_wait=0.05)
+        return await asyncio.gather(
+            batcher(numpy.array([1])),
+            batcher(numpy.array([2, 3])),
+            batcher(numpy.array([4])),
+        )
+
+    outputs = run(test)
+
+    # the three inputs fill a batch, which is run once
+    assert len(model.calls) == 1
+    assert model.calls[0].tolist() == [1, 2, 3, 4]
+    assert [o.tolist() for o in outputs] == [[2], [4, 6], [8]]
+
+
+def test_dispatches_full_batches_and_waits_for_the_rest():
+    model = Model()
+
+    async def test():
+        batcher = batching.Batcher(model, max_batch_size=3, max_wait=0.05)
+        return await asyncio.gather(*(batcher([i, i]) for i in range(3)))
+
+    outputs = run(test)
+
+    # the second input does not fit in the batch of the first one, and the last
+    # one is dispatched once it has waited for max_wait
+    assert model.calls == [[0, 0], [1, 1], [2, 2]]
+    assert outputs == [[0, 0], [1, 1], [2, 2]]
+
+
+def test_frames_are_concatenated_by_row():
+    model = Model()
+
+    async def test():
+        batcher = batching.Batcher(model, max_batch_size=10, max_wait=0.01)
+        return await asyncio.gather(
+            batcher(pandas.DataFrame({"a": [1, 2]})),
+            batcher(pandas.DataFrame({"a": [3]})),
+        )
+
+    first, second = run(test)
+
+    assert model.calls[0]["a"].tolist() == [1, 2, 3]
+    assert first["a"].tolist() == [1, 2]
+    assert second["a"].tolist() == [3]
+
+
+@pytest.mark.parametrize("inputs", [list(range(5)), {"a": 1}, "text"])
+def test_passes_through_oversized_and_uncountable_inputs(inputs):
+    model = Model()
+
+    async def test():
+        batcher = batching.Batcher(model, max_batch_size=4, max_wait=10.0)
+        return await batcher(inputs)
+
+    assert run(test) == inputs
+    assert model.calls == [inputs]
+
+
+def test_errors_reach_every_caller():
+    model = Model(fail=True)
+
+    async def test():
+        batcher = batching.Batcher(model, max_batch_size=4, max_wait=0.01)
+        return await asyncio.gather(batcher([1]), batcher([2]), return_exceptions=True)
+
+    errors = run(test)
+
+    assert len(model.calls) == 1
+    assert [str(e) for e in errors] == ["broken", "broken"]
+
+
+def test_wrap_disables_batching():
+    model = Model()
+
+    assert batching.wrap(model, 0, 5.0) is model
+    assert isinstance(batching.wrap(model, 8, 5.0), batching.Batcher)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from pathlib import Path
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter
+import httpx
+import pydantic.dataclasses
+
+from meowlflow import cache, sidecar
+from meowlflow.api.base import ColumnarRequest
+from meowlflow.app import build_app
+
+SCHEMA = Path(__file__).parent.parent / "e2e" / "mlflow_example_schema.py"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+@pydantic.dataclasses.dataclass
+class Record:
+    x: float
+    n: int
+    label: str
+    note: Optional[str] = None
+
+
+class Request(ColumnarRequest):
+    __root__: List[Record]
+    columns = {"x": "X"}
+    min_rows = 2
+
+
+def test_hits_and_byte_budget():
+    response_cache = cache.ResponseCache(10)
+    a, b = response_cache.key(b"a"), response_cache.key(b"b")
+
+    assert response_cache.get(a) is None
+    response_cache.put(a, b"123456")
+    assert response_cache.get(a) == b"123456"
+    # both responses do not fit, so the least recently used one is evicted
+    response_cache.put(b, b"7890ab")
+    assert response_cache.get(a) is None
+    assert response_cache.get(b) == b"7890ab"
+    # responses larger than the cache are not cached
+    response_cache.put(a, b"0" * 11)
+    assert response_cache.get(a) is None
+    assert response_cache.size == 6
+
+
+def test_ttl(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    response_cache = cache.ResponseCache(10, ttl=5.0)
+    key = response_cache.key(b"a")
+    response_cache.put(key, b"1")
+
+    now += 4.0
+    assert response_cache.get(key) == b"1"
+    now += 2.0
+    assert response_cache.get(key) is None
+    assert response_cache.size == 0
+
+
+def test_version_swap():
+    response_cache = cache.ResponseCache(10, version="1")
+    key = response_cache.key(b"a")
+    response_cache.put(key, b"1")
+
+    response_cache.set_version("2")
+
+    assert response_cache.size == 0
+    # the same request has another key for the new version
+    assert response_cache.key(b"a") != key
+
+
+def records(n, **values):
+    return [{"x": 7.0, "n": i, "label": "a", **values} for i in range(n)]
+
+
+def test_canonical_is_built_from_validated_data():
+    canonical = Request.parse_obj(records(3)).canonical()
+
+    # neither values that validate alike nor the order of keys matter
+    assert Request.parse_obj(records(3, x=7)).canonical() == canonical
+    assert (
+        Request.parse_obj([dict(reversed(r.items())) for r in records(3)]).canonical()
+        == canonical
+    )
+    assert Request.parse_obj(records(3, x=7.5)).canonical() != canonical
+    assert Request.parse_obj(records(3, label="b")).canonical() != canonical
+
+
+def test_small_and_large_requests_share_keys(monkeypatch):
+    assert Request.validate(records(3))._frame is not None
+    canonical = Request.parse_obj(records(3)).canonical()
+    monkeypatch.setattr(Request, "min_rows", 10)
+
+    assert Request.validate(records(3))._frame is None
+    assert Request.parse_obj(records(3)).canonical() == canonical
+
+
+async def infer(frame):
+    infer.calls += 1
+    return frame.sum(axis=1, numeric_only=True).to_numpy()
+
+
+def test_endpoint_answers_repeated_requests_from_the_cache():
+    app = build_app({})
+    router = APIRouter()
+    sidecar.register_infer_endpoint(
+        logging.getLogger(__name__),
+        app,
+        router,
+        "/infer",
+        infer,
+        SCHEMA,
+        response_cache=cache.ResponseCache(1 << 20),
+    )
+    app.include_router(router)
+    record = {
+        "alcohol": 1,
+        "chlorides": 1,
+        "citric_acid": 1,
+        "density": 1,
+        "fixed_acidity": 1,
+        "free_sulfur_dioxide": 1,
+        "pH": 1,
+        "residual_sugar": 1,
+        "sulphates": 1,
+        "total_sulfur_dioxide": 1,
+        "volatile_acidity": 1,
+    }
+    infer.calls = 0
+
+    async def test():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            first = await c.post("/infer", json=[record])
+            second = await c.post(
+                "/infer", json=[{k: float(v) for k, v in record.items()}]
+            )
+            return first, second
+
+    first, second = run(test)
+
+    assert first.json() == second.json() == {"predictions": [11.0]}
+    assert infer.calls == 1
+
+
+def test_row_cache_skips_unsplittable_outputs():
+    calls = []
+
+    async def total(rows):
+        calls.append(rows)
+        return sum(rows)
+
+    async def test():
+        infer = row_cache.wrap(total)
+        return [await infer(rows) for rows in ([1, 1], [2, 2], [3])]
+
+    row_cache = cache.RowCache(10, version="1")
+
+    assert run(test) == [2, 4, 3]
+    # the unique row of the first input is predicted on its own, whose output
+    # cannot be split by row; the input is then predicted as a whole, and the
+    # following inputs are passed to the model as they are
+    assert calls == [[1], [1, 1], [2, 2], [3]]
+    assert row_cache.size == 0
+
+    # the outputs of another model version may be split by row
+    row_cache.set_version("2")
+    calls.clear()
+    run(test)
+    assert calls == [[1], [1, 1], [2, 2], [3]]
+
+
+def test_row_cache_predicts_missing_rows():
+    calls = []
+
+    async def double(rows):
+        calls.append(rows)
+        return [2 * r for r in rows]
+
+    async def test():
+        infer = row_cache.wrap(double)
+        return [await infer(rows) for rows in ([1, 2], [2, 3, 3])]
+
+    row_cache = cache.RowCache(10)
+
+    assert run(test) == [[2, 4], [4, 6, 6]]
+    assert calls == [[1, 2], [3]]
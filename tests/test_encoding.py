@@ -0,0 +1,171 @@
+import io
+import json
+
+import numpy
+import pandas
+import pytest
+
+from meowlflow import encoding
+from meowlflow.api import responses
+from meowlflow.exception import UpstreamError
+
+FRAMES = {
+    "floats": pandas.DataFrame({"a": [0.1, 0.25], "b": [2.5, -1e-20]}),
+    "ints": pandas.DataFrame({"a": [1, 2], "b": [3, 2**53 + 1]}),
+    "float32": pandas.DataFrame({"a": numpy.array([0.5, 1.5], dtype=numpy.float32)}),
+    "mixed": pandas.DataFrame({"i": [1, 2**53 + 1], "f": [0.1, 2.0]}),
+    "strings": pandas.DataFrame({"s": ["a", None], "i": [1, 2]}),
+    "bools": pandas.DataFrame({"b": [True, False], "i": [1, 0]}),
+    "missing": pandas.DataFrame({"f": [0.1, numpy.nan], "s": ["é", "b"]}),
+    "empty": pandas.DataFrame({"a": pandas.Series([], dtype=float)}),
+}
+
+EXPECTED = {
+    "floats": [[0.1, 2.5], [0.25, -1e-20]],
+    "ints": [[1, 3], [2, 2**53 + 1]],
+    "float32": [[0.5], [1.5]],
+    "mixed": [[1, 0.1], [2**53 + 1, 2.0]],
+    "strings": [["a", 1], [None, 2]],
+    "bools": [[True, 1], [False, 0]],
+    "missing": [[0.1, "é"], [None, "b"]],
+    "empty": [],
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(encoding, "orjson", None)
+        monkeypatch.setattr(responses, "orjson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("name", FRAMES)
+def test_pandas_split_frames(encoder, name):
+    frame = FRAMES[name]
+
+    body = json.loads(encoding.get_encoder(encoding.PANDAS_SPLIT).encode(frame))
+
+    assert body["columns"] == frame.columns.tolist()
+    assert body["data"] == EXPECTED[name]
+    # the types of the values are kept, e.g. integers are not upcast to floats
+    assert [[type(v) for v in row] for row in body["data"]] == [
+        [type(v) for v in row] for row in EXPECTED[name]
+    ]
+
+
+def test_pandas_split_precision(encoder):
+    frame = pandas.DataFrame({"a": [1 / 3], "i": [1]})
+
+    body = json.loads(encoding.get_encoder(encoding.PANDAS_SPLIT).encode(frame))
+
+    # pandas' encoder, used without orjson, rounds to 15 significant digits
+    a = 1 / 3 if encoder == "orjson" else 0.333333333333333
+    assert body["data"] == [[a, 1]]
+
+
+@pytest.mark.parametrize("name", FRAMES)
+def test_pandas_records_frames(encoder, name):
+    frame = FRAMES[name]
+
+    body = json.loads(encoding.get_encoder(encoding.PANDAS_RECORDS).encode(frame))
+
+    assert body == [dict(zip(frame.columns, row)) for row in EXPECTED[name]]
+
+
+@pytest.mark.parametrize("format", [encoding.PANDAS_RECORDS, encoding.PANDAS_SPLIT])
+def test_records(encoder, format):
+    records = [{"a": 1, "b": 0.5}, {"b": numpy.float64(1.5), "c": "x"}]
+
+    body = json.loads(encoding.get_encoder(format).encode(records))
+
+    if format == encoding.PANDAS_RECORDS:
+        assert body == [{"a": 1, "b": 0.5}, {"b": 1.5, "c": "x"}]
+    else:
+        # the columns are the keys of every record, in order
+        assert body == {
+            "columns": ["a", "b", "c"],
+            "data": [[1, 0.5, None], [None, 1.5, "x"]],
+        }
+
+
+def test_pandas_split_values(encoder):
+    split = encoding.get_encoder(encoding.PANDAS_SPLIT)
+
+    assert json.loads(split.encode(numpy.array([[1, 2]]))) == {"data": [[1, 2]]}
+    assert json.loads(split.encode([[1.5, 2]])) == {"data": [[1.5, 2]]}
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        (numpy.array([[1, 2], [3, 4]]), [[1, 2], [3, 4]]),
+        (numpy.array([0.5, 1.5], dtype=numpy.float32), [0.5, 1.5]),
+        (pandas.Series([1, 2]), [1, 2]),
+        (FRAMES["floats"], EXPECTED["floats"]),
+        ({"a": numpy.array([1, 2]), "b": [0.5]}, {"a": [1, 2], "b": [0.5]}),
+    ],
+)
+def test_tensor(encoder, data, expected):
+    body = json.loads(encoding.get_encoder(encoding.TENSOR).encode(data))
+
+    assert body == {"inputs": expected}
+
+
+@pytest.mark.parametrize(
+    "body, expected",
+    [
+        (b"[[1, 2], [3, 4]]", numpy.array([[1, 2], [3, 4]])),
+        (b'{"predictions": [0.5, 1]}', {"predictions": numpy.array([0.5, 1.0])}),
+        # values that are not numeric, or ragged, are left as they are
+        (b'["a", "b"]', ["a", "b"]),
+        (b"[[1], [2, 3]]", [[1], [2, 3]]),
+        (b"1.5", 1.5),
+    ],
+)
+def test_tensor_decode(body, expected):
+    decoded = encoding.get_encoder(encoding.TENSOR).decode(body)
+
+    if isinstance(expected, dict):
+        assert decoded.keys() == expected.keys()
+        for key, value in expected.items():
+            numpy.testing.assert_array_equal(decoded[key], value)
+    elif isinstance(expected, numpy.ndarray):
+        assert isinstance(decoded, numpy.ndarray)
+        numpy.testing.assert_array_equal(decoded, expected)
+    else:
+        assert decoded == expected
+
+
+@pytest.mark.parametrize("name", ["floats", "mixed", "strings"])
+def test_csv_frames(name):
+    frame = FRAMES[name]
+
+    body = encoding.get_encoder(encoding.CSV).encode(frame)
+
+    pandas.testing.assert_frame_equal(pandas.read_csv(io.BytesIO(body)), frame)
+
+
+def test_csv_records():
+    records = [{"a": 1, "b": "x"}, {"b": "y", "c": 0.5}]
+
+    body = encoding.get_encoder(encoding.CSV).encode(records)
+
+    assert body == b"a,b,c\r\n1,x,\r\n,y,0.5\r\n"
+    with pytest.raises(TypeError):
+        encoding.get_encoder(encoding.CSV).encode([[1, 2]])
+
+
+@pytest.mark.parametrize("format", list(encoding.ENCODERS))
+def test_encoded_data_is_sent_as_is(format):
+    encoder = encoding.get_encoder(format)
+
+    assert encoder.encode(b"[1]") == b"[1]"
+    assert encoder.encode("[é]") == "[é]".encode("utf-8")
+
+
+def test_invalid_responses():
+    with pytest.raises(UpstreamError, match="Invalid JSON"):
+        encoding.get_encoder().decode(b"not json")
+    with pytest.raises(ValueError, match="Unknown upstream format"):
+        encoding.get_encoder("parquet")
@@ -0,0 +1,69 @@
+import asyncio
+
+from mlflow.pyfunc import load_model
+from mlflow.utils.file_utils import path_to_local_file_uri
+import pandas
+import pytest
+
+from benchmarks import model as dummy
+from meowlflow import executor
+from meowlflow.serve import model_version
+
+
+@pytest.fixture(scope="module")
+def model_uri(tmp_path_factory):
+    path = tmp_path_factory.mktemp("executor") / "model"
+    dummy.save(str(path))
+    return path_to_local_file_uri(str(path))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+FRAME = pandas.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]})
+
+
+@pytest.mark.parametrize("kind", ["inline", "thread"])
+def test_predict(model_uri, kind):
+    async def test():
+        predictor = executor.Predictor(load_model(model_uri), model_uri, kind=kind)
+        await predictor.startup()
+        try:
+            return await predictor.predict(FRAME)
+        finally:
+            await predictor.shutdown()
+
+    assert run(test).tolist() == [4.0, 6.0]
+
+
+def test_process_loads_model_in_workers(model_uri):
+    model = executor.load_metadata(model_uri)
+    # the metadata identifies the model like the loaded model
+    assert model_version(model, model_uri) == model_version(
+        load_model(model_uri), model_uri
+    )
+
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.01)
+
+    async def test():
+        predictor = executor.Predictor(model, model_uri, kind="process", workers=2)
+        await predictor.startup()
+        outputs = await asyncio.gather(*(predictor.predict(FRAME) for _ in range(4)))
+        ticker = asyncio.create_task(tick())
+        await asyncio.sleep(0)
+        # the workers are waited for without blocking the event loop
+        count = len(ticks)
+        await predictor.shutdown()
+        ticker.cancel()
+        return outputs, len(ticks) - count
+
+    outputs, ticks_during_shutdown = run(test)
+
+    assert [o.tolist() for o in outputs] == [[4.0, 6.0]] * 4
+    assert ticks_during_shutdown > 0
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from meowlflow import jobs
+from meowlflow.api.jobs import render
+from meowlflow.exception import Overloaded, UpstreamUnavailable
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(max_bytes=1024, ttl=0.0):
+        if request.param == "memory":
+            return jobs.MemoryJobStore(max_bytes, ttl)
+        return jobs.SQLiteJobStore(tmp_path / "jobs.db", max_bytes, ttl)
+
+    return make
+
+
+def finished(job_id, result, finished_at=None):
+    job = jobs.Job(job_id, "/infer", status=jobs.SUCCEEDED, result=result)
+    job.finished_at = time.time() if finished_at is None else finished_at
+    return job
+
+
+def test_store_evicts_by_size(make_store):
+    store = make_store(max_bytes=10)
+    store.put(jobs.Job("queued", "/infer"))
+    store.put(finished("a", b"12345"))
+    store.put(finished("b", b"12345"))
+    assert store.get("a").result == b"12345"
+
+    store.put(finished("c", b"123"))
+
+    # the job that finished first is removed, and queued jobs are kept
+    assert store.get("a") is None
+    assert store.get("b").result == b"12345"
+    assert store.get("c").result == b"123"
+    assert store.get("queued").status == jobs.QUEUED
+
+
+def test_store_expires(make_store):
+    store = make_store(ttl=60.0)
+    store.put(finished("old", b"1", finished_at=time.time() - 61.0))
+    store.put(finished("new", b"2"))
+
+    assert store.get("old") is None
+    assert store.get("new").result == b"2"
+
+
+def test_store_keeps_errors(make_store):
+    store = make_store()
+    job = jobs.Job("a", "/infer", priority=3)
+    job.status, job.error = jobs.FAILED, UpstreamUnavailable("down").to_dict()
+    job.finished_at = time.time()
+    store.put(job)
+
+    status = json.loads(render(store.get("a")))
+    assert status["priority"] == 3
+    assert status["error"]["code"] == UpstreamUnavailable.errorcode
+    assert "result" not in status
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+def test_queue_runs_by_priority():
+    order = []
+
+    def job(name):
+        async def run():
+            order.append(name)
+            return json.dumps({"name": name}).encode()
+
+        return run
+
+    async def test():
+        queue = jobs.JobQueue(jobs.MemoryJobStore(1024), workers=1, max_queue=3)
+        await queue.startup()
+        try:
+            low = await queue.submit("/infer", job("low"))
+            high = await queue.submit("/infer", job("high"), priority=1)
+            await queue.submit("/infer", job("next"))
+            with pytest.raises(Overloaded):
+                await queue.submit("/infer", job("rejected"))
+            return await queue.wait(low.id, 1.0), await queue.wait(high.id, 1.0)
+        finally:
+            await queue.shutdown()
+
+    low, high = run(test)
+
+    assert order == ["high", "low", "next"]
+    assert low.status == high.status == jobs.SUCCEEDED
+    assert json.loads(render(low))["result"] == {"name": "low"}
+
+
+def test_queue_fails_unfinished_jobs_on_shutdown():
+    async def test():
+        queue = jobs.JobQueue(jobs.MemoryJobStore(1024), workers=1)
+        await queue.startup()
+        job = await queue.submit("/infer", asyncio.Event().wait)
+        # the job has not finished once the wait times out
+        assert (await queue.wait(job.id, 0.05)).status == jobs.RUNNING
+        await queue.shutdown()
+        return queue.store.get(job.id)
+
+    job = run(test)
+
+    assert job.status == jobs.FAILED
+    assert job.error["code"] == "unexpected-error"
+
+
+def test_queue_polls_shared_store(tmp_path):
+    path = tmp_path / "jobs.db"
+
+    async def test():
+        queue = jobs.JobQueue(jobs.SQLiteJobStore(path, 1024), workers=1)
+        # a queue of another worker, which runs the job
+        other = jobs.JobQueue(jobs.SQLiteJobStore(path, 1024), workers=1)
+        await other.startup()
+        try:
+
+            async def run():
+                await asyncio.sleep(0.1)
+                return b"{}"
+
+            job = await other.submit("/infer", run)
+            return await queue.wait(job.id, 5.0)
+        finally:
+            await other.shutdown()
+
+    job = run(test)
+
+    assert job.status == jobs.SUCCEEDED
+    assert job.result == b"{}"
+
+
+def test_sqlite_store_is_called_in_a_thread(tmp_path):
+    store = jobs.SQLiteJobStore(tmp_path / "jobs.db", 1024)
+    threads = []
+    get = store.get
+
+    def record(job_id):
+        threads.append(threading.current_thread())
+        return get(job_id)
+
+    store.get = record
+
+    async def test():
+        queue = jobs.JobQueue(store, workers=1)
+        await queue.startup()
+        try:
+            job = await queue.submit("/infer", lambda: asyncio.sleep(0, b"{}"))
+            return await queue.wait(job.id, 1.0)
+        finally:
+            await queue.shutdown()
+
+    assert run(test).status == jobs.SUCCEEDED
+    assert threads and threading.main_thread() not in threads
+
+
+def test_queue_fails_jobs_of_stopped_workers(tmp_path):
+    store = jobs.SQLiteJobStore(tmp_path / "jobs.db", 1024, ttl=60.0)
+    stopped = subprocess.Popen([sys.executable, "-c", ""])
+    stopped.wait()
+    owners = {
+        "stopped": ("localhost", stopped.pid),
+        "running": ("localhost", os.getppid()),
+        "other-host": ("elsewhere", stopped.pid),
+        "finished": ("localhost", stopped.pid),
+    }
+    for job_id, (host, pid) in owners.items():
+        job = jobs.Job(job_id, "/infer", status=jobs.RUNNING)
+        if job_id == "finished":
+            job = finished(job_id, b"{}")
+        store.put(job)
+        store.connection.execute(
+            "UPDATE jobs SET host = ?, pid = ? WHERE id = ?", (host, pid, job_id)
+        )
+    store._host = "localhost"
+
+    async def test():
+        queue = jobs.JobQueue(store, workers=1)
+        await queue.startup()
+        await queue.shutdown()
+        return {job_id: store.get(job_id) for job_id in owners}
+
+    recovered = run(test)
+
+    assert recovered["stopped"].status == jobs.FAILED
+    assert recovered["stopped"].error["code"] == "unexpected-error"
+    # failed jobs expire like other finished jobs
+    assert store.connection.execute(
+        "SELECT expires_at FROM jobs WHERE id = 'stopped'"
+    ).fetchone() == (pytest.approx(recovered["stopped"].finished_at + 60.0),)
+    assert recovered["running"].status == jobs.RUNNING
+    assert recovered["other-host"].status == jobs.RUNNING
+    assert recovered["finished"].status == jobs.SUCCEEDED
@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+from mlflow.utils.file_utils import path_to_local_file_uri
+
+from meowlflow import manifest
+
+MANIFEST = """
+/local:
+  model: models/local
+  schema: schemas/local.py
+  warm_up: requests/local.json
+/absolute:
+  model: {absolute}
+  schema: schemas/local.py
+/registry:
+  model: models:/wine/Production
+  schema: schemas/local.py
+"""
+
+
+def test_load_manifest_paths(tmp_path):
+    directory = tmp_path / "manifest"
+    (directory / "schemas").mkdir(parents=True)
+    (directory / "schemas" / "local.py").write_text("")
+    path = directory / "manifest.yaml"
+    path.write_text(MANIFEST.format(absolute=tmp_path / "absolute"))
+
+    entries = manifest.load_manifest(path)
+
+    # local paths are relative to the manifest rather than to the working directory
+    assert entries["/local"].model == str(directory / "models" / "local")
+    assert entries["/local"].schema_path == directory / "schemas" / "local.py"
+    assert entries["/local"].warm_up_path == directory / "requests" / "local.json"
+    assert entries["/absolute"].model == str(tmp_path / "absolute")
+    assert entries["/registry"].model == "models:/wine/Production"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+class Predictor:
+    def __init__(self, model):
+        self.model = model
+        self.stopped = False
+
+    async def predict(self, data):
+        await data.wait()
+        return self.model
+
+    async def shutdown(self):
+        self.stopped = True
+
+
+def test_pool_evicts_idle_models(tmp_path):
+    predictors = {}
+
+    def load(model_path, path):
+        # models of 10 bytes each
+        with open(os.path.join(path, "model.bin"), "wb") as f:
+            f.write(b"0" * 10)
+        return model_path, path_to_local_file_uri(path)
+
+    async def start(model, model_uri):
+        predictors[model] = Predictor(model)
+        return predictors[model]
+
+    async def test():
+        pool = manifest.ModelPool(
+            str(tmp_path), load, start, lambda model, uri: model, memory_budget=25
+        )
+        done = asyncio.Event()
+        done.set()
+        running = asyncio.Event()
+        # /a is the least recently used model, but is running a prediction when
+        # /c is loaded, so /b is unloaded instead
+        a = asyncio.create_task(pool.predict("/a", "a", running, []))
+        while "/a" not in pool._loaded:
+            await asyncio.sleep(0.01)
+        await pool.predict("/b", "b", done, [])
+        assert await pool.predict("/c", "c", done, []) == "c"
+        loaded = list(pool._loaded)
+        running.set()
+        await a
+        await pool.shutdown()
+        return loaded
+
+    loaded = run(test)
+
+    assert loaded == ["/a", "/c"]
+    assert predictors["b"].stopped
+    # the directories of unloaded models are removed
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+
+from fastapi import APIRouter
+import httpx
+import numpy
+import pytest
+
+from meowlflow import ndjson, sidecar
+from meowlflow.app import build_app
+
+SCHEMA = Path(__file__).parent.parent / "e2e" / "mlflow_example_schema.py"
+
+RECORD = {
+    "alcohol": 1.0,
+    "chlorides": 1.0,
+    "citric_acid": 1.0,
+    "density": 1.0,
+    "fixed_acidity": 1.0,
+    "free_sulfur_dioxide": 1.0,
+    "pH": 1.0,
+    "residual_sugar": 1.0,
+    "sulphates": 1.0,
+    "total_sulfur_dioxide": 1.0,
+    "volatile_acidity": 1.0,
+}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_chunks_across_reads():
+    async def test():
+        return [
+            chunk
+            async for chunk in ndjson.chunks(
+                stream(b'{"a": 1}\n{"a"', b": 2}\n\n", b'{"a": 3}'), 2
+            )
+        ]
+
+    assert run(test) == [[{"a": 1}, {"a": 2}], [{"a": 3}]]
+
+
+@pytest.mark.parametrize("line", [b"{", b"\xff"])
+def test_invalid_lines(line):
+    async def test():
+        return [record async for record in ndjson.records(stream(line))]
+
+    with pytest.raises(ndjson.DecodeError):
+        run(test)
+
+
+def test_rows():
+    assert ndjson.rows(numpy.array([1, 2]), 2)[1].tolist() == [2]
+    assert ndjson.rows({"a": [1, 2]}, 2) == [{"a": [1]}, {"a": [2]}]
+    # outputs without one row per input row are not split
+    assert ndjson.rows([1, 2, 3], 2) == [[1, 2, 3]]
+
+
+async def infer(frame):
+    if (frame["alcohol"] < 0).any():
+        raise ValueError("the model failed")
+    return frame.sum(axis=1).to_numpy()
+
+
+def post(lines, stream_chunk_size=2):
+    app = build_app({})
+    router = APIRouter()
+    sidecar.register_infer_endpoint(
+        logging.getLogger(__name__),
+        app,
+        router,
+        "/infer",
+        infer,
+        SCHEMA,
+        stream_chunk_size=stream_chunk_size,
+    )
+    app.include_router(router)
+
+    async def test():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.post(
+                "/infer/stream",
+                content=b"\n".join(lines),
+                headers={"Content-Type": ndjson.MEDIA_TYPE},
+            )
+
+    response = run(test)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_stream():
+    lines = [json.dumps(RECORD).encode()] * 3
+
+    assert post(lines) == [{"predictions": [11.0]}] * 3
+
+
+@pytest.mark.parametrize(
+    "line, code",
+    [
+        (b"{", "invalid-usage"),
+        (json.dumps({**RECORD, "pH": "acid"}).encode(), "invalid-parameters"),
+        (json.dumps({**RECORD, "alcohol": -1.0}).encode(), "unexpected-error"),
+    ],
+)
+def test_errors_are_reported_in_band(line, code):
+    lines = [json.dumps(RECORD).encode()] * 2 + [line]
+
+    *outputs, error = post(lines)
+
+    # the first chunk is answered before the error
+    assert outputs == [{"predictions": [11.0]}] * 2
+    assert error["error"]["code"] == code
+    assert error["error"]["details"]["offset"] == 2
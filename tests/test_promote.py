@@ -0,0 +1,145 @@
+import json
+
+from click.testing import CliRunner
+import mlflow
+import pytest
+
+from meowlflow.cli import cli
+from meowlflow import promote
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """a local tracking and registry store in a SQLite file"""
+    uri = f"sqlite:///{tmp_path / 'mlflow.db'}"
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", uri)
+    mlflow.set_tracking_uri(uri)
+    mlflow.set_registry_uri(uri)
+    experiment_id = mlflow.create_experiment(
+        "test", artifact_location=str(tmp_path / "artifacts")
+    )
+    yield experiment_id
+    mlflow.set_tracking_uri("")
+    mlflow.set_registry_uri("")
+
+
+def log_run(experiment_id, commit, **metrics):
+    with mlflow.start_run(
+        experiment_id=experiment_id, tags={"mlflow.source.git.commit": commit}
+    ) as run:
+        mlflow.log_metrics(metrics)
+    return run.info.run_id
+
+
+def staged_run_id(model_name, stage="Staging"):
+    (version,) = promote._get_registry().get_latest_versions(model_name, [stage])
+    return version.run_id
+
+
+def test_promote_creates_model(store):
+    run_id = log_run(store, "a", test_f1=0.5)
+
+    version = promote.promote("a", store, "wine")
+
+    assert version.current_stage == "Staging"
+    assert staged_run_id("wine") == run_id
+
+
+def test_promote_compares_metric(store):
+    first = log_run(store, "a", test_f1=0.5)
+    log_run(store, "b", test_f1=0.4)
+    third = log_run(store, "c", test_f1=0.6)
+
+    assert promote.promote("a", store, "wine") is not None
+    assert promote.promote("b", store, "wine") is None
+    assert staged_run_id("wine") == first
+    assert promote.promote("c", store, "wine") is not None
+    assert staged_run_id("wine") == third
+
+
+def test_promote_does_not_create_model(store):
+    log_run(store, "a", test_f1=0.5)
+
+    with pytest.raises(ValueError, match="no registered model"):
+        promote.promote("a", store, "wine", auto_create=False)
+
+
+def test_promote_unknown_commit(store):
+    with pytest.raises(ValueError, match="no run for commit"):
+        promote.promote("missing", store, "wine")
+    assert not promote._get_registry().search_registered_models("name='wine'")
+
+
+def test_promote_batch(store, tmp_path):
+    wine = log_run(store, "a", test_f1=0.5, test_rmse=2.0)
+    log_run(store, "b", test_f1=0.4, test_rmse=3.0)
+    iris = log_run(store, "c", test_f1=0.9)
+    batch_path = tmp_path / "batch.json"
+    batch_path.write_text(
+        json.dumps(
+            [
+                {
+                    "commit": "a",
+                    "experiment_id": store,
+                    "model_name": "wine",
+                    "metric": "test_rmse",
+                    "direction": "minimize",
+                },
+                {
+                    "commit": "b",
+                    "experiment_id": store,
+                    "model_name": "wine",
+                    "metric": "test_rmse",
+                    "direction": "minimize",
+                },
+                {"commit": "c", "experiment_id": store, "model_name": "iris"},
+            ]
+        )
+    )
+
+    result = CliRunner().invoke(
+        cli, ["promote-batch", str(batch_path), "--exit-code", "3"]
+    )
+
+    assert result.exit_code == 3, result.output
+    assert staged_run_id("wine") == wine
+    assert staged_run_id("iris") == iris
+
+
+def test_promote_batch_errors(store, tmp_path):
+    log_run(store, "a", test_f1=0.5)
+    iris = log_run(store, "b", test_f1=0.5)
+    batch_path = tmp_path / "batch.yaml"
+    batch_path.write_text(
+        f"- {{commit: a, experiment_id: {store}, model_name: wine}}\n"
+        f"- {{commit: missing, experiment_id: {store}, model_name: iris}}\n"
+        f"- {{commit: b, experiment_id: {store}, model_name: iris}}\n"
+    )
+
+    result = CliRunner().invoke(cli, ["promote-batch", str(batch_path)])
+
+    assert result.exit_code == 1, result.output
+    assert "iris at commit missing: Found no run for commit missing" in result.output
+    assert staged_run_id("wine")
+    # the entries after the failed one are still promoted
+    assert staged_run_id("iris") == iris
+
+
+def test_promote_batch_direction_is_case_insensitive(store, tmp_path):
+    log_run(store, "a", test_rmse=2.0)
+    best = log_run(store, "b", test_rmse=1.0)
+    batch_path = tmp_path / "batch.yaml"
+    batch_path.write_text(
+        "".join(
+            f"- {{commit: {commit}, experiment_id: {store}, model_name: wine, "
+            "metric: test_rmse, direction: Minimize}\n"
+            for commit in ("a", "b")
+        )
+    )
+
+    result = CliRunner().invoke(
+        cli, ["promote-batch", str(batch_path), "--direction", "MAXIMIZE"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert staged_run_id("wine") == best
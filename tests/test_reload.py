@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from meowlflow import reload
+
+
+class Predictor:
+    def __init__(self, model, model_uri):
+        self.model = model
+        self.model_uri = model_uri
+        self.running = False
+
+    async def startup(self):
+        self.running = True
+
+    async def shutdown(self):
+        self.running = False
+
+    async def predict(self, data):
+        return self.model
+
+
+@pytest.fixture
+def stage(monkeypatch):
+    """the versions a stage URI resolves to, the last one being current"""
+    versions = []
+
+    def resolve(model_path):
+        assert model_path == "models:/m/Production"
+        return f"models:/m/{versions[-1]}"
+
+    monkeypatch.setattr(reload, "resolve", resolve)
+    return versions
+
+
+def reloader(tmp_path, resolved, loads, released):
+    def load(uri, path):
+        loads.append(uri)
+        return uri, f"file://{path}/{uri}"
+
+    async def start(model, model_uri):
+        predictor = Predictor(model, model_uri)
+        await predictor.startup()
+        return predictor
+
+    return reload.ReloadingPredictor(
+        Predictor("models:/m/1", "file:///initial"),
+        "models:/m/1",
+        resolved,
+        "models:/m/Production",
+        str(tmp_path),
+        load,
+        start,
+        lambda model, model_uri: model,
+        release=released.append,
+    )
+
+
+def test_pin():
+    assert reload.pin("models:/m/Production", "models:/m/3") == "models:/m/3"
+    assert reload.pin("/models/m", "/models/m@uuid") == "/models/m"
+    assert reload.pin("models:/m/Production", None) == "models:/m/Production"
+
+
+def test_reloads_versions_released_after_the_initial_one(tmp_path, stage):
+    loads, released, versions = [], [], []
+    # the stage moves on after the initial version was resolved and loaded, but
+    # before the predictor starts
+    stage.append(2)
+    predictor = reloader(tmp_path, "models:/m/1", loads, released)
+    predictor.on_swap(versions.append)
+
+    async def test():
+        await predictor.startup()
+        swapped = await predictor.reload()
+        unchanged = await predictor.reload()
+        prediction = await predictor.predict(None)
+        await predictor.shutdown()
+        return swapped, unchanged, prediction
+
+    swapped, unchanged, prediction = asyncio.run(test())
+
+    assert (swapped, unchanged) == (True, False)
+    # the version resolved is the version loaded
+    assert loads == ["models:/m/2"]
+    assert prediction == "models:/m/2"
+    assert versions == ["models:/m/1", "models:/m/2"]
+    assert released == ["file:///initial"]
+
+
+def test_unresolved_initial_version_is_reloaded(tmp_path, stage):
+    loads, released = [], []
+    stage.append(1)
+    predictor = reloader(tmp_path, None, loads, released)
+
+    async def test():
+        await predictor.startup()
+        try:
+            return await predictor.reload()
+        finally:
+            await predictor.shutdown()
+
+    assert asyncio.run(test()) is True
+    assert loads == ["models:/m/1"]
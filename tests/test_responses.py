@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+import httpx
+import numpy
+import pandas
+from pydantic import BaseModel
+import pytest
+
+from meowlflow import sidecar
+from meowlflow.api import responses
+from meowlflow.app import build_app
+
+SCHEMA = Path(__file__).parent.parent / "e2e" / "mlflow_example_schema.py"
+
+
+class Response(BaseModel):
+    predictions: List[float]
+    labels: Optional[List[str]] = None
+    counts: Optional[Dict[str, int]] = None
+
+
+class Nested(BaseModel):
+    name: str
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(responses, "orjson", None)
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        {"predictions": [0.1, 2.5], "labels": ["a", "é"], "counts": {"a": 1}},
+        {"predictions": list(numpy.array([0.1, 2.5])), "labels": None, "counts": None},
+        {
+            "predictions": list(pandas.Series([1.0, 2.0])),
+            "labels": ["x", "y"],
+            "counts": {"a": numpy.int64(3)},
+        },
+    ],
+)
+def test_parity_with_validated_responses(encoder, content):
+    fast = json.loads(responses.dumps(content))
+
+    assert fast == jsonable_encoder(Response.parse_obj(content))
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (numpy.array([[1, 2], [3, 4]]), [[1, 2], [3, 4]]),
+        (numpy.float64(0.5), 0.5),
+        (pandas.Series([1.5, 2.5]), [1.5, 2.5]),
+        (pandas.DataFrame({"a": [1, 2]}), [{"a": 1}, {"a": 2}]),
+        ({"item": Nested(name="n")}, {"item": {"name": "n"}}),
+    ],
+)
+def test_numpy_pandas_and_pydantic_objects(encoder, content, expected):
+    assert json.loads(responses.dumps(content)) == expected
+
+
+def test_content_is_not_validated(encoder):
+    # unlike validated responses, missing fields are not filled in and values
+    # are not converted to the types of their fields
+    content = {"predictions": [1, 2]}
+
+    assert json.loads(responses.dumps(content)) == {"predictions": [1, 2]}
+    assert jsonable_encoder(Response.parse_obj(content)) == {
+        "predictions": [1.0, 2.0],
+        "labels": None,
+        "counts": None,
+    }
+
+
+def test_float32(encoder):
+    content = {"predictions": list(numpy.array([0.1], dtype=numpy.float32))}
+
+    fast = json.loads(responses.dumps(content))
+
+    if encoder == "orjson":
+        assert fast == {"predictions": [0.1]}
+    else:
+        assert fast == {"predictions": [float(numpy.float32(0.1))]}
+        assert fast["predictions"] == Response.parse_obj(content).predictions
+
+
+def test_unserializable_content(encoder):
+    with pytest.raises(TypeError):
+        responses.dumps({"predictions": object()})
+
+
+async def infer(frame):
+    return frame.sum(axis=1).to_numpy() / 3
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "json"], indirect=True)
+def test_endpoint_parity(encoder):
+    record = {
+        "alcohol": 1.0,
+        "chlorides": 1.0,
+        "citric_acid": 1.0,
+        "density": 1.0,
+        "fixed_acidity": 1.0,
+        "free_sulfur_dioxide": 1.0,
+        "pH": 1.0,
+        "residual_sugar": 1.0,
+        "sulphates": 1.0,
+        "total_sulfur_dioxide": 1.0,
+        "volatile_acidity": 0.1,
+    }
+
+    async def post(fast_response):
+        app = build_app({})
+        router = APIRouter()
+        sidecar.register_infer_endpoint(
+            logging.getLogger(__name__),
+            app,
+            router,
+            "/infer",
+            infer,
+            SCHEMA,
+            fast_response=fast_response,
+        )
+        app.include_router(router)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.post("/infer", json=[record, record])
+
+    async def test():
+        return await post(True), await post(False)
+
+    fast, validated = asyncio.run(test())
+
+    assert fast.status_code == validated.status_code == 200
+    assert fast.headers["content-type"] == validated.headers["content-type"]
+    assert fast.json() == validated.json()
@@ -0,0 +1,248 @@
+import asyncio
+import contextlib
+import json
+import subprocess
+import sys
+
+from google.protobuf import descriptor_pb2, json_format
+import numpy
+import pytest
+
+from meowlflow import rpc, server
+from meowlflow.exception import UpstreamUnavailable
+from meowlflow.sidecar import load_schema
+
+grpc = pytest.importorskip("grpc")
+
+SCHEMA = """
+import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from meowlflow.api.base import BaseRequest, BaseResponse
+
+
+class Page(BaseModel):
+    text: str
+    number: Optional[int] = None
+    tags: List[str] = []
+    created: Optional[datetime.date] = None
+
+
+class Request(BaseRequest):
+    pages: List[Page]
+    language: str = Field("de", alias="lang")
+    options: Dict[str, Any] = {}
+    matrix: List[List[float]] = []
+
+    def transform(self) -> Any:
+        return self
+
+
+class Response(BaseResponse):
+    __root__: List[Page]
+
+    @classmethod
+    def transform(cls, data: Any) -> Any:
+        return data
+"""
+
+F = descriptor_pb2.FieldDescriptorProto
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / "schema.py"
+    path.write_text(SCHEMA)
+    return load_schema(path)
+
+
+def fields(file, message):
+    (message,) = [m for m in file.message_type if m.name == message]
+    return {f.name: f for f in message.field}
+
+
+def test_build_file(schema):
+    file = rpc.build_file("/api/v1/infer", schema)
+
+    assert file.package == "meowlflow.api.v1.infer"
+    assert [m.name for m in file.message_type] == ["Request", "Page", "Response"]
+    request = fields(file, "Request")
+    assert request["pages"].label == F.LABEL_REPEATED
+    assert request["pages"].type_name == ".meowlflow.api.v1.infer.Page"
+    assert request["language"].json_name == "lang"
+    assert request["language"].proto3_optional
+    assert request["options"].type_name == ".google.protobuf.Value"
+    assert request["matrix"].label == F.LABEL_REPEATED
+    assert request["matrix"].type_name == ".google.protobuf.Value"
+    page = fields(file, "Page")
+    assert page["number"].type == F.TYPE_INT64
+    assert page["tags"].type == F.TYPE_STRING
+    assert page["created"].type == F.TYPE_STRING
+    assert list(fields(file, "Response")) == ["items"]
+
+    source = rpc.render(file)
+    assert "rpc InferStream(stream Request) returns (stream Response);" in source
+    assert 'optional string language = 2 [json_name = "lang"];' in source
+
+
+def test_messages_from_dicts(schema):
+    classes = rpc._message_classes(rpc.build_file("/infer", schema))
+    request_class = classes["meowlflow.infer.Request"]
+    data = {
+        "pages": [
+            {"text": "a", "number": 0, "tags": ["x"], "created": "2022-01-02"},
+            {"text": "b", "number": None, "unknown": 1},
+        ],
+        "lang": "en",
+        "options": {"k": [1, None, {"n": True}], "s": "v", "e": {}},
+        "matrix": [[1.5, 2], []],
+    }
+
+    message = rpc._from_dict(request_class(), data)
+
+    expected = request_class()
+    json_format.ParseDict(data, expected, ignore_unknown_fields=True)
+    assert message == expected
+    # unset fields are missing from the dict of the message
+    assert rpc._to_dict(message)["pages"][1] == {"text": "b", "tags": []}
+
+
+def test_rpc_is_imported_only_if_grpc_is_enabled():
+    code = (
+        "import sys\n"
+        "from meowlflow import server, sidecar\n"
+        "assert server.create_grpc_server('127.0.0.1') is None\n"
+        "assert 'meowlflow.rpc' not in sys.modules\n"
+        "assert not any(m.startswith('google.protobuf') for m in sys.modules)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    grpc_server = server.create_grpc_server("127.0.0.1", 50051)
+    assert isinstance(grpc_server, rpc.GrpcServer)
+
+
+@contextlib.asynccontextmanager
+async def serve(schema, respond):
+    server = rpc.GrpcServer("127.0.0.1", 0)
+    server.add_endpoint("/infer", schema, respond)
+    await server.startup()
+    (endpoint,) = server.endpoints
+    channel = grpc.aio.insecure_channel(f"127.0.0.1:{server.port}")
+    try:
+        yield endpoint, channel
+    finally:
+        await channel.close()
+        await server.shutdown()
+
+
+def method(channel, endpoint, name):
+    kwargs = {
+        "request_serializer": endpoint.request_class.SerializeToString,
+        "response_deserializer": endpoint.response_class.FromString,
+    }
+    if name == "Infer":
+        return channel.unary_unary("/meowlflow.infer.Model/Infer", **kwargs)
+    return channel.stream_stream("/meowlflow.infer.Model/InferStream", **kwargs)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+def test_infer(schema):
+    requests = []
+
+    async def respond(request):
+        requests.append(request)
+        return json.dumps(request.dict()["pages"], default=str).encode()
+
+    async def test():
+        async with serve(schema, respond) as (endpoint, channel):
+            message = endpoint.request_class()
+            message.pages.add(text="a", number=0, created="2022-01-02")
+            message.pages.add(text="b", tags=["x", "y"])
+            message.options.struct_value.update({"k": [1, None]})
+            message.matrix.add().list_value.extend([1.5, 2])
+            return await method(channel, endpoint, "Infer")(message)
+
+    response = run(test)
+
+    (request,) = requests
+    assert request.language == "de"
+    assert request.options == {"k": [1, None]}
+    assert request.matrix == [[1.5, 2.0]]
+    first, second = response.items
+    # fields that are set to their default are kept, and missing fields are unset
+    assert first.HasField("number") and first.number == 0
+    assert first.created == "2022-01-02"
+    assert not second.HasField("number") and not second.HasField("created")
+    assert list(second.tags) == ["x", "y"]
+
+
+def test_infer_content(schema):
+    async def respond(request):
+        # the content of a response, which need not be encoded as JSON
+        return [
+            {"text": page.text, "number": numpy.int64(i), "tags": numpy.array(["t"])}
+            for i, page in enumerate(request.pages)
+        ]
+
+    async def test():
+        async with serve(schema, respond) as (endpoint, channel):
+            message = endpoint.request_class()
+            message.pages.add(text="a")
+            message.pages.add(text="b")
+            return await method(channel, endpoint, "Infer")(message)
+
+    response = run(test)
+
+    assert [(p.text, p.number, list(p.tags)) for p in response.items] == [
+        ("a", 0, ["t"]),
+        ("b", 1, ["t"]),
+    ]
+
+
+def test_infer_errors(schema):
+    async def respond(request):
+        raise UpstreamUnavailable("down")
+
+    async def test():
+        async with serve(schema, respond) as (endpoint, channel):
+            infer = method(channel, endpoint, "Infer")
+            message = endpoint.request_class()
+            message.pages.add(number=1)
+            with pytest.raises(grpc.aio.AioRpcError) as invalid:
+                await infer(message)
+            message.pages[0].text = "a"
+            with pytest.raises(grpc.aio.AioRpcError) as unavailable:
+                await infer(message)
+            return invalid.value, unavailable.value
+
+    invalid, unavailable = run(test)
+    assert invalid.code() == grpc.StatusCode.INVALID_ARGUMENT
+    assert json.loads(invalid.details())["error"]["code"] == "invalid-parameters"
+    assert unavailable.code() == grpc.StatusCode.UNAVAILABLE
+    assert json.loads(unavailable.details())["error"]["message"] == "down"
+
+
+def test_infer_stream_in_order(schema):
+    async def respond(request):
+        (page,) = request.pages
+        # later messages are answered first
+        await asyncio.sleep(0.05 / page.number)
+        return json.dumps([{"text": page.text, "number": page.number}]).encode()
+
+    async def test():
+        async with serve(schema, respond) as (endpoint, channel):
+            messages = []
+            for i in range(1, 6):
+                message = endpoint.request_class()
+                message.pages.add(text=str(i), number=i)
+                messages.append(message)
+            call = method(channel, endpoint, "InferStream")(iter(messages))
+            return [response async for response in call]
+
+    responses = run(test)
+    assert [r.items[0].number for r in responses] == [1, 2, 3, 4, 5]
@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+
+import click
+from click.testing import CliRunner
+import pandas
+from pydantic import ValidationError
+import pytest
+
+from benchmarks import model as dummy
+from meowlflow.cli import cli
+from meowlflow.score import score_chunk
+from meowlflow.sidecar import load_schema
+
+SCHEMA = Path(__file__).parent.parent / "e2e" / "mlflow_example_schema.py"
+
+COLUMNS = [
+    "alcohol",
+    "chlorides",
+    "citric_acid",
+    "density",
+    "fixed_acidity",
+    "free_sulfur_dioxide",
+    "pH",
+    "residual_sugar",
+    "sulphates",
+    "total_sulfur_dioxide",
+    "volatile_acidity",
+]
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("score") / "model"
+    dummy.save(str(path))
+    return str(path)
+
+
+def records(n):
+    return [{c: float(i) for c in COLUMNS} for i in range(n)]
+
+
+def score(model_path, path, *args):
+    result = CliRunner().invoke(
+        cli,
+        [
+            "score",
+            str(path),
+            "--model-path",
+            model_path,
+            "--schema-path",
+            str(SCHEMA),
+            "--chunk-size",
+            "2",
+            *args,
+        ],
+        catch_exceptions=False,
+    )
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    return result.exit_code, lines
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+@pytest.mark.parametrize("extension", [".csv", ".jsonl"])
+def test_score(tmp_path, model_path, jobs, extension):
+    path = tmp_path / f"records{extension}"
+    if extension == ".csv":
+        pandas.DataFrame(records(5)).to_csv(path, index=False)
+    else:
+        path.write_text("".join(json.dumps(r) + "\n" for r in records(5)))
+
+    exit_code, lines = score(model_path, path, "--jobs", jobs)
+
+    assert exit_code == 0
+    assert lines == [{"predictions": [i * 11.0]} for i in range(5)]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl"])
+def test_invalid_records(tmp_path, model_path, extension):
+    path = tmp_path / f"records{extension}"
+    data = records(3)
+    data[1]["pH"] = "acid"
+    if extension == ".csv":
+        pandas.DataFrame(data).to_csv(path, index=False)
+    else:
+        path.write_text("".join(json.dumps(r) + "\n" for r in data))
+
+    with pytest.raises(ValidationError):
+        score(model_path, path)
+    exit_code, lines = score(model_path, path, "--invalid-records", "report")
+
+    assert exit_code == 0
+    assert lines[0] == {"predictions": [0.0]}
+    assert lines[1]["error"]["code"] == "invalid-parameters"
+    assert lines[2] == {"predictions": [22.0]}
+
+
+def test_unsplittable_outputs():
+    class Model:
+        def predict(self, data):
+            return 1.0
+
+    with pytest.raises(click.ClickException):
+        score_chunk(Model(), load_schema(SCHEMA), records(2))
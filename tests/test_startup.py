@@ -0,0 +1,149 @@
+import asyncio
+import os
+from pathlib import Path
+import socket
+import subprocess
+import sys
+import time
+import types
+from typing import List
+import urllib.request
+
+import click
+from prometheus_client.parser import text_string_to_metric_families
+from pydantic import BaseModel
+import pytest
+
+from benchmarks import model
+from meowlflow import startup
+
+ROOT = Path(__file__).parent.parent
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def startup_durations(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        text = response.read().decode()
+    (family,) = [
+        f
+        for f in text_string_to_metric_families(text)
+        if f.name == "meowlflow_startup_duration_seconds"
+    ]
+    return {s.labels["stage"]: s.value for s in family.samples}
+
+
+def test_startup_durations_with_workers(tmp_path):
+    pytest.importorskip("gunicorn")
+    model.save(str(tmp_path / "model"))
+    (tmp_path / "metrics").mkdir()
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "meowlflow.cli",
+            "serve",
+            "--model-path",
+            str(tmp_path / "model"),
+            "--schema-path",
+            "e2e/mlflow_example_schema.py",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            "2",
+        ],
+        cwd=ROOT,
+        env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path / "metrics")},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 60.0
+        while True:
+            try:
+                durations = startup_durations(port)
+                if "predictor" in durations:
+                    break
+            except (OSError, ValueError):
+                pass
+            assert server.poll() is None, "the server exited"
+            assert time.monotonic() < deadline, "the server did not start"
+            time.sleep(0.2)
+    finally:
+        server.terminate()
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    # the stages of building the app, before the workers were forked
+    for stage in ("imports", "load_model", "schema"):
+        assert durations[stage] > 0.0
+
+
+class Request(BaseModel):
+    __root__: List[float]
+
+    class Config:
+        schema_extra = {"example": [1.0, 2.0]}
+
+
+class Response(BaseModel):
+    __root__: List[float]
+
+    @classmethod
+    def transform(cls, data):
+        return data
+
+
+def schema_module(request_class):
+    module = types.ModuleType("schema")
+    module.Request = request_class
+    module.Response = Response
+    return module
+
+
+class ExampleRequest(Request):
+    def transform(self):
+        return self.__root__
+
+
+class NoExampleRequest(ExampleRequest):
+    class Config:
+        schema_extra = {}
+
+
+def test_warm_up(tmp_path):
+    calls = []
+
+    async def predict(data):
+        calls.append(data)
+        return data
+
+    warm_up = startup.get_warm_up(schema_module(ExampleRequest), requests=2)
+    asyncio.run(warm_up(predict))
+    assert calls == [[1.0, 2.0]] * 2
+
+    path = tmp_path / "request.json"
+    path.write_text("[3.0]")
+    warm_up = startup.get_warm_up(schema_module(NoExampleRequest), path)
+    asyncio.run(warm_up(predict))
+    assert calls[-1] == [3.0]
+
+    assert startup.get_warm_up(schema_module(ExampleRequest), requests=0) is None
+
+
+def test_warm_up_without_example():
+    schema = schema_module(NoExampleRequest)
+
+    with pytest.raises(click.UsageError):
+        startup.get_warm_up(schema, requests=1)
+    assert startup.get_warm_up(schema, requests=1, required=False) is None
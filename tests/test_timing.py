@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from fastapi import APIRouter
+import httpx
+from prometheus_client import REGISTRY
+import pytest
+
+from meowlflow import cache, sidecar, timing
+from meowlflow.app import build_app
+
+SCHEMA = Path(__file__).parent.parent / "e2e" / "mlflow_example_schema.py"
+
+RECORD = {
+    "alcohol": 1.0,
+    "chlorides": 1.0,
+    "citric_acid": 1.0,
+    "density": 1.0,
+    "fixed_acidity": 1.0,
+    "free_sulfur_dioxide": 1.0,
+    "pH": 1.0,
+    "residual_sugar": 1.0,
+    "sulphates": 1.0,
+    "total_sulfur_dioxide": 1.0,
+    "volatile_acidity": 1.0,
+}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+def observations(endpoint, stage):
+    return (
+        REGISTRY.get_sample_value(
+            "meowlflow_infer_stage_duration_seconds_count",
+            {"endpoint": endpoint, "stage": stage, "model_version": "1"},
+        )
+        or 0.0
+    )
+
+
+def test_stages_accumulate_and_end_with_serialize():
+    timer = timing.StageTimer("/stages", model_version=lambda: "1")
+
+    with timer.stages() as durations:
+        timing.mark(timing.PARSE)
+        timing.mark(timing.INFER)
+        timing.mark(timing.INFER)
+
+    assert list(durations) == [timing.PARSE, timing.INFER, timing.SERIALIZE]
+    assert all(d >= 0.0 for d in durations.values())
+    assert observations("/stages", timing.INFER) == 1.0
+    # marks outside of a timed request are ignored
+    timing.mark(timing.PARSE)
+
+
+def test_failed_requests_are_not_observed():
+    timer = timing.StageTimer("/failed", model_version="1")
+
+    with pytest.raises(ValueError):
+        with timer.stages():
+            timing.mark(timing.PARSE)
+            raise ValueError()
+
+    assert observations("/failed", timing.PARSE) == 0.0
+
+
+async def infer(frame):
+    return frame.sum(axis=1).to_numpy()
+
+
+@pytest.mark.parametrize(
+    "response_cache, stages",
+    [
+        (
+            None,
+            [
+                timing.PARSE,
+                timing.REQUEST_TRANSFORM,
+                timing.INFER,
+                timing.RESPONSE_TRANSFORM,
+                timing.SERIALIZE,
+            ],
+        ),
+        (
+            cache.ResponseCache(1 << 20),
+            [
+                timing.PARSE,
+                timing.CACHE,
+                timing.REQUEST_TRANSFORM,
+                timing.INFER,
+                timing.RESPONSE_TRANSFORM,
+                timing.SERIALIZE,
+            ],
+        ),
+    ],
+)
+def test_server_timing_header(response_cache, stages):
+    endpoint = "/timed" if response_cache is None else "/cached"
+    app = build_app({})
+    router = APIRouter()
+    sidecar.register_infer_endpoint(
+        logging.getLogger(__name__),
+        app,
+        router,
+        endpoint,
+        infer,
+        SCHEMA,
+        response_cache=response_cache,
+        model_version="1",
+        server_timing=True,
+    )
+    app.include_router(router)
+
+    async def test():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.post(endpoint, json=[RECORD])
+
+    before = observations(endpoint, timing.INFER)
+    response = run(test)
+
+    assert response.status_code == 200
+    header = response.headers["Server-Timing"].split(", ")
+    assert [entry.split(";")[0] for entry in header] == stages
+    assert all(entry.split(";")[1].startswith("dur=") for entry in header)
+    assert observations(endpoint, timing.INFER) == before + 1.0
@@ -0,0 +1,221 @@
+import asyncio
+import contextlib
+import json
+import time
+
+from aiohttp import web
+import pytest
+
+from meowlflow import upstreams
+from meowlflow.exception import UpstreamError, UpstreamRejected, UpstreamUnavailable
+
+HEADERS = {"Content-Type": "application/json; format=pandas-records"}
+
+
+class Stub:
+    """a stand-in for a replica of `mlflow models serve`"""
+
+    def __init__(self, latency=0.0, status=200):
+        self.latency = latency
+        self.status = status
+        self.calls = 0
+        self.url = None
+
+    async def invocations(self, request):
+        self.calls += 1
+        body = await request.json()
+        await asyncio.sleep(self.latency)
+        if self.status != 200:
+            return web.json_response({"error": "stub"}, status=self.status)
+        return web.json_response([0] * len(body))
+
+
+@contextlib.asynccontextmanager
+async def serve(*stubs):
+    runners = []
+    for stub in stubs:
+        app = web.Application()
+        app.router.add_post("/invocations", stub.invocations)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        stub.url = f"http://127.0.0.1:{port}/invocations"
+        runners.append(runner)
+    try:
+        yield
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+@contextlib.asynccontextmanager
+async def pool(stubs, **kwargs):
+    async with serve(*stubs):
+        client = upstreams.UpstreamPool([stub.url for stub in stubs], **kwargs)
+        await client.startup()
+        try:
+            yield client
+        finally:
+            await client.shutdown()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine())
+
+
+async def post(client, rows=1):
+    body = await client.post("[" + ",".join(["{}"] * rows) + "]", HEADERS)
+    return json.loads(body)
+
+
+def test_balances_least_outstanding():
+    slow, fast = Stub(latency=0.2), Stub()
+
+    async def test():
+        async with pool([slow, fast], dedupe=False) as client:
+            first = asyncio.create_task(post(client))
+            await asyncio.sleep(0.05)
+            # the slow upstream has a request in flight
+            assert await asyncio.gather(*(post(client, i + 1) for i in range(5))) == [
+                [0] * (i + 1) for i in range(5)
+            ]
+            await first
+
+    run(test)
+    assert slow.calls == 1
+    assert fast.calls == 5
+
+
+def test_fails_over_and_trips_breaker():
+    broken, healthy = Stub(status=500), Stub()
+
+    async def test():
+        async with pool(
+            [broken, healthy], dedupe=False, breaker_failures=2, breaker_cooldown=60
+        ) as client:
+            for _ in range(10):
+                assert await post(client) == [0]
+            assert not client.upstreams[0].available
+
+    trips = upstreams.UPSTREAM_BREAKER_TRIPS.labels
+    run(test)
+    assert broken.calls == 2
+    assert healthy.calls == 10
+    assert trips(broken.url)._value.get() == 1
+
+
+def test_breaker_closes_after_trial():
+    stub = Stub(status=503)
+
+    async def test():
+        async with pool(
+            [stub], dedupe=False, breaker_failures=1, breaker_cooldown=0.1
+        ) as client:
+            with pytest.raises(UpstreamError):
+                await post(client)
+            with pytest.raises(UpstreamUnavailable):
+                await post(client)
+            await asyncio.sleep(0.1)
+            stub.status = 200
+            assert await post(client) == [0]
+            assert client.upstreams[0].available
+
+    run(test)
+    assert stub.calls == 2
+
+
+def test_breaker_lets_a_single_trial_through():
+    stub = Stub(latency=0.1, status=503)
+
+    async def test():
+        async with pool(
+            [stub], dedupe=False, breaker_failures=1, breaker_cooldown=0.1
+        ) as client:
+            with pytest.raises(UpstreamError):
+                await post(client)
+            await asyncio.sleep(0.1)
+            stub.status = 200
+            # the requests choose an upstream before the first one is sent
+            return await asyncio.gather(
+                *(post(client) for _ in range(3)), return_exceptions=True
+            )
+
+    results = run(test)
+
+    assert results[0] == [0]
+    assert all(isinstance(r, UpstreamUnavailable) for r in results[1:])
+    assert stub.calls == 2
+
+
+def test_rejected_requests_are_not_retried():
+    rejecting, healthy = Stub(status=422), Stub()
+
+    async def test():
+        async with pool(
+            [rejecting, healthy], dedupe=False, breaker_failures=1
+        ) as client:
+            # the first request of a pool goes to its first upstream
+            with pytest.raises(UpstreamRejected) as error:
+                await post(client)
+            assert client.upstreams[0].available
+            return error.value
+
+    error = run(test)
+
+    assert error.status_code == 422
+    assert error.payload["status_code"] == 422
+    assert "stub" in error.payload["response"]
+    assert rejecting.calls == 1
+    assert healthy.calls == 0
+
+
+def test_unreachable_upstream():
+    async def test():
+        client = upstreams.UpstreamPool(
+            ["http://127.0.0.1:9/invocations"], connect_timeout=1
+        )
+        await client.startup()
+        try:
+            with pytest.raises(UpstreamError, match="Failed to reach"):
+                await post(client)
+        finally:
+            await client.shutdown()
+
+    run(test)
+
+
+def test_hedges_slow_requests():
+    fast, slow = Stub(latency=0.01), Stub(latency=0.01)
+    hedges = upstreams.UPSTREAM_HEDGES._value.get()
+    wins = upstreams.UPSTREAM_HEDGE_WINS._value.get()
+
+    async def test():
+        async with pool([fast, slow], dedupe=False, hedge_percentile=95) as client:
+            for _ in range(upstreams._MIN_LATENCIES):
+                await post(client)
+            slow.latency = 2.0
+            fast.latency = 0.01
+            start_time = time.perf_counter()
+            # the first request goes to either upstream, so two are sent to be
+            # sure one of them is hedged
+            await asyncio.gather(post(client), post(client))
+            return time.perf_counter() - start_time
+
+    assert run(test) < 1.0
+    assert upstreams.UPSTREAM_HEDGES._value.get() - hedges >= 1
+    assert upstreams.UPSTREAM_HEDGE_WINS._value.get() - wins >= 1
+
+
+def test_dedupes_identical_requests():
+    stub = Stub(latency=0.1)
+
+    async def test():
+        async with pool([stub]) as client:
+            return await asyncio.gather(
+                post(client, 2), post(client, 2), post(client, 3)
+            )
+
+    assert run(test) == [[0, 0], [0, 0], [0, 0, 0]]
+    assert stub.calls == 2